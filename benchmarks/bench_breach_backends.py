@@ -0,0 +1,121 @@
+# Import modules.
+import argparse
+import hashlib
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# Make the application modules importable when running this script directly.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from breach_corpus import ingest_corpus, OfflineCorpus
+from password_breached import PwnedRangeClient
+
+
+def write_synthetic_source(path, size, seed=0):
+    """
+    Write a hash-ordered 'SHA1:COUNT' file with random hashes.
+
+    Parameters:
+        path (str): The path of the text file to write.
+        size (int): The number of hashes to generate.
+        seed (int): The seed of the random generator.
+
+    Returns:
+        list: The generated SHA-1 hashes as uppercase hex strings.
+    """
+    rng = random.Random(seed)
+    hashes = sorted(hashlib.sha1(rng.randbytes(16)).hexdigest().upper() for _ in range(size))
+    with open(path, "w", encoding="utf-8") as file:
+        for sha1 in hashes:
+            file.write(f"{sha1}:{rng.randint(1, 1000)}\n")
+    return hashes
+
+
+def start_range_server(corpus):
+    """
+    Start a local stand-in for the range API that serves ranges from a corpus.
+
+    Parameters:
+        corpus (OfflineCorpus): The corpus to serve.
+
+    Returns:
+        ThreadingHTTPServer: The running server.
+    """
+    class RangeHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            prefix = self.path.rsplit('/', 1)[-1].upper()
+            body = "\r\n".join(f"{suffix}:{count}" for suffix, count in corpus.range_counts(prefix).items())
+            body = body.encode('utf-8')
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), RangeHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def time_lookups(backend, queries):
+    """
+    Time a series of single-hash lookups against a breach backend.
+
+    Parameters:
+        backend: The breach backend to query.
+        queries (list): The SHA-1 hashes to look up.
+
+    Returns:
+        float: The number of lookups per second.
+    """
+    start = time.perf_counter()
+    for sha1 in queries:
+        backend.lookup(sha1[:5], [sha1[5:]])
+    return len(queries) / (time.perf_counter() - start)
+
+
+def main():
+    """
+    Compare lookup throughput of the offline corpus against the HTTP range client.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark the offline breach corpus against the HTTP path.")
+    parser.add_argument("--size", type=int, default=200000, help="Number of hashes in the synthetic corpus.")
+    parser.add_argument("--queries", type=int, default=2000, help="Number of lookups per backend.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        source_path = os.path.join(tmpdir, "pwned.txt")
+        corpus_path = os.path.join(tmpdir, "pwned.corpus")
+
+        hashes = write_synthetic_source(source_path, args.size)
+        start = time.perf_counter()
+        ingest_corpus(source_path, corpus_path)
+        print(f"Ingested {args.size} hashes in {time.perf_counter() - start:.2f}s")
+
+        # Half of the queries hit the corpus, half are random misses.
+        rng = random.Random(1)
+        queries = [rng.choice(hashes) if i % 2 else hashlib.sha1(rng.randbytes(16)).hexdigest().upper()
+                   for i in range(args.queries)]
+
+        corpus = OfflineCorpus(corpus_path)
+        server = start_range_server(corpus)
+        client = PwnedRangeClient(base_url=f"http://127.0.0.1:{server.server_port}")
+
+        offline_rate = time_lookups(corpus, queries)
+        http_rate = time_lookups(client, queries)
+        print(f"Offline corpus: {offline_rate:,.0f} lookups/s ({1e6 / offline_rate:.1f} us/lookup)")
+        print(f"HTTP range API (local stand-in): {http_rate:,.0f} lookups/s ({1e6 / http_rate:.1f} us/lookup)")
+
+        server.shutdown()
+        corpus.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+# Import modules.
+import argparse
+import csv
+import io
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+# Make the application modules importable when running this script directly.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_import_memory import peak_rss_mb
+from synthetic import generate_vault, LocalKeyProvider
+
+
+def make_app(database_path):
+    """
+    Create an application on a benchmark database.
+
+    Parameters:
+        database_path (str): The path of the database.
+
+    Returns:
+        Flask: The application.
+    """
+    from flask import Flask
+    from models import db
+
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{database_path}"
+    db.init_app(app)
+    return app
+
+
+def naive_export(manager, user_id):
+    """
+    Export a vault the simple way: load every account, decrypt each password with its own query, and build
+    the whole file in memory.
+
+    Parameters:
+        manager (PasswordManager): The password manager holding the user's key.
+        user_id (int): The ID of the user.
+
+    Returns:
+        list: The export, as a single chunk.
+    """
+    from models import db, Account
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(("name", "url", "username", "password"))
+    for account in db.session.execute(db.select(Account).where(Account.user_id == user_id)).scalars().all():
+        writer.writerow((account.url, account.full_url, account.username,
+                         manager.read_and_decrypt_password(user_id, account.id)))
+    return [buffer.getvalue().encode("utf-8")]
+
+
+def run_export(mode, database_path, key_path, compress, passphrase):
+    """
+    Export the benchmark vault and report the time to the first byte, the total time and the peak RSS.
+
+    Parameters:
+        mode (str): 'streaming' to export with vault_export.export_vault(), or 'naive' to build it in memory.
+        database_path (str): The path of the benchmark database.
+        key_path (str): The path of the key file.
+        compress (bool): Whether to gzip a streaming export.
+        passphrase (str or None): The passphrase to encrypt a streaming export with, if any.
+    """
+    os.environ.update({"KEY_PROVIDER": "file", "CHROME_KEY_PATH": key_path})
+    from password_manager import PasswordManager
+    from vault_export import export_vault
+
+    app = make_app(database_path)
+    with app.app_context():
+        manager = PasswordManager("Chrome", 1)
+        baseline = peak_rss_mb()
+        start = time.perf_counter()
+        if mode == "streaming":
+            chunks = export_vault(manager, 1, "csv", compress=compress, passphrase=passphrase)
+        else:
+            chunks = naive_export(manager, 1)
+
+        first_byte, size = None, 0
+        for chunk in chunks:
+            if first_byte is None and chunk:
+                first_byte = time.perf_counter() - start
+            size += len(chunk)
+        elapsed = time.perf_counter() - start
+
+    print(f"{mode:>9}: {size / 1024 ** 2:.1f} MB in {elapsed:.2f}s, first byte after {first_byte * 1000:.1f} ms, "
+          f"peak RSS {peak_rss_mb():.1f} MB ({peak_rss_mb() - baseline:+.1f} MB during the export)")
+
+
+def main():
+    """
+    Compare the streaming export against building the export in memory.
+
+    Each export runs in its own process, so the peak RSS of one doesn't hide the other.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark the latency and peak memory use of a vault export.")
+    parser.add_argument("--rows", type=int, default=100000, help="Number of accounts in the vault.")
+    parser.add_argument("--compress", action="store_true", help="Gzip the streaming export.")
+    parser.add_argument("--passphrase", help="Encrypt the streaming export with this passphrase.")
+    parser.add_argument("--skip-naive", action="store_true", help="Only run the streaming export.")
+    parser.add_argument("--mode", choices=["streaming", "naive"], help=argparse.SUPPRESS)
+    parser.add_argument("--database", help=argparse.SUPPRESS)
+    parser.add_argument("--key", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        run_export(args.mode, args.database, args.key, args.compress, args.passphrase)
+        return
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        from models import db, User
+        from data_access import upsert_accounts, store_user_key
+        from schema import upgrade_schema
+
+        database_path, key_path = os.path.join(tmpdir, "export.db"), os.path.join(tmpdir, "chrome.key")
+        provider = LocalKeyProvider()
+        provider.install(key_path)
+        app = make_app(database_path)
+        with app.app_context():
+            upgrade_schema(db)
+            db.session.add(User(email="bench@example.com", password="", name="Bench", browser="Chrome"))
+            db.session.commit()
+            store_user_key(1, provider.key)
+            upsert_accounts(1, "Chrome", generate_vault(provider.key, args.rows))
+        print(f"Vault with {args.rows} accounts: {os.path.getsize(database_path) / 1024 ** 2:.1f} MB")
+
+        for mode in ("streaming",) if args.skip_naive else ("streaming", "naive"):
+            command = [sys.executable, os.path.abspath(__file__), "--mode", mode, "--database", database_path,
+                       "--key", key_path]
+            if args.compress:
+                command.append("--compress")
+            if args.passphrase:
+                command += ["--passphrase", args.passphrase]
+            subprocess.run(command, check=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+# Import modules.
+import argparse
+import os
+import resource
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+# Make the application modules importable when running this script directly.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from login_data import write_login_data
+
+
+def peak_rss_mb():
+    """
+    Return the peak resident set size of this process.
+
+    Returns:
+        float: The peak RSS in megabytes.
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes.
+    return peak / 1024 ** 2 if sys.platform == "darwin" else peak / 1024
+
+
+def run_import(mode, login_data_path, database_path):
+    """
+    Import a Login Data database into a fresh vault and report the peak RSS of the import.
+
+    Parameters:
+        mode (str): 'streaming' to import through PasswordInput.insert_data(), or 'fetchall' to read the
+                    whole table into memory first, like the import did before it streamed.
+        login_data_path (str): The path of the Login Data database.
+        database_path (str): The path of the vault database to create.
+    """
+    from flask import Flask
+    from models import db, User
+    from data_access import upsert_accounts
+    from password_input import PasswordInput
+
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{database_path}"
+    db.init_app(app)
+    os.environ['CHROME_DB_PATH'] = login_data_path
+
+    with app.app_context():
+        db.create_all()
+        db.session.add(User(email="bench@example.com", password="", name="Bench", browser="Chrome"))
+        db.session.commit()
+        # Don't resolve icons, the benchmark measures the import itself.
+        import icon_resolver
+        icon_resolver.icon_resolver.fill_icons_async = lambda app, user_id: None
+
+        baseline = peak_rss_mb()
+        start = time.perf_counter()
+        if mode == "streaming":
+            counts = PasswordInput("Chrome").insert_data(user_id=1)
+        else:
+            conn = sqlite3.connect(login_data_path)
+            rows = conn.execute(PasswordInput.LOGINS_QUERY).fetchall()
+            conn.close()
+            columns = [[row[i] for row in rows] for i in range(7)]
+            counts = upsert_accounts(1, "Chrome", (row + (None,) for row in rows))
+            del columns
+        elapsed = time.perf_counter() - start
+
+    print(f"{mode:>9}: {counts['inserted']} rows in {elapsed:.2f}s, "
+          f"peak RSS {peak_rss_mb():.1f} MB ({peak_rss_mb() - baseline:+.1f} MB during the import)")
+
+
+def main():
+    """
+    Compare the peak memory use of the streaming import against reading the whole table at once.
+
+    Each import runs in its own process, so the peak RSS of one doesn't hide the other.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark the peak memory use of a browser import.")
+    parser.add_argument("--rows", type=int, default=100000, help="Number of logins in the synthetic database.")
+    parser.add_argument("--mode", choices=["streaming", "fetchall"], help=argparse.SUPPRESS)
+    parser.add_argument("--login-data", help=argparse.SUPPRESS)
+    parser.add_argument("--database", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        run_import(args.mode, args.login_data, args.database)
+        return
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        login_data_path = os.path.join(tmpdir, "Login Data")
+        write_login_data(login_data_path, args.rows)
+        print(f"Login Data with {args.rows} rows: {os.path.getsize(login_data_path) / 1024 ** 2:.1f} MB")
+
+        for mode in ("streaming", "fetchall"):
+            database_path = os.path.join(tmpdir, f"{mode}.db")
+            subprocess.run([sys.executable, os.path.abspath(__file__), "--mode", mode,
+                            "--login-data", login_data_path, "--database", database_path], check=True)
+
+
+if __name__ == "__main__":
+    main()
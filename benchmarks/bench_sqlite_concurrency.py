@@ -0,0 +1,180 @@
+# Import modules.
+import argparse
+import multiprocessing
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+# Make the application modules importable when running this script directly.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_vault_search import generate_accounts
+from sqlite_tuning import SqliteTuning
+
+# SQLite's own defaults, with the rollback journal, against the tuned profile of the application.
+PROFILES = {
+    "default": dict(journal_mode="DELETE", synchronous="FULL", busy_timeout=5000, cache_size=-2000, mmap_size=0,
+                    temp_store="DEFAULT", checkpoint_interval=0),
+    "tuned": dict(checkpoint_interval=0),
+}
+
+
+def make_app(database_path, profile):
+    """
+    Create an application on a benchmark database, with the pragmas of a profile.
+
+    Parameters:
+        database_path (str): The path of the database.
+        profile (str): The name of the pragma profile.
+
+    Returns:
+        tuple: The Flask application and its SqliteTuning.
+    """
+    from flask import Flask
+    from models import db
+
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{database_path}"
+    db.init_app(app)
+    tuning = SqliteTuning(enabled=True, **PROFILES[profile])
+    tuning.init_app(app, db)
+    return app, tuning
+
+
+def reader(database_path, profile, start, stop, results):
+    """
+    List vault pages, like a web worker serving the vault, until told to stop.
+
+    Parameters:
+        database_path (str): The path of the database.
+        profile (str): The name of the pragma profile.
+        start (Event): Set when the readers should start.
+        stop (Event): Set when the readers should stop.
+        results (Queue): Receives the read latencies in milliseconds and the number of failed reads.
+    """
+    from models import db
+    from data_access import list_accounts
+
+    app, _ = make_app(database_path, profile)
+    timings, errors = [], 0
+    with app.app_context():
+        start.wait()
+        while not stop.is_set():
+            began = time.perf_counter()
+            try:
+                list_accounts(1, size=50)
+                timings.append((time.perf_counter() - began) * 1000)
+            except Exception:
+                errors += 1
+            db.session.rollback()
+    results.put((timings, errors))
+
+
+def writer(database_path, profile, rows, chunk_size, results):
+    """
+    Bulk import accounts into a second user's vault.
+
+    Parameters:
+        database_path (str): The path of the database.
+        profile (str): The name of the pragma profile.
+        rows (int): The number of accounts to import.
+        chunk_size (int): The number of accounts committed at a time.
+        results (Queue): Receives the import time in seconds and the write statistics.
+    """
+    from data_access import upsert_accounts
+
+    app, tuning = make_app(database_path, profile)
+    with app.app_context():
+        began = time.perf_counter()
+        upsert_accounts(2, "Chrome", generate_accounts(rows, seed=1), chunk_size=chunk_size)
+        results.put((time.perf_counter() - began, tuning.stats()))
+
+
+def run_profile(profile, args, tmpdir):
+    """
+    Measure read throughput on an idle database, then while a bulk import writes to it.
+
+    Parameters:
+        profile (str): The name of the pragma profile.
+        args (Namespace): The command line arguments.
+        tmpdir (str): The directory to create the database in.
+    """
+    from models import db, User
+    from data_access import upsert_accounts
+    from schema import upgrade_schema
+
+    database_path = os.path.join(tmpdir, f"{profile}.db")
+    app, _ = make_app(database_path, profile)
+    with app.app_context():
+        upgrade_schema(db)
+        db.session.add_all([User(email=f"bench{i}@example.com", password="", name="Bench", browser="Chrome")
+                            for i in (1, 2)])
+        db.session.commit()
+        upsert_accounts(1, "Chrome", generate_accounts(args.seed_rows))
+        db.engine.dispose()
+
+    for phase in ("idle", "import"):
+        start, stop, results = multiprocessing.Event(), multiprocessing.Event(), multiprocessing.Queue()
+        readers = [multiprocessing.Process(target=reader, args=(database_path, profile, start, stop, results))
+                   for _ in range(args.readers)]
+        for process in readers:
+            process.start()
+
+        began = time.perf_counter()
+        start.set()
+        if phase == "idle":
+            time.sleep(args.idle_seconds)
+        else:
+            writer_results = multiprocessing.Queue()
+            process = multiprocessing.Process(target=writer, args=(database_path, profile, args.rows,
+                                                                   args.chunk_size, writer_results))
+            process.start()
+            import_seconds, write_stats = writer_results.get()
+            process.join()
+        stop.set()
+        seconds = time.perf_counter() - began
+
+        timings, errors = [], 0
+        for _ in readers:
+            reader_timings, reader_errors = results.get()
+            timings.extend(reader_timings)
+            errors += reader_errors
+        for process in readers:
+            process.join()
+
+        timings.sort()
+        p95 = timings[int(len(timings) * 0.95)] if timings else float("nan")
+        print(f"{profile:>8} {phase:>6}: {len(timings) / seconds:8.0f} reads/s, "
+              f"median {statistics.median(timings) if timings else float('nan'):6.2f} ms, p95 {p95:7.2f} ms, "
+              f"{errors} failed reads")
+        if phase == "import":
+            print(f"{'':>15}  imported {args.rows} accounts in {import_seconds:.2f}s, "
+                  f"{write_stats['write_seconds']:.2f}s in writes including lock waits, "
+                  f"slowest write {write_stats['max_write_seconds'] * 1000:.1f} ms, "
+                  f"{write_stats['lock_errors']} lock errors")
+
+
+def main():
+    """
+    Compare read throughput during a bulk import with SQLite's defaults and with the tuned pragmas.
+
+    Readers and the writer run in separate processes, like the workers of a multi-worker server.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark concurrent vault reads during a bulk import.")
+    parser.add_argument("--readers", type=int, default=4, help="Number of reader processes.")
+    parser.add_argument("--rows", type=int, default=100000, help="Number of accounts the bulk import writes.")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="Number of accounts committed at a time.")
+    parser.add_argument("--seed-rows", type=int, default=5000, help="Number of accounts in the read vault.")
+    parser.add_argument("--idle-seconds", type=float, default=2, help="Duration of the idle measurement.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for profile in PROFILES:
+            run_profile(profile, args, tmpdir)
+
+
+if __name__ == "__main__":
+    main()
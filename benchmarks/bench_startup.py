@@ -0,0 +1,220 @@
+# Import modules.
+import argparse
+import base64
+import importlib.util
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+# The directory of the application modules.
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Times the import of the application, the creation of the app and its first request in a fresh interpreter.
+BOOT_SCRIPT = """
+import json, time
+start = time.perf_counter()
+import main
+imported = time.perf_counter()
+app = main.create_app()
+created = time.perf_counter()
+response = app.test_client().get('/')
+assert response.status_code == 200, response.status_code
+done = time.perf_counter()
+print(json.dumps({"import": imported - start, "create_app": created - imported, "first_request": done - created}))
+"""
+
+
+def configure(tmpdir):
+    """
+    Configure the application for a benchmark database, key file and caches, and migrate the database.
+
+    Parameters:
+        tmpdir (str): The directory for the database and the key file.
+    """
+    key_path = os.path.join(tmpdir, "chrome.key")
+    with open(key_path, "w", encoding="utf-8") as file:
+        file.write(base64.b64encode(os.urandom(32)).decode())
+    os.environ.update({
+        "SECRET_KEY": "benchmark", "DATABASE_URL": f"sqlite:///{os.path.join(tmpdir, 'startup.db')}",
+        "KEY_PROVIDER": "file", "CHROME_KEY_PATH": key_path,
+        "TEMPLATE_CACHE_PATH": os.path.join(tmpdir, "template_cache"), "ICON_STORE_PATH": os.path.join(tmpdir, "icons"),
+        "PYTHONPATH": os.pathsep.join(filter(None, [ROOT, os.getenv("PYTHONPATH")])),
+    })
+    subprocess.run([sys.executable, "-m", "flask", "--app", "main", "migrate"], cwd=ROOT, check=True,
+                   stdout=subprocess.DEVNULL)
+
+
+def measure_boot(repeat):
+    """
+    Time the import, app creation and first request of the application in fresh interpreters.
+
+    Parameters:
+        repeat (int): The number of interpreters to start.
+
+    Returns:
+        dict: The median seconds of each phase.
+    """
+    runs = []
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, "-c", BOOT_SCRIPT], cwd=ROOT, check=True, capture_output=True,
+                                text=True).stdout
+        runs.append(json.loads(output.splitlines()[-1]))
+    return {phase: statistics.median(run[phase] for run in runs) for phase in runs[0]}
+
+
+def measure_fork(workers):
+    """
+    Create the app once, then time how long forked workers take to serve their first request.
+
+    This is how a preloading server such as `gunicorn --preload` starts its workers: the app is created in
+    the master process, and each worker inherits it and opens its own database connections.
+
+    Parameters:
+        workers (int): The number of workers to fork.
+
+    Returns:
+        dict: The seconds to create the app, the median and slowest seconds from fork to first response,
+              and the database connections the workers inherited.
+    """
+    from main import create_app, db
+
+    start = time.perf_counter()
+    app = create_app()
+    created = time.perf_counter() - start
+    with app.app_context():
+        inherited = db.engine.pool.checkedin()
+
+    pipes = []
+    for _ in range(workers):
+        read_end, write_end = os.pipe()
+        forked = time.perf_counter()
+        if os.fork() == 0:
+            os.close(read_end)
+            status = app.test_client().get('/').status_code
+            os.write(write_end, json.dumps([status, time.perf_counter() - forked]).encode())
+            os._exit(0)
+        os.close(write_end)
+        pipes.append(read_end)
+
+    timings = []
+    for read_end in pipes:
+        status, seconds = json.loads(os.read(read_end, 1024))
+        os.close(read_end)
+        if status != 200:
+            raise RuntimeError(f"A forked worker answered {status}")
+        timings.append(seconds)
+        os.wait()
+    return {"create_app": created, "first_request": statistics.median(timings), "slowest_first_request": max(timings),
+            "inherited_connections": inherited}
+
+
+def measure_gunicorn(workers, preload):
+    """
+    Time how long gunicorn takes from its start until it serves the first request.
+
+    Parameters:
+        workers (int): The number of gunicorn workers.
+        preload (bool): Whether to create the app in the master process before forking the workers.
+
+    Returns:
+        float: The seconds until the first successful response.
+    """
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    command = [sys.executable, "-m", "gunicorn", "--workers", str(workers), "--bind", f"127.0.0.1:{port}",
+               "main:create_app()"] + (["--preload"] if preload else [])
+
+    start = time.perf_counter()
+    server = subprocess.Popen(command, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while time.perf_counter() - start < 60:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout=5) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - start
+            except OSError:
+                time.sleep(0.01)
+        raise RuntimeError("gunicorn didn't answer within 60 seconds")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def import_profile(top):
+    """
+    Return the modules whose imports take longest, from Python's -X importtime report.
+
+    Parameters:
+        top (int): The number of modules to return.
+
+    Returns:
+        list: (seconds, module) pairs of the slowest imports, including their own imports.
+    """
+    report = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"], cwd=ROOT, check=True,
+                            capture_output=True, text=True).stderr
+    imports = []
+    for line in report.splitlines():
+        if line.startswith("import time:") and "|" in line and "cumulative" not in line:
+            _, cumulative, module = line.split("|")
+            imports.append((int(cumulative) / 1e6, module.strip()))
+    return sorted(imports, reverse=True)[:top]
+
+
+def main():
+    """
+    Measure how quickly the application starts: in a fresh interpreter, in workers forked from a preloaded
+    app, and under gunicorn if it is installed.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark the startup of the application's workers.")
+    parser.add_argument("--repeat", type=int, default=5, help="Number of fresh interpreters to time.")
+    parser.add_argument("--workers", type=int, default=4, help="Number of forked or gunicorn workers.")
+    parser.add_argument("--import-profile", type=int, default=0, metavar="N",
+                        help="Also list the N slowest module imports.")
+    parser.add_argument("--output", help="Write the results as JSON to this file.")
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmpdir:
+        configure(tmpdir)
+
+        results["boot"] = measure_boot(args.repeat)
+        print(f"fresh interpreter (median of {args.repeat}): import {results['boot']['import'] * 1000:.0f} ms, "
+              f"create_app {results['boot']['create_app'] * 1000:.0f} ms, "
+              f"first request {results['boot']['first_request'] * 1000:.0f} ms")
+
+        if hasattr(os, "fork"):
+            results["fork"] = measure_fork(args.workers)
+            print(f"preload and fork ({args.workers} workers): create_app {results['fork']['create_app'] * 1000:.0f} ms, "
+                  f"first request median {results['fork']['first_request'] * 1000:.0f} ms, "
+                  f"slowest {results['fork']['slowest_first_request'] * 1000:.0f} ms, "
+                  f"{results['fork']['inherited_connections']} inherited database connections")
+
+        if importlib.util.find_spec("gunicorn"):
+            for preload in (False, True):
+                seconds = measure_gunicorn(args.workers, preload)
+                results[f"gunicorn{'_preload' if preload else ''}"] = seconds
+                print(f"gunicorn{' --preload' if preload else ''} ({args.workers} workers): "
+                      f"first response after {seconds * 1000:.0f} ms")
+        else:
+            print("gunicorn is not installed, skipping the gunicorn boot.")
+
+        if args.import_profile:
+            print("slowest imports, including their own imports:")
+            for seconds, module in import_profile(args.import_profile):
+                print(f"  {seconds * 1000:7.1f} ms  {module}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
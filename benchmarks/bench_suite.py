@@ -0,0 +1,339 @@
+# Import modules.
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# Make the application modules importable when running this script directly.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from login_data import write_login_data
+from synthetic import generate_users, generate_passwords, generate_vault, LocalKeyProvider, BREACHED_PASSWORDS
+
+# The benchmarks run per vault size, and those that don't depend on the vault size.
+SIZED_BENCHMARKS = ["encrypt", "decrypt", "import", "all_vaults", "all_vaults_cached", "check_breaches", "export"]
+UNSIZED_BENCHMARKS = ["login_hash", "login_verify"]
+DEFAULT_SIZES = [100, 10000, 100000]
+
+# Number of hash suffixes per range of the stand-in range server, about as many as the real API returns.
+RANGE_SUFFIXES = 800
+
+
+def serve_ranges(port_queue):
+    """
+    Serve a local stand-in for the Pwned Passwords range API until the process is terminated.
+
+    Every range holds the same random suffixes, plus those of the common passwords the synthetic
+    vaults contain, so breach checks find them. The server does no work per request beyond writing the
+    response, so the benchmark measures the client side.
+
+    Parameters:
+        port_queue (Queue): Receives the port the server listens on.
+    """
+    rng = random.Random(0)
+    filler = [f"{rng.getrandbits(140):035X}:{rng.randint(1, 1000)}" for _ in range(RANGE_SUFFIXES)]
+    breached = {}
+    for password in BREACHED_PASSWORDS:
+        sha1 = hashlib.sha1(password.encode()).hexdigest().upper()
+        breached.setdefault(sha1[:5], []).append(f"{sha1[5:]}:{random.Random(sha1).randint(1, 10 ** 6)}")
+
+    default_body = "\r\n".join(filler).encode()
+    bodies = {prefix: "\r\n".join(filler + suffixes).encode() for prefix, suffixes in breached.items()}
+
+    class RangeHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # Headers and body are written separately, so don't let Nagle's algorithm hold back the body.
+        disable_nagle_algorithm = True
+
+        def do_GET(self):
+            prefix = self.path.rsplit('/', 1)[-1].upper()
+            body = bodies.get(prefix, default_body)
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), RangeHandler)
+    port_queue.put(server.server_address[1])
+    server.serve_forever()
+
+
+def measure(run, repeat, rows, setup=None):
+    """
+    Time a benchmark, after an untimed run that warms up caches such as compiled templates.
+
+    Parameters:
+        run (callable): The timed work.
+        repeat (int): The number of timed runs.
+        rows (int): The number of rows a run processes, for the throughput.
+        setup (callable or None): Untimed preparation before each run.
+
+    Returns:
+        dict: The rows, the number of runs, the median, fastest and slowest run in seconds, and the
+              rows per second of the median run.
+    """
+    timings = []
+    for i in range(repeat + 1):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        run()
+        if i:
+            timings.append(time.perf_counter() - start)
+    median = statistics.median(timings)
+    return {"rows": rows, "runs": repeat, "median_s": round(median, 6), "min_s": round(min(timings), 6),
+            "max_s": round(max(timings), 6), "rows_per_s": round(rows / median, 1) if median else None}
+
+
+def run_size(size, benchmarks, repeat, tmpdir):
+    """
+    Run the benchmarks on a fresh database with a vault and a Login Data file of the given size.
+
+    Runs in its own process, so each size starts with cold caches and the application's shared objects
+    read the size's configuration.
+
+    Parameters:
+        size (int): The number of accounts of the vault and of logins of the Login Data file.
+        benchmarks (list): The names of the benchmarks to run.
+        repeat (int): The number of timed runs per benchmark.
+        tmpdir (str): The directory for the database and the browser files.
+
+    Returns:
+        dict: The results by benchmark name.
+    """
+    # Configure the application before creating it: a local key, database and range server.
+    provider = LocalKeyProvider(seed=size)
+    provider.install(os.path.join(tmpdir, "chrome.key"))
+    write_login_data(os.path.join(tmpdir, "Login Data"), size, key=provider.key, seed=size)
+    port_queue = multiprocessing.Queue()
+    range_server = multiprocessing.Process(target=serve_ranges, args=(port_queue,), daemon=True)
+    range_server.start()
+    os.environ.update({
+        "SECRET_KEY": "benchmark", "DATABASE_URL": f"sqlite:///{os.path.join(tmpdir, 'bench.db')}",
+        "KEY_PROVIDER": "file", "CHROME_KEY_PATH": os.path.join(tmpdir, "chrome.key"),
+        "CHROME_DB_PATH": os.path.join(tmpdir, "Login Data"),
+        "PWNED_API_URL": f"http://127.0.0.1:{port_queue.get()}", "PWNED_CACHE_PATH": "",
+        "BREACH_BACKEND": "online", "BREACH_BLOOM_PATH": "",
+        "TEMPLATE_CACHE_PATH": os.path.join(tmpdir, "template_cache"), "ICON_STORE_PATH": os.path.join(tmpdir, "icons"),
+    })
+
+    from flask_login import login_user
+    from main import create_app, db, scan_vault
+    from schema import upgrade_schema
+    from models import User, Account
+    from data_access import upsert_accounts
+    from password_manager import PasswordManager
+    from password_input import PasswordInput
+    from password_hashing import password_policy
+    from fragment_cache import fragment_cache
+    import icon_resolver
+
+    # Don't resolve icons, the import benchmark measures the import itself.
+    icon_resolver.icon_resolver.fill_icons_async = lambda app, user_id: None
+
+    app = create_app()
+    with app.app_context():
+        upgrade_schema(db)
+
+    results = {}
+    users = iter(generate_users(repeat + 2, seed=size))
+
+    def add_user():
+        profile = next(users)
+        user = User(email=profile["email"], name=profile["name"], browser=profile["browser"],
+                    password=profile["password"])
+        db.session.add(user)
+        db.session.commit()
+        return user
+
+    try:
+        with app.app_context():
+            vault_user = add_user()
+            provider.seed(vault_user.id)
+            upsert_accounts(vault_user.id, "Chrome", generate_vault(provider.key, size, seed=size))
+            manager = PasswordManager("Chrome", vault_user.id)
+            passwords = generate_passwords(size, seed=size)
+            blobs = [manager.encrypt_password(password) for password in passwords]
+
+            if "encrypt" in benchmarks:
+                results["encrypt"] = measure(lambda: [manager.encrypt_password(p) for p in passwords], repeat, size)
+            if "decrypt" in benchmarks:
+                results["decrypt"] = measure(lambda: [manager.decrypt_password(b) for b in blobs], repeat, size)
+
+            if "import" in benchmarks:
+                # Every run imports into a new user, so no login is skipped as already imported.
+                def run_import():
+                    with app.test_request_context():
+                        login_user(add_user())
+                        password_input = PasswordInput("Chrome")
+                        password_input.import_browser()
+                        password_input.insert_data()
+
+                results["import"] = measure(run_import, repeat, size)
+
+            if "check_breaches" in benchmarks:
+                # Forget the previous run's checks, so every run checks the whole vault.
+                def reset_checks():
+                    db.session.execute(db.update(Account).where(Account.user_id == vault_user.id)
+                                       .values(is_breached=None, date_breach_checked=None, breach_fingerprint=None))
+                    db.session.commit()
+
+                results["check_breaches"] = measure(lambda: scan_vault(vault_user.id), repeat, size, setup=reset_checks)
+
+            if "login_hash" in benchmarks:
+                results["login_hash"] = measure(lambda: password_policy.hash("benchmark password"), repeat, 1)
+            if "login_verify" in benchmarks:
+                stored_hash = password_policy.hash("benchmark password")
+                results["login_verify"] = measure(lambda: password_policy.verify(stored_hash, "benchmark password"),
+                                                  repeat, 1)
+            vault_user_id = vault_user.id
+
+        # Render the first vault page as the logged-in user, with and without the page cache.
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session["_user_id"] = str(vault_user_id)
+
+        def render():
+            response = client.get("/vaults")
+            assert response.status_code == 200, response.status_code
+
+        page_size = min(size, int(os.getenv("VAULT_PAGE_SIZE", 50)))
+        if "all_vaults" in benchmarks:
+            results["all_vaults"] = measure(render, repeat, page_size, setup=fragment_cache.invalidate)
+        if "all_vaults_cached" in benchmarks:
+            results["all_vaults_cached"] = measure(render, repeat, page_size)
+
+        # Stream the whole vault as CSV.
+        def export():
+            response = client.post("/vaults/export", data={"export_format": "csv"})
+            assert response.status_code == 200, response.status_code
+            for _ in response.response:
+                pass
+
+        if "export" in benchmarks:
+            app.config["WTF_CSRF_ENABLED"] = False
+            results["export"] = measure(export, repeat, size)
+    finally:
+        range_server.terminate()
+    return results
+
+
+def compare(results, baseline, threshold):
+    """
+    Print each result next to its baseline.
+
+    Parameters:
+        results (dict): The results by benchmark key.
+        baseline (dict): The baseline results by benchmark key.
+        threshold (float): The relative slowdown of the median reported as a regression.
+
+    Returns:
+        list: The keys of the regressed benchmarks.
+    """
+    regressions = []
+    print(f"{'benchmark':<28}{'baseline':>12}{'current':>12}{'change':>10}")
+    for key, result in results.items():
+        previous = baseline.get(key)
+        if previous is None:
+            print(f"{key:<28}{'-':>12}{result['median_s'] * 1000:>10.2f}ms{'new':>10}")
+            continue
+        change = result["median_s"] / previous["median_s"] - 1 if previous["median_s"] else 0
+        flag = " REGRESSION" if change > threshold else ""
+        if flag:
+            regressions.append(key)
+        print(f"{key:<28}{previous['median_s'] * 1000:>10.2f}ms{result['median_s'] * 1000:>10.2f}ms"
+              f"{change:>+10.1%}{flag}")
+    return regressions
+
+
+def git_commit():
+    """
+    Return the commit the benchmarks ran on.
+
+    Returns:
+        str or None: The commit hash, or None outside a git checkout.
+    """
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    """
+    Run the benchmark suite, write the results as JSON and compare them against a baseline.
+
+    Every vault size runs in its own process, on its own database. The exit status is 1 if a benchmark
+    regressed against the baseline.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark the hot paths of the password manager.")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)),
+                        help="Comma-separated vault and Login Data sizes.")
+    parser.add_argument("--benchmarks", default=",".join(SIZED_BENCHMARKS + UNSIZED_BENCHMARKS),
+                        help="Comma-separated benchmarks to run.")
+    parser.add_argument("--repeat", type=int, default=3, help="Number of timed runs per benchmark.")
+    parser.add_argument("--output", help="Path of the JSON results file to write.")
+    parser.add_argument("--baseline", help="Path of a JSON results file to compare against.")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="Relative slowdown of a median reported as a regression.")
+    parser.add_argument("--worker", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--worker-output", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    benchmarks = args.benchmarks.split(",")
+
+    if args.worker is not None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            results = run_size(args.worker, benchmarks, args.repeat, tmpdir)
+        with open(args.worker_output, "w", encoding="utf-8") as file:
+            json.dump(results, file)
+        return
+
+    sizes = [int(size) for size in args.sizes.split(",")]
+    results = {}
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for i, size in enumerate(sizes):
+            # The benchmarks that don't depend on the size only run once.
+            names = [name for name in benchmarks if name in SIZED_BENCHMARKS or (i == 0 and name in UNSIZED_BENCHMARKS)]
+            worker_output = os.path.join(tmpdir, f"{size}.json")
+            print(f"Running {len(names)} benchmarks with {size} rows...", file=sys.stderr)
+            subprocess.run([sys.executable, os.path.abspath(__file__), "--worker", str(size), "--benchmarks",
+                            ",".join(names), "--repeat", str(args.repeat), "--worker-output", worker_output],
+                           stdout=subprocess.DEVNULL, check=True)
+            with open(worker_output, encoding="utf-8") as file:
+                for name, result in json.load(file).items():
+                    results[name if name in UNSIZED_BENCHMARKS else f"{name}/{size}"] = result
+
+    report = {"meta": {"date": time.strftime("%Y-%m-%dT%H:%M:%S%z"), "commit": git_commit(),
+                       "python": platform.python_version(), "platform": platform.platform(),
+                       "cpus": os.cpu_count(), "repeat": args.repeat},
+              "results": results}
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as file:
+            baseline = json.load(file)["results"]
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print(f"{len(regressions)} benchmarks regressed by more than {args.threshold:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+# Import modules.
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+# Make the application modules importable when running this script directly.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from models import db, User
+from data_access import upsert_accounts, search_accounts
+from schema import upgrade_schema
+
+# Words the synthetic website names are made of.
+WORDS = ["mail", "cloud", "shop", "bank", "news", "photo", "travel", "music", "games", "social",
+         "video", "health", "sport", "books", "food", "home", "auto", "work", "learn", "chat"]
+
+
+def generate_accounts(size, seed=0):
+    """
+    Generate synthetic account rows for upsert_accounts().
+
+    Parameters:
+        size (int): The number of accounts.
+        seed (int): The seed of the random generator.
+
+    Returns:
+        list: The account rows.
+    """
+    rng = random.Random(seed)
+    rows = []
+    for i in range(size):
+        domain = f"{rng.choice(WORDS)}{rng.choice(WORDS)}{rng.randrange(1000)}.example.com"
+        rows.append((f"https://{domain}/login/{i}", f"https://{domain}/", f"{rng.choice(WORDS)}.user{i}@example.com",
+                     rng.randbytes(40), 0, 0, 0, None))
+    return rows
+
+
+def main():
+    """
+    Measure the latency of vault searches on a large vault.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark the full-text vault search.")
+    parser.add_argument("--size", type=int, default=50000, help="Number of accounts in the vault.")
+    parser.add_argument("--queries", type=int, default=500, help="Number of timed searches.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        app = Flask(__name__)
+        app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(tmpdir, 'bench.db')}"
+        db.init_app(app)
+
+        with app.app_context():
+            upgrade_schema(db)
+            db.session.add(User(email="bench@example.com", password="", name="Bench", browser="Chrome"))
+            db.session.commit()
+            start = time.perf_counter()
+            upsert_accounts(1, "Chrome", generate_accounts(args.size))
+            print(f"Inserted and indexed {args.size} accounts in {time.perf_counter() - start:.2f}s")
+
+            # Search-as-you-type sends every prefix of what the user types.
+            rng = random.Random(1)
+            searches = []
+            while len(searches) < args.queries:
+                term = f"{rng.choice(WORDS)}{rng.choice(WORDS)}"
+                searches.extend(term[:length] for length in range(2, len(term) + 1))
+
+            timings = []
+            for search in searches[:args.queries]:
+                start = time.perf_counter()
+                search_accounts(1, search, limit=10)
+                timings.append((time.perf_counter() - start) * 1000)
+
+            timings.sort()
+            print(f"{len(timings)} searches: median {statistics.median(timings):.2f} ms, "
+                  f"p95 {timings[int(len(timings) * 0.95)]:.2f} ms, max {timings[-1]:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+# Import modules.
+import os
+import random
+import sqlite3
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+# A trimmed copy of the logins table of Chrome's and Edge's Login Data database.
+LOGINS_SCHEMA = """
+CREATE TABLE logins (
+    origin_url VARCHAR NOT NULL,
+    action_url VARCHAR,
+    username_element VARCHAR,
+    username_value VARCHAR,
+    password_element VARCHAR,
+    password_value BLOB,
+    signon_realm VARCHAR NOT NULL,
+    date_created INTEGER NOT NULL,
+    blacklisted_by_user INTEGER NOT NULL DEFAULT 0,
+    scheme INTEGER NOT NULL DEFAULT 0,
+    times_used INTEGER DEFAULT 0,
+    date_last_used INTEGER NOT NULL DEFAULT 0,
+    date_password_modified INTEGER NOT NULL DEFAULT 0,
+    UNIQUE (origin_url, username_element, username_value, password_element, signon_realm)
+)
+"""
+
+# A WebKit timestamp (microseconds since 1601-01-01) in 2022.
+BASE_TIMESTAMP = 13300000000000000
+
+
+def write_login_data(path, rows, domains=2000, key=None, seed=0):
+    """
+    Write a synthetic browser Login Data database.
+
+    Parameters:
+        path (str): The path of the database to create. An existing file is replaced.
+        rows (int): The number of logins to generate.
+        domains (int): The number of distinct websites the logins are spread over.
+        key (bytes or None): The AES key the passwords are encrypted with. Defaults to a random key.
+        seed (int): The seed of the random generator, so the same arguments give the same logins.
+
+    Returns:
+        bytes: The AES key the passwords were encrypted with.
+    """
+    rng = random.Random(seed)
+    key = key or rng.randbytes(32)
+    aead = AESGCM(key)
+
+    if os.path.exists(path):
+        os.remove(path)
+    conn = sqlite3.connect(path)
+    conn.execute(LOGINS_SCHEMA)
+
+    def generate():
+        for i in range(rows):
+            domain = f"site{rng.randrange(domains)}.example.com"
+            password = f"pw-{rng.getrandbits(64):016x}".encode()
+            nonce = rng.randbytes(12)
+            timestamp = BASE_TIMESTAMP + rng.randrange(10 ** 14)
+            yield (f"https://{domain}/login/{i}", f"https://{domain}/session", "username", f"user{i}@example.com",
+                   "password", b"v10" + nonce + aead.encrypt(nonce, password, None), f"https://{domain}/",
+                   timestamp, timestamp, timestamp)
+
+    conn.executemany("INSERT INTO logins (origin_url, action_url, username_element, username_value, "
+                     "password_element, password_value, signon_realm, date_created, date_last_used, "
+                     "date_password_modified) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", generate())
+    conn.commit()
+    conn.close()
+    return key
@@ -0,0 +1,112 @@
+# Import modules.
+import base64
+import random
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+# Words the synthetic website names and user names are made of.
+WORDS = ["mail", "cloud", "shop", "bank", "news", "photo", "travel", "music", "games", "social",
+         "video", "health", "sport", "books", "food", "home", "auto", "work", "learn", "chat"]
+
+# Share of the synthetic vault passwords that are common, breached passwords.
+BREACHED_SHARE = 0.05
+
+# Common passwords, reported as breached by the stand-in range server.
+BREACHED_PASSWORDS = ["123456", "password", "qwerty", "letmein", "iloveyou", "dragon", "monkey", "111111"]
+
+
+def generate_users(count, seed=0):
+    """
+    Generate synthetic users.
+
+    Parameters:
+        count (int): The number of users.
+        seed (int): The seed of the random generator, so the same arguments give the same users.
+
+    Returns:
+        list: One dict per user with its email, name, browser and login password.
+    """
+    rng = random.Random(seed)
+    return [{"email": f"{rng.choice(WORDS)}.user{i}@example.com", "name": f"{rng.choice(WORDS).title()} {i}",
+             "browser": "Chrome", "password": f"login-{rng.getrandbits(48):012x}"} for i in range(count)]
+
+
+def generate_passwords(count, seed=0):
+    """
+    Generate synthetic vault passwords, a small share of which are common, breached passwords.
+
+    Parameters:
+        count (int): The number of passwords.
+        seed (int): The seed of the random generator.
+
+    Returns:
+        list: The passwords.
+    """
+    rng = random.Random(seed)
+    return [rng.choice(BREACHED_PASSWORDS) if rng.random() < BREACHED_SHARE else f"pw-{rng.getrandbits(64):016x}"
+            for _ in range(count)]
+
+
+def generate_vault(key, rows, seed=0):
+    """
+    Generate synthetic account rows for upsert_accounts(), with passwords encrypted under a key.
+
+    Parameters:
+        key (bytes): The AES key the passwords are encrypted with.
+        rows (int): The number of accounts.
+        seed (int): The seed of the random generator.
+
+    Returns:
+        list: The account rows.
+    """
+    rng = random.Random(seed)
+    aead = AESGCM(key)
+    accounts = []
+    for i, password in enumerate(generate_passwords(rows, seed)):
+        domain = f"{rng.choice(WORDS)}{rng.choice(WORDS)}{rng.randrange(1000)}.example.com"
+        nonce = rng.randbytes(12)
+        accounts.append((f"https://{domain}/login/{i}", f"https://{domain}/", f"{rng.choice(WORDS)}.user{i}@example.com",
+                         b"v10" + nonce + aead.encrypt(nonce, password.encode(), None), 0, 0, 0, None))
+    return accounts
+
+
+class LocalKeyProvider:
+    """
+    A browser key for benchmarks, readable without the user's browser profile.
+
+    The key is written to a key file, which the application reads with its file key provider
+    (KEY_PROVIDER=file), on every platform.
+
+    Attributes:
+        key (bytes): The AES key.
+    """
+    def __init__(self, seed=0):
+        """
+        Initialize the provider with a deterministic key.
+
+        Parameters:
+            seed (int): The seed of the random generator the key is drawn from.
+        """
+        self.key = random.Random(seed).randbytes(32)
+
+    def install(self, key_path):
+        """
+        Write the key to a key file.
+
+        Parameters:
+            key_path (str): The path of the key file to write, to be set as CHROME_KEY_PATH.
+        """
+        with open(key_path, "w", encoding="utf-8") as file:
+            file.write(base64.b64encode(self.key).decode())
+
+    def seed(self, user_id):
+        """
+        Store the key as a user's vault key, as an import does.
+
+        Parameters:
+            user_id (int): The ID of the user.
+        """
+        from data_access import store_user_key
+        from key_cache import key_cache
+
+        store_user_key(user_id, self.key)
+        key_cache.invalidate(user_id=user_id)
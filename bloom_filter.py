@@ -0,0 +1,210 @@
+# Import modules.
+import argparse
+import math
+import mmap
+import os
+import struct
+from breach_corpus import OfflineCorpus
+
+# Layout of a filter file: header followed by the bit array.
+MAGIC = b"PWBLOOM1"
+HEADER = struct.Struct("<8sQII")
+
+
+def optimal_parameters(size, false_positive_rate):
+    """
+    Compute the number of bits and hash functions for a Bloom filter.
+
+    Parameters:
+        size (int): The number of items the filter will hold.
+        false_positive_rate (float): The target false-positive rate, for example 0.001.
+
+    Returns:
+        tuple: The number of bits and the number of hash functions.
+    """
+    size = max(size, 1)
+    bits = math.ceil(-size * math.log(false_positive_rate) / (math.log(2) ** 2))
+    hashes = max(1, round(bits / size * math.log(2)))
+    return bits, hashes
+
+
+def _positions(digest, bits, hashes):
+    """
+    Return the bit positions of a SHA-1 digest using double hashing.
+
+    The digest is already uniformly distributed, so two 64-bit words taken from it serve as the
+    base hashes.
+
+    Parameters:
+        digest (bytes): The 20-byte SHA-1 digest.
+        bits (int): The number of bits in the filter.
+        hashes (int): The number of hash functions.
+
+    Returns:
+        generator: The bit positions to set or test.
+    """
+    first, second = struct.unpack_from("<QQ", digest, 4)
+    second |= 1
+    return ((first + i * second) % bits for i in range(hashes))
+
+
+def build_filter(corpus_path, filter_path, false_positive_rate=0.001):
+    """
+    Build a Bloom filter from an offline breach corpus and write it to disk.
+
+    Parameters:
+        corpus_path (str): The path of a corpus file built by breach_corpus.ingest_corpus().
+        filter_path (str): The path of the filter file to write.
+        false_positive_rate (float): The target false-positive rate.
+
+    Returns:
+        int: The size of the filter file in bytes.
+    """
+    corpus = OfflineCorpus(corpus_path)
+    bits, hashes = optimal_parameters(corpus.size, false_positive_rate)
+    bit_array = bytearray((bits + 7) // 8)
+
+    for digest in corpus.iter_digests():
+        for bit in _positions(digest, bits, hashes):
+            bit_array[bit >> 3] |= 1 << (bit & 7)
+    corpus.close()
+
+    tmp_path = filter_path + ".tmp"
+    with open(tmp_path, "wb") as file:
+        file.write(HEADER.pack(MAGIC, bits, hashes, round(false_positive_rate * 1e9)))
+        file.write(bit_array)
+    os.replace(tmp_path, filter_path)
+    return HEADER.size + len(bit_array)
+
+
+class BloomFilter:
+    """
+    A memory-mapped Bloom filter of breached SHA-1 digests.
+
+    A negative answer is definitive, so passwords that are not in the filter can skip the authoritative
+    lookup altogether. A positive answer only means the password is probably breached.
+
+    Attributes:
+        path (str): The path of the filter file.
+        bits (int): The number of bits in the filter.
+        hashes (int): The number of hash functions.
+        target_false_positive_rate (float): The false-positive rate the filter was built for.
+    """
+    def __init__(self, path):
+        """
+        Open and memory-map a filter file.
+
+        Parameters:
+            path (str): The path of the filter file.
+
+        Raises:
+            ValueError: If the file is not a Bloom filter file.
+        """
+        self.path = path
+        with open(path, "rb") as file:
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, self.bits, self.hashes, rate = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a Bloom filter file.")
+        self.target_false_positive_rate = rate / 1e9
+
+    def might_contain(self, digest):
+        """
+        Test whether a SHA-1 digest may be in the filter.
+
+        Parameters:
+            digest (bytes): The 20-byte SHA-1 digest.
+
+        Returns:
+            bool: False if the digest is certainly not breached, True if it probably is.
+        """
+        for bit in _positions(digest, self.bits, self.hashes):
+            if not self._mmap[HEADER.size + (bit >> 3)] & (1 << (bit & 7)):
+                return False
+        return True
+
+    def memory_footprint(self):
+        """
+        Return the size of the mapped filter.
+
+        Returns:
+            int: The number of mapped bytes.
+        """
+        return len(self._mmap)
+
+    def measure_false_positive_rate(self, samples=100000):
+        """
+        Measure the false-positive rate with random digests.
+
+        Random 20-byte digests are practically never real breached hashes, so every hit counts as a
+        false positive.
+
+        Parameters:
+            samples (int): The number of random digests to test.
+
+        Returns:
+            float: The fraction of random digests reported as probably breached.
+        """
+        hits = sum(self.might_contain(os.urandom(20)) for _ in range(samples))
+        return hits / samples
+
+    def close(self):
+        """
+        Unmap the filter file.
+        """
+        self._mmap.close()
+
+
+class PrefilteredBackend:
+    """
+    A breach backend that consults a Bloom filter before the authoritative backend.
+
+    Only suffixes the filter reports as probably breached are passed on, so most lookups for safe
+    passwords never reach the network or the corpus.
+
+    Attributes:
+        bloom_filter (BloomFilter): The filter consulted first.
+        backend: The authoritative backend, online or offline.
+    """
+    def __init__(self, bloom_filter, backend):
+        """
+        Initialize the prefiltered backend.
+
+        Parameters:
+            bloom_filter (BloomFilter): The filter consulted first.
+            backend: The authoritative backend answering lookup(prefix, suffixes).
+        """
+        self.bloom_filter = bloom_filter
+        self.backend = backend
+
+    def lookup(self, prefix, suffixes):
+        """
+        Look up the breach counts of several hash suffixes that share one prefix.
+
+        Parameters:
+            prefix (str): The 5-character uppercase SHA-1 prefix.
+            suffixes (iterable): The 35-character uppercase suffixes to look up.
+
+        Returns:
+            dict or None: Maps each breached suffix to its breach count, or None if the authoritative
+                          lookup failed.
+        """
+        probable = [suffix for suffix in suffixes
+                    if self.bloom_filter.might_contain(bytes.fromhex(prefix + suffix))]
+        if not probable:
+            return {}
+        return self.backend.lookup(prefix, probable)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build a Bloom filter from an offline breach corpus.")
+    parser.add_argument("corpus", help="The corpus file built with breach_corpus.py.")
+    parser.add_argument("filter", help="The path of the filter file to write.")
+    parser.add_argument("--false-positive-rate", type=float, default=0.001, help="The target false-positive rate.")
+    args = parser.parse_args()
+
+    size = build_filter(args.corpus, args.filter, args.false_positive_rate)
+    bloom_filter = BloomFilter(args.filter)
+    print(f"Wrote {size / 2 ** 20:.1f} MiB filter with {bloom_filter.hashes} hash functions; "
+          f"measured false-positive rate {bloom_filter.measure_false_positive_rate():.5f}.")
@@ -0,0 +1,211 @@
+# Import modules.
+import argparse
+import mmap
+import os
+import struct
+from array import array
+
+# Layout of a corpus file: header, prefix index, then fixed-size records sorted by digest.
+MAGIC = b"PWCORP01"
+HEADER = struct.Struct("<8sQ")
+INDEX_SIZE = 65536 + 1
+INDEX_OFFSET = HEADER.size
+RECORDS_OFFSET = INDEX_OFFSET + INDEX_SIZE * 8
+RECORD = struct.Struct("<20sI")
+
+
+def ingest_corpus(source_path, corpus_path):
+    """
+    Convert a downloaded Pwned Passwords SHA-1 file into a compact, sorted binary corpus.
+
+    The source file must be the hash-ordered 'SHA1:COUNT' text file. Every record is stored as the
+    20-byte digest and a 4-byte count, and an index of the first record for every 2-byte digest prefix
+    is written in front of the records.
+
+    Parameters:
+        source_path (str): The path of the downloaded 'SHA1:COUNT' text file.
+        corpus_path (str): The path of the binary corpus file to write.
+
+    Returns:
+        int: The number of ingested hashes.
+
+    Raises:
+        ValueError: If the source file is not sorted by hash or contains malformed lines.
+    """
+    bucket_counts = array('Q', bytes(65536 * 8))
+    tmp_path = corpus_path + ".tmp"
+    total = 0
+    previous = b""
+
+    with open(source_path, "r", encoding="utf-8") as source, open(tmp_path, "wb") as corpus:
+        # Reserve space for the header and index, which are only known at the end.
+        corpus.write(bytes(RECORDS_OFFSET))
+
+        for line_number, line in enumerate(source, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            sha1, _, count = line.partition(':')
+            try:
+                digest = bytes.fromhex(sha1)
+            except ValueError:
+                raise ValueError(f"Malformed hash on line {line_number}: {line!r}")
+            if len(digest) != 20:
+                raise ValueError(f"Malformed hash on line {line_number}: {line!r}")
+            if digest <= previous:
+                raise ValueError(f"Hashes are not sorted at line {line_number}; use the hash-ordered download.")
+
+            corpus.write(RECORD.pack(digest, min(int(count or 0), 0xFFFFFFFF)))
+            bucket_counts[int.from_bytes(digest[:2], "big")] += 1
+            previous = digest
+            total += 1
+
+        # Turn the per-bucket counts into the index of first records.
+        index = array('Q', bytes(INDEX_SIZE * 8))
+        for bucket in range(65536):
+            index[bucket + 1] = index[bucket] + bucket_counts[bucket]
+
+        corpus.seek(0)
+        corpus.write(HEADER.pack(MAGIC, total))
+        corpus.write(struct.pack(f"<{INDEX_SIZE}Q", *index))
+
+    os.replace(tmp_path, corpus_path)
+    return total
+
+
+class OfflineCorpus:
+    """
+    A breach backend answering lookups from a memory-mapped corpus file built by ingest_corpus().
+
+    The corpus stays in the page cache instead of the Python heap, and each lookup is a binary search
+    within the records sharing the digest's first two bytes, so no network access is needed.
+
+    Attributes:
+        path (str): The path of the corpus file.
+        size (int): The number of hashes in the corpus.
+    """
+    def __init__(self, path):
+        """
+        Open and memory-map a corpus file.
+
+        Parameters:
+            path (str): The path of the corpus file.
+
+        Raises:
+            ValueError: If the file is not a corpus file.
+        """
+        self.path = path
+        with open(path, "rb") as file:
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, self.size = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a breach corpus file.")
+
+    def _bucket(self, bucket):
+        """
+        Return the record range of a 2-byte digest prefix.
+
+        Parameters:
+            bucket (int): The first two digest bytes as an integer.
+
+        Returns:
+            tuple: The index of the first record and the index after the last record.
+        """
+        return struct.unpack_from("<2Q", self._mmap, INDEX_OFFSET + bucket * 8)
+
+    def _digest_at(self, position):
+        """
+        Return the digest of the record at a position.
+
+        Parameters:
+            position (int): The record index.
+
+        Returns:
+            bytes: The 20-byte digest.
+        """
+        offset = RECORDS_OFFSET + position * RECORD.size
+        return self._mmap[offset:offset + 20]
+
+    def count(self, digest):
+        """
+        Return how often a SHA-1 digest appears in the corpus.
+
+        Parameters:
+            digest (bytes): The 20-byte SHA-1 digest.
+
+        Returns:
+            int: The breach count, or 0 if the digest is not in the corpus.
+        """
+        low, high = self._bucket(int.from_bytes(digest[:2], "big"))
+        while low < high:
+            middle = (low + high) // 2
+            if self._digest_at(middle) < digest:
+                low = middle + 1
+            else:
+                high = middle
+
+        if low < self.size and self._digest_at(low) == digest:
+            return RECORD.unpack_from(self._mmap, RECORDS_OFFSET + low * RECORD.size)[1]
+        return 0
+
+    def iter_digests(self):
+        """
+        Iterate over all digests in the corpus, in sorted order.
+
+        Yields:
+            bytes: Each 20-byte SHA-1 digest.
+        """
+        for position in range(self.size):
+            yield self._digest_at(position)
+
+    def range_counts(self, prefix):
+        """
+        Return all breached suffixes sharing a 5-character prefix, like the range API does.
+
+        Parameters:
+            prefix (str): The 5-character uppercase SHA-1 prefix.
+
+        Returns:
+            dict: Maps each breached suffix to its breach count.
+        """
+        counts = {}
+        low, high = self._bucket(int(prefix[:4], 16))
+        for position in range(low, high):
+            digest, count = RECORD.unpack_from(self._mmap, RECORDS_OFFSET + position * RECORD.size)
+            sha1 = digest.hex().upper()
+            if sha1.startswith(prefix):
+                counts[sha1[5:]] = count
+        return counts
+
+    def lookup(self, prefix, suffixes):
+        """
+        Look up the breach counts of several hash suffixes that share one prefix.
+
+        Parameters:
+            prefix (str): The 5-character uppercase SHA-1 prefix.
+            suffixes (iterable): The 35-character uppercase suffixes to look up.
+
+        Returns:
+            dict: Maps each breached suffix to its breach count. Suffixes that were not found are left out.
+        """
+        counts = {}
+        for suffix in suffixes:
+            count = self.count(bytes.fromhex(prefix + suffix))
+            if count:
+                counts[suffix] = count
+        return counts
+
+    def close(self):
+        """
+        Unmap the corpus file.
+        """
+        self._mmap.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build an offline breach corpus from a Pwned Passwords file.")
+    parser.add_argument("source", help="The hash-ordered 'SHA1:COUNT' text file.")
+    parser.add_argument("corpus", help="The path of the corpus file to write.")
+    args = parser.parse_args()
+    print(f"Ingested {ingest_corpus(args.source, args.corpus)} hashes into {args.corpus}.")
@@ -0,0 +1,261 @@
+# Import modules.
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from settings import EnvSetting
+
+# Job states that still have work to do.
+ACTIVE_STATUSES = ("queued", "running")
+
+
+class BreachJobRunner:
+    """
+    Runs breach scans in background threads, with jobs persisted in the database.
+
+    Jobs are stored as rows of the job model, so their progress can be polled from any worker and
+    unfinished jobs are picked up again after a restart. A job is claimed with a conditional UPDATE
+    before it runs, so two workers never run the same job, and a running job whose heartbeat is older
+    than stale_after seconds is considered abandoned and may be claimed again. A process that fails to
+    claim a job another process is running tries again once that job's heartbeat would be stale, so a
+    job cut off by a restart is picked up even if it was still fresh when the new process started.
+
+    Attributes:
+        max_workers (int): Maximum number of scans running at the same time in this process.
+        stale_after (float): Number of seconds without progress after which a running job is abandoned.
+    """
+    max_workers = EnvSetting("BREACH_JOB_WORKERS", 2, int)
+    stale_after = EnvSetting("BREACH_JOB_STALE_AFTER", 120, float)
+
+    def __init__(self, max_workers=None, stale_after=None):
+        """
+        Initialize the job runner. The runner does nothing until init_app() is called.
+
+        Parameters:
+            max_workers (int or None): Maximum number of concurrent scans. Defaults to BREACH_JOB_WORKERS.
+            stale_after (float or None): Seconds before a silent running job is abandoned.
+                                         Defaults to BREACH_JOB_STALE_AFTER.
+        """
+        self.max_workers = max_workers
+        self.stale_after = stale_after
+        self.worker_id = uuid.uuid4().hex
+        self.app = None
+        self.db = None
+        self.job_model = None
+        self.scan = None
+        self._executor = None
+        self._executor_pid = None
+        self._executor_lock = threading.Lock()
+        self._resumed_pid = None
+
+    def init_app(self, app, db, job_model, scan):
+        """
+        Bind the runner to the application. Unfinished jobs are resumed by the first request of each process.
+
+        Creating the app therefore doesn't query the database or start threads, which a preloading server's
+        master process would otherwise do before forking its workers.
+
+        Parameters:
+            app (Flask): The Flask application, used to push an application context in worker threads.
+            db (SQLAlchemy): The Flask-SQLAlchemy database object.
+            job_model (type): The model storing the jobs.
+            scan (callable): Called as scan(user_id, progress) to scan a vault. It must call
+                             progress(done, total) as it goes and return the number of checked,
+                             skipped and breached accounts.
+        """
+        self.app = app
+        self.db = db
+        self.job_model = job_model
+        self.scan = scan
+        app.before_request(self._resume_once)
+
+    def _resume_once(self):
+        """
+        Resume the unfinished jobs in a background thread, once per process.
+        """
+        if self._resumed_pid == os.getpid():
+            return
+        with self._executor_lock:
+            if self._resumed_pid == os.getpid():
+                return
+            self._resumed_pid = os.getpid()
+        self._get_executor().submit(self.resume)
+
+    def _get_executor(self):
+        """
+        Return this process's pool of scan threads, creating it on first use.
+
+        Server workers forked from a master that loaded the app get their own pool, since the master's
+        threads don't exist in them.
+
+        Returns:
+            ThreadPoolExecutor: The thread pool.
+        """
+        with self._executor_lock:
+            if self._executor is None or self._executor_pid != os.getpid():
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="breach-job")
+                self._executor_pid = os.getpid()
+                self.worker_id = uuid.uuid4().hex
+            return self._executor
+
+    def submit(self, user_id):
+        """
+        Start a breach scan for a user, unless one is already queued or running.
+
+        Parameters:
+            user_id (int): The ID of the user whose vault is scanned.
+
+        Returns:
+            job_model: The new job, or the user's existing active job.
+        """
+        Job = self.job_model
+        job = self.db.session.execute(
+            self.db.select(Job).where(Job.user_id == user_id, Job.status.in_(ACTIVE_STATUSES))
+        ).scalar()
+        if job is not None and not self._is_stale(job):
+            return job
+
+        if job is None:
+            job = Job(user_id=user_id, status="queued", date_created=int(time.time()))
+            self.db.session.add(job)
+            self.db.session.commit()
+
+        self._get_executor().submit(self._run, job.id)
+        return job
+
+    def resume(self):
+        """
+        Queue every unfinished job again, for example after a restart.
+
+        Does nothing on a database that isn't migrated yet, which has no job table.
+        """
+        Job = self.job_model
+        try:
+            with self.app.app_context():
+                if not self.db.inspect(self.db.engine).has_table(Job.__tablename__):
+                    return
+                job_ids = self.db.session.execute(
+                    self.db.select(Job.id).where(Job.status.in_(ACTIVE_STATUSES))
+                ).scalars().all()
+        except Exception as e:
+            print(f"Error resuming breach scans: {e}")
+            return
+        for job_id in job_ids:
+            self._get_executor().submit(self._run, job_id)
+
+    def latest_job(self, user_id):
+        """
+        Return a user's most recent job.
+
+        Parameters:
+            user_id (int): The ID of the user.
+
+        Returns:
+            job_model or None: The most recent job, or None if the user never started a scan.
+        """
+        Job = self.job_model
+        return self.db.session.execute(
+            self.db.select(Job).where(Job.user_id == user_id).order_by(Job.id.desc()).limit(1)
+        ).scalar()
+
+    def _is_stale(self, job):
+        """
+        Check whether a running job stopped reporting progress.
+
+        Parameters:
+            job (job_model): The job to check.
+
+        Returns:
+            bool: True if the job is running but its heartbeat is older than stale_after.
+        """
+        return job.status == "running" and time.time() - (job.heartbeat or 0) > self.stale_after
+
+    def _claim(self, job_id):
+        """
+        Atomically mark a job as running in this process.
+
+        Parameters:
+            job_id (int): The ID of the job.
+
+        Returns:
+            bool: True if this process claimed the job, False if it is finished or running elsewhere.
+        """
+        Job = self.job_model
+        now = time.time()
+        result = self.db.session.execute(
+            self.db.update(Job)
+            .where(Job.id == job_id,
+                   (Job.status == "queued")
+                   | ((Job.status == "running") & (Job.heartbeat < now - self.stale_after)))
+            .values(status="running", worker_id=self.worker_id, heartbeat=now,
+                    date_started=int(now))
+        )
+        self.db.session.commit()
+        return result.rowcount == 1
+
+    def _claim_later(self, job_id, heartbeat):
+        """
+        Try to run a job again once its heartbeat is older than stale_after, in case its process died.
+
+        If the job is still making progress by then, the claim fails again and another attempt is scheduled,
+        until the job finishes.
+
+        Parameters:
+            job_id (int): The ID of the job.
+            heartbeat (float or None): The job's last heartbeat.
+        """
+        delay = max((heartbeat or 0) + self.stale_after - time.time(), 0) + 1
+        timer = threading.Timer(delay, lambda: self._get_executor().submit(self._run, job_id))
+        timer.daemon = True
+        timer.start()
+
+    def _run(self, job_id):
+        """
+        Claim and run a job in a worker thread.
+
+        Parameters:
+            job_id (int): The ID of the job.
+        """
+        with self.app.app_context():
+            if not self._claim(job_id):
+                job = self.db.session.get(self.job_model, job_id)
+                if job is not None and job.status == "running":
+                    self._claim_later(job_id, job.heartbeat)
+                return
+
+            Job = self.job_model
+            job = self.db.session.get(Job, job_id)
+            last_update = 0
+
+            def progress(done, total):
+                # Throttle progress writes so large scans don't commit once per prefix.
+                nonlocal last_update
+                if time.monotonic() - last_update < 0.5 and done < total:
+                    return
+                last_update = time.monotonic()
+                # Write through a connection of its own: committing the session would expire every
+                # object the scan holds in it, and reload them one query at a time.
+                with self.db.engine.begin() as conn:
+                    conn.execute(self.db.update(Job).where(Job.id == job_id)
+                                 .values(done=done, total=total, heartbeat=time.time()))
+
+            try:
+                checked, skipped, breached = self.scan(job.user_id, progress)
+                job.status = "done"
+                job.done = job.total = checked + skipped
+                job.skipped = skipped
+                job.breached = breached
+            except Exception as e:
+                print(f"Breach scan job {job_id} failed: {e}")
+                self.db.session.rollback()
+                job = self.db.session.get(Job, job_id)
+                job.status = "failed"
+                job.error = str(e)[:200]
+
+            job.date_finished = int(time.time())
+            self.db.session.commit()
+
+
+# Job runner shared by the application.
+job_runner = BreachJobRunner()
@@ -0,0 +1,129 @@
+# Import modules.
+import hmac
+import os
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from password_breached import hash_password, get_breach_backend
+
+# Seconds between 1601-01-01 (the browsers' epoch) and 1970-01-01.
+WEBKIT_EPOCH_OFFSET = 11644473600
+
+
+def to_unix_timestamp(timestamp):
+    """
+    Convert a stored timestamp to Unix seconds.
+
+    Accounts imported from a browser keep the browser's timestamps, which count microseconds since
+    1601-01-01, while accounts added in the app use Unix seconds.
+
+    Parameters:
+        timestamp (int or None): The stored timestamp.
+
+    Returns:
+        int: The timestamp in Unix seconds, or 0 if it is not set.
+    """
+    if not timestamp:
+        return 0
+    if timestamp > 10 ** 14:
+        return timestamp // 10 ** 6 - WEBKIT_EPOCH_OFFSET
+    return timestamp
+
+
+def is_scan_fresh(account, fingerprint, now, max_age):
+    """
+    Decide whether an account's last breach check can be reused.
+
+    Parameters:
+        account (Account or Row): The account, with its last breach check timestamp and fingerprint.
+        fingerprint (bytes): The fingerprint of the account's current password.
+        now (int): The current time in Unix seconds.
+        max_age (int): Number of seconds a breach check stays valid.
+
+    Returns:
+        bool: True if the password was not modified since a check within max_age, and its fingerprint
+              still matches the one that was checked.
+    """
+    checked = account.date_breach_checked
+    return (checked is not None
+            and account.is_breached is not None
+            and now - checked < max_age
+            and to_unix_timestamp(account.date_password_modified) <= checked
+            and account.breach_fingerprint is not None
+            and hmac.compare_digest(account.breach_fingerprint, fingerprint))
+
+
+class BreachScanner:
+    """
+    A class to check many passwords for breaches concurrently.
+
+    Passwords whose SHA-1 hashes share a 5-character prefix are collapsed into a single lookup, and the
+    distinct prefixes are looked up by a bounded pool of worker threads. A scan therefore costs one
+    lookup per distinct prefix, spread over max_workers concurrent requests.
+
+    Attributes:
+        backend: The breach backend answering lookup(prefix, suffixes) calls.
+        max_workers (int): Maximum number of concurrent lookups.
+    """
+    def __init__(self, backend=None, max_workers=None):
+        """
+        Initialize the breach scanner.
+
+        Parameters:
+            backend: The breach backend to use. Defaults to the shared backend from get_breach_backend().
+            max_workers (int or None): Maximum number of concurrent lookups. Defaults to BREACH_SCAN_WORKERS.
+        """
+        self.backend = backend or get_breach_backend()
+        self.max_workers = max_workers or int(os.getenv("BREACH_SCAN_WORKERS", 8))
+
+    def scan(self, passwords, progress=None):
+        """
+        Check a set of passwords against the breach backend.
+
+        Parameters:
+            passwords (dict): Maps each account ID to its decrypted password, or None if it could not
+                              be decrypted.
+            progress (callable or None): Called as progress(done, total) after each prefix lookup, where
+                                         done and total count accounts.
+
+        Returns:
+            dict: Maps each account ID to True if its password was breached, False if it was not, or None
+                  if it could not be checked.
+        """
+        results = {}
+
+        # Group the accounts by hash prefix and suffix.
+        prefixes = defaultdict(lambda: defaultdict(list))
+        for account_id, password in passwords.items():
+            if password is None:
+                results[account_id] = None
+                continue
+            prefix, suffix = hash_password(password)
+            prefixes[prefix][suffix].append(account_id)
+
+        total = len(passwords)
+        done = len(results)
+        if not prefixes:
+            return results
+
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(prefixes))) as pool:
+            futures = {pool.submit(self.backend.lookup, prefix, list(suffixes)): prefix
+                       for prefix, suffixes in prefixes.items()}
+
+            for future in as_completed(futures):
+                suffixes = prefixes[futures[future]]
+                try:
+                    counts = future.result()
+                except Exception as e:
+                    print(f"Error while checking prefix {futures[future]}: {e}")
+                    counts = None
+
+                for suffix, account_ids in suffixes.items():
+                    is_breached = None if counts is None else suffix in counts
+                    for account_id in account_ids:
+                        results[account_id] = is_breached
+                    done += len(account_ids)
+
+                if progress:
+                    progress(done, total)
+
+        return results
@@ -0,0 +1,497 @@
+# Import modules.
+import os
+import re
+from models import db, User, Account, VaultVersion, RekeyJob
+from user_cache import user_cache
+
+# Maximum number of account IDs bound into a single SQLite query.
+MAX_QUERY_PARAMS = 900
+
+
+def _finish(commit):
+    """
+    Commit the session, or only flush it when the caller owns the transaction.
+
+    Parameters:
+        commit (bool): Whether to commit. If False, the changes join the caller's transaction.
+    """
+    if commit:
+        db.session.commit()
+    else:
+        db.session.flush()
+
+
+def get_user_profile(user_id):
+    """
+    Return the profile columns of a user, without the password hash or key.
+
+    Parameters:
+        user_id (int): The ID of the user.
+
+    Returns:
+        Row or None: The user's id, name, email, browser and key version, or None if the user does not exist.
+    """
+    return db.session.execute(
+        db.select(User.id, User.name, User.email, User.browser, db.func.coalesce(User.key_version, 0))
+        .where(User.id == user_id)
+    ).first()
+
+
+def store_user_key(user_id, key, commit=True):
+    """
+    Store a user's decrypted AES key and increment its version, so every process drops its cached copy.
+
+    This process's cached profile of the user is dropped too, so it picks up the new version right away.
+
+    Parameters:
+        user_id (int): The ID of the user.
+        key (bytes): The AES key.
+        commit (bool): Whether to commit, or join the caller's transaction.
+    """
+    db.session.execute(db.update(User).where(User.id == user_id).values(
+        encrypted_key=key, key_version=db.func.coalesce(User.key_version, 0) + 1
+    ))
+    _finish(commit)
+    user_cache.invalidate(user_id)
+
+
+def get_key_version(user_id):
+    """
+    Return the version of a user's stored key, which changes whenever the key is replaced.
+
+    Parameters:
+        user_id (int): The ID of the user.
+
+    Returns:
+        int: The key version.
+    """
+    return db.session.execute(
+        db.select(db.func.coalesce(User.key_version, 0)).where(User.id == user_id)
+    ).scalar() or 0
+
+
+def can_write_vault(user_id, key_version):
+    """
+    Check that passwords encrypted under a key version may be written to a user's vault.
+
+    They may not if the key was replaced since, or if the vault is being re-encrypted, as accounts
+    already moved to the new key would get a password only the old key can read. Call this after
+    flushing the write, in the same transaction, and roll back if it returns False.
+
+    Parameters:
+        user_id (int): The ID of the user.
+        key_version (int): The key version the passwords were encrypted under.
+
+    Returns:
+        bool: True if the write may be committed.
+    """
+    rekeying = db.session.execute(
+        db.select(RekeyJob.id).where(RekeyJob.user_id == user_id, RekeyJob.status == "running").limit(1)
+    ).first()
+    return rekeying is None and get_key_version(user_id) == key_version
+
+
+def _dialect_insert():
+    """
+    Return the INSERT construct of the database's dialect, which supports ON CONFLICT clauses.
+
+    Returns:
+        callable: The dialect's insert() function.
+    """
+    if db.engine.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert
+
+
+def get_vault_version(user_id):
+    """
+    Return the version of a user's vault, which changes whenever its accounts change.
+
+    Parameters:
+        user_id (int): The ID of the user.
+
+    Returns:
+        int: The vault version.
+    """
+    return db.session.execute(
+        db.select(VaultVersion.version).where(VaultVersion.user_id == user_id)
+    ).scalar() or 0
+
+
+def bump_vault_version(user_id, commit=True):
+    """
+    Increment the version of a user's vault, so pages rendered from the old contents are not reused.
+
+    Parameters:
+        user_id (int): The ID of the user.
+        commit (bool): Whether to commit, or join the caller's transaction.
+    """
+    statement = _dialect_insert()(VaultVersion).values(user_id=user_id, version=1)
+    db.session.execute(statement.on_conflict_do_update(
+        index_elements=[VaultVersion.user_id], set_={"version": VaultVersion.version + 1}
+    ))
+    _finish(commit)
+
+
+def get_user_key(user_id):
+    """
+    Return the AES key stored for a user.
+
+    Parameters:
+        user_id (int): The ID of the user.
+
+    Returns:
+        bytes or None: The user's AES key, or None if none is stored.
+    """
+    return db.session.execute(db.select(User.encrypted_key).where(User.id == user_id)).scalar()
+
+
+def get_user_ids():
+    """
+    Return the IDs of all users.
+
+    Returns:
+        list: The user IDs, in ascending order.
+    """
+    return db.session.execute(db.select(User.id).order_by(User.id)).scalars().all()
+
+
+def get_password_blob(user_id, account_id):
+    """
+    Return the encrypted password of one account.
+
+    Parameters:
+        user_id (int): The ID of the user who owns the account.
+        account_id (int): The ID of the account.
+
+    Returns:
+        bytes or None: The encrypted password blob, or None if the account does not exist.
+    """
+    return db.session.execute(
+        db.select(Account.password).where(Account.user_id == user_id, Account.id == account_id)
+    ).scalar()
+
+
+def get_password_blobs(user_id, account_ids=None):
+    """
+    Return the encrypted passwords of many accounts.
+
+    Parameters:
+        user_id (int): The ID of the user who owns the accounts.
+        account_ids (list or None): The IDs of the accounts. Returns the whole vault if None.
+
+    Returns:
+        list: (account ID, encrypted password blob) pairs.
+    """
+    query = db.select(Account.id, Account.password).where(Account.user_id == user_id)
+    if account_ids is None:
+        return [tuple(row) for row in db.session.execute(query)]
+
+    # Chunk the IDs so large vaults stay below SQLite's bound parameter limit.
+    rows = []
+    for start in range(0, len(account_ids), MAX_QUERY_PARAMS):
+        chunk = account_ids[start:start + MAX_QUERY_PARAMS]
+        rows.extend(tuple(row) for row in db.session.execute(query.where(Account.id.in_(chunk))))
+    return rows
+
+
+def get_password_blob_page(user_id, after=0, size=500):
+    """
+    Return the next chunk of a user's encrypted passwords, in account ID order.
+
+    Parameters:
+        user_id (int): The ID of the user who owns the accounts.
+        after (int): Only return accounts with a higher ID than this one.
+        size (int): The maximum number of accounts to return.
+
+    Returns:
+        list: (account ID, encrypted password blob) pairs.
+    """
+    return [tuple(row) for row in db.session.execute(
+        db.select(Account.id, Account.password)
+        .where(Account.user_id == user_id, Account.id > after)
+        .order_by(Account.id)
+        .limit(size)
+    )]
+
+
+def get_export_page(user_id, after=0, size=1000):
+    """
+    Return the next chunk of a user's accounts for an export, in account ID order.
+
+    Parameters:
+        user_id (int): The ID of the user who owns the accounts.
+        after (int): Only return accounts with a higher ID than this one.
+        size (int): The maximum number of accounts to return.
+
+    Returns:
+        list: The rows, with id, url, full_url, username and password (the encrypted blob) attributes.
+    """
+    return db.session.execute(
+        db.select(Account.id, Account.url, Account.full_url, Account.username, Account.password)
+        .where(Account.user_id == user_id, Account.id > after)
+        .order_by(Account.id)
+        .limit(size)
+    ).all()
+
+
+def update_passwords(passwords, commit=True):
+    """
+    Store the encrypted passwords of many accounts with one batched UPDATE.
+
+    Parameters:
+        passwords (dict): Maps each account ID to its encrypted password blob.
+        commit (bool): Whether to commit, or join the caller's transaction.
+    """
+    if passwords:
+        db.session.execute(db.update(Account), [{"id": account_id, "password": blob}
+                                                for account_id, blob in passwords.items()])
+    _finish(commit)
+
+
+def _upsert_statement(on_conflict):
+    """
+    Build the INSERT ... ON CONFLICT statement used to import browser logins.
+
+    Parameters:
+        on_conflict (str): 'ignore' to keep existing accounts, or 'update' to overwrite them with rows
+                           whose password was modified more recently.
+
+    Returns:
+        Insert: The statement, to be executed with a list of account rows.
+    """
+    statement = _dialect_insert()(Account.__table__)
+    conflict_columns = ["user_id", "full_url", "username"]  # unique_user_url_username
+    if on_conflict == "update":
+        excluded = statement.excluded
+        return statement.on_conflict_do_update(
+            index_elements=conflict_columns,
+            set_={"url": excluded.url, "password": excluded.password, "browser": excluded.browser,
+                  "date_last_used": excluded.date_last_used,
+                  "date_password_modified": excluded.date_password_modified},
+            where=excluded.date_password_modified > Account.__table__.c.date_password_modified,
+        )
+    if on_conflict == "ignore":
+        return statement.on_conflict_do_nothing(index_elements=conflict_columns)
+    raise ValueError(f"Unknown conflict policy: {on_conflict!r}")
+
+
+def _count_accounts(user_id):
+    """
+    Return the number of accounts in a user's vault.
+
+    Parameters:
+        user_id (int): The ID of the user.
+
+    Returns:
+        int: The number of accounts.
+    """
+    return db.session.execute(
+        db.select(db.func.count()).select_from(Account).where(Account.user_id == user_id)
+    ).scalar()
+
+
+def upsert_accounts(user_id, browser, rows, chunk_size=None, on_conflict=None):
+    """
+    Bulk insert browser login rows into a user's vault, resolving duplicates in the database.
+
+    The rows are sent in chunks as one executemany INSERT ... ON CONFLICT per chunk, relying on the
+    unique_user_url_username constraint instead of looking up every row first. Each chunk is committed
+    on its own, so an import costs a few statements per chunk regardless of the number of rows.
+
+    Parameters:
+        user_id (int): The ID of the user.
+        browser (str): The browser the rows were imported from.
+        rows (iterable): (origin_url, signon_realm, username, password, date_created, date_last_used,
+                         date_password_modified, icon) tuples.
+        chunk_size (int or None): Number of rows per chunk. Defaults to IMPORT_CHUNK_SIZE.
+        on_conflict (str or None): 'ignore' or 'update', see _upsert_statement(). Defaults to
+                                   IMPORT_ON_CONFLICT.
+
+    Returns:
+        dict: The number of 'inserted', 'updated' and 'skipped' rows.
+    """
+    chunk_size = chunk_size or int(os.getenv("IMPORT_CHUNK_SIZE", 1000))
+    statement = _upsert_statement(on_conflict or os.getenv("IMPORT_ON_CONFLICT", "ignore"))
+    counts = {"inserted": 0, "updated": 0, "skipped": 0}
+
+    def flush(chunk, before):
+        # The vault's growth gives the inserted rows; the rowcount also includes the updated ones.
+        result = db.session.execute(statement, chunk)
+        db.session.commit()
+        after = _count_accounts(user_id)
+        inserted = after - before
+        updated = max(result.rowcount - inserted, 0) if result.rowcount >= 0 else 0
+        counts["inserted"] += inserted
+        counts["updated"] += updated
+        counts["skipped"] += len(chunk) - inserted - updated
+        return after
+
+    try:
+        before = _count_accounts(user_id)
+        chunk = []
+        for (origin_url, signon_realm, username_value, password_value,
+             date_created, date_last_used, date_modified_password, icon_url) in rows:
+            chunk.append({"user_id": user_id, "full_url": origin_url, "url": signon_realm, "icon": icon_url,
+                          "username": username_value, "password": password_value, "browser": browser,
+                          "date_created": date_created, "date_last_used": date_last_used,
+                          "date_password_modified": date_modified_password})
+            if len(chunk) >= chunk_size:
+                before = flush(chunk, before)
+                chunk = []
+        if chunk:
+            flush(chunk, before)
+    except Exception:
+        db.session.rollback()
+        raise
+    return counts
+
+
+def list_accounts(user_id, after=None, size=50, breached_only=False):
+    """
+    Return one page of a user's accounts, with only the columns the vault list displays.
+
+    Pages are addressed by the last account ID of the previous page (keyset pagination), so every page
+    is an index range scan on (user_id, id) or (user_id, is_breached, id), however deep it is.
+
+    Parameters:
+        user_id (int): The ID of the user.
+        after (int or None): The last account ID of the previous page, or None for the first page.
+        size (int): The maximum number of accounts on the page.
+        breached_only (bool): Whether to only list accounts marked as breached.
+
+    Returns:
+        tuple: The page's rows, with id, url, full_url, icon, username and is_breached attributes, and the
+               'after' value of the next page, or None if this is the last page.
+    """
+    query = (db.select(Account.id, Account.url, Account.full_url, Account.icon, Account.username,
+                       Account.is_breached)
+             .where(Account.user_id == user_id)
+             .order_by(Account.id)
+             .limit(size + 1))
+    if breached_only:
+        query = query.where(Account.is_breached == 1)
+    if after is not None:
+        query = query.where(Account.id > after)
+
+    rows = db.session.execute(query).all()
+    if len(rows) > size:
+        return rows[:size], rows[size - 1].id
+    return rows, None
+
+
+def _match_query(search):
+    """
+    Turn a user's search text into an FTS5 query matching every word as a prefix.
+
+    The text is split into words the same way the index splits URLs and usernames, so 'mail.goo' matches
+    'https://mail.google.com' through its 'mail' and 'google' tokens.
+
+    Parameters:
+        search (str): The search text.
+
+    Returns:
+        str or None: The FTS5 query, or None if the text has no words.
+    """
+    words = re.findall(r"\w+", search)
+    return " ".join(f'"{word}"*' for word in words) if words else None
+
+
+def search_accounts(user_id, search, limit=20):
+    """
+    Search a user's accounts by URL and username.
+
+    Parameters:
+        user_id (int): The ID of the user.
+        search (str): The search text. Every word must match the start of a word of the account's URL,
+                      full URL or username.
+        limit (int): The maximum number of accounts to return.
+
+    Returns:
+        list: The first matching rows by account ID, with id, url, full_url, icon, username and is_breached
+              attributes.
+    """
+    query = _match_query(search)
+    if query is None:
+        return []
+
+    columns = db.select(Account.id, Account.url, Account.full_url, Account.icon, Account.username,
+                        Account.is_breached).where(Account.user_id == user_id).limit(limit)
+    if db.engine.dialect.name != "sqlite":
+        # Without the SQLite full-text index, match each word anywhere in the columns instead.
+        for word in re.findall(r"\w+", search):
+            pattern = f"%{word}%"
+            columns = columns.where(Account.url.ilike(pattern) | Account.full_url.ilike(pattern)
+                                    | Account.username.ilike(pattern))
+        return db.session.execute(columns.order_by(Account.id)).all()
+
+    # Order by ID like the vault list. The index returns matches in ID order, so the query stops after
+    # limit rows, while ranking by relevance would score every match of the short prefixes typed first.
+    fts = db.table("accounts_fts", db.column("rowid"))
+    return db.session.execute(
+        columns.join(fts, fts.c.rowid == Account.id)
+        .where(db.text("accounts_fts MATCH :query").bindparams(query=query))
+        .order_by(fts.c.rowid)
+    ).all()
+
+
+def has_account_on_domain(user_id, domain):
+    """
+    Check whether a user has an account on a website domain.
+
+    Parameters:
+        user_id (int): The ID of the user.
+        domain (str): The normalized domain, optionally with a port.
+
+    Returns:
+        bool: True if one of the user's accounts has a URL on the domain.
+    """
+    on_domain = Account.full_url.ilike(f"%://{domain}") | Account.full_url.ilike(f"%://{domain}/%")
+    return db.session.execute(
+        db.select(Account.id).where(Account.user_id == user_id, on_domain).limit(1)
+    ).first() is not None
+
+
+def get_accounts_without_icon(user_id):
+    """
+    Return the accounts of a user that have no icon yet.
+
+    Parameters:
+        user_id (int): The ID of the user.
+
+    Returns:
+        list: (account ID, full URL) pairs.
+    """
+    return [tuple(row) for row in db.session.execute(
+        db.select(Account.id, Account.full_url).where(Account.user_id == user_id, Account.icon.is_(None))
+    )]
+
+
+def update_icons(icons, commit=True):
+    """
+    Store the icons of many accounts with one batched UPDATE.
+
+    Parameters:
+        icons (dict): Maps each account ID to its icon.
+        commit (bool): Whether to commit, or join the caller's transaction.
+    """
+    if icons:
+        db.session.execute(db.update(Account), [{"id": account_id, "icon": icon}
+                                                for account_id, icon in icons.items()])
+    _finish(commit)
+
+
+def update_breach_results(results, commit=True):
+    """
+    Store the results of a breach scan with one batched UPDATE.
+
+    Parameters:
+        results (list): One dict per account, with its id and is_breached, and for accounts that were
+                        checked, their date_breach_checked and breach_fingerprint.
+        commit (bool): Whether to commit, or join the caller's transaction.
+    """
+    if results:
+        db.session.execute(db.update(Account), results)
+    _finish(commit)
@@ -1,7 +1,8 @@
 # Import modules.
 from flask_wtf import FlaskForm
 from wtforms.fields import StringField, SubmitField, PasswordField, SelectField, BooleanField, IntegerField
-from wtforms.validators import DataRequired, Email, EqualTo, URL, NumberRange
+from wtforms.validators import (DataRequired, Email, EqualTo, URL, NumberRange, Optional, Length, Regexp,
+                                ValidationError)
 
 
 class RegisterForm(FlaskForm):
@@ -111,3 +112,62 @@ class EditVaultForm(FlaskForm):
     use_special = BooleanField("Include Special Characters", default=True)
     submit = SubmitField("Save Changes")
     generate = SubmitField("Generate Random Password")
+
+
+class ExportForm(FlaskForm):
+    """
+    Form for exporting a user's vault.
+
+    Fields:
+        export_format (SelectField): The file format, CSV or newline-delimited JSON.
+        compress (BooleanField): A checkbox field indicating whether to compress the export with gzip.
+        passphrase (PasswordField): A passphrase to encrypt the export with. This is an optional field,
+                                    but must be at least 12 characters long and match 'passphrase2' when given.
+        passphrase2 (PasswordField): The passphrase again, used to confirm the first one.
+        submit (SubmitField): Button to download the export.
+    """
+    export_format = SelectField("Format", choices=[('csv', 'CSV'), ('ndjson', 'JSON (one account per line)')],
+                                validators=[DataRequired()])
+    compress = BooleanField("Compress with gzip", default=False)
+    passphrase = PasswordField(
+        "Encryption Passphrase (optional)",
+        validators=[Optional(),
+                    Length(min=12, message='The passphrase should be at least 12 characters long'),
+                    EqualTo('passphrase2', message='Passphrases must match')])
+    passphrase2 = PasswordField("Repeat Passphrase")
+    submit = SubmitField("Export")
+
+
+class AdminRekeyForm(FlaskForm):
+    """
+    Form for re-encrypting users' vaults under new keys.
+
+    Fields:
+        user_ids (StringField): Comma-separated IDs of the users whose vaults are rotated. Required unless
+                                'all_users' is ticked.
+        all_users (BooleanField): A checkbox field confirming that every user's vault should be rotated.
+        submit (SubmitField): Button to start the rotation.
+    """
+    user_ids = StringField(
+        "User IDs (comma-separated)",
+        validators=[Optional(), Regexp(r"^\s*\d+(\s*,\s*\d+)*\s*$", message='Enter user IDs separated by commas')])
+    all_users = BooleanField("Rotate every user's vault", default=False)
+    submit = SubmitField("Start Rotation")
+
+    def validate_all_users(self, field):
+        """
+        Require either user IDs or the confirmation to rotate every vault, but not both.
+        """
+        if field.data == bool(self.user_ids.data and self.user_ids.data.strip()):
+            raise ValidationError("Enter user IDs, or tick the box to rotate every user's vault.")
+
+    def selected_user_ids(self):
+        """
+        Return the IDs entered in the form.
+
+        Returns:
+            list: The user IDs, without duplicates, or an empty list if 'all_users' is ticked.
+        """
+        if self.all_users.data:
+            return []
+        return sorted({int(user_id) for user_id in self.user_ids.data.split(",")})
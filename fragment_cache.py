@@ -0,0 +1,88 @@
+# Import modules.
+from settings import EnvSetting
+from ttl_cache import TTLCache
+
+
+class FragmentCache(TTLCache):
+    """
+    A process-wide cache for rendered page fragments with LRU eviction and a memory bound.
+
+    Fragments are cached under keys that include the version of the data they were rendered from, such
+    as (user ID, vault version, view). Changing the data bumps the version, so stale fragments are never
+    looked up again and age out of the cache as the least recently used entries.
+
+    Attributes:
+        max_entries (int): Maximum number of fragments kept.
+        max_bytes (int): Maximum total size of the kept fragments, in characters.
+    """
+    max_entries = EnvSetting("FRAGMENT_CACHE_SIZE", 1024, int)
+    max_size = EnvSetting("FRAGMENT_CACHE_MAX_BYTES", 32 * 1024 * 1024, int)
+
+    def __init__(self, max_entries=None, max_bytes=None):
+        """
+        Initialize an empty fragment cache.
+
+        Parameters:
+            max_entries (int or None): Maximum number of fragments kept in the cache. Defaults to
+                                       FRAGMENT_CACHE_SIZE (1024).
+            max_bytes (int or None): Maximum total size of the fragments kept in the cache, in characters.
+                                     Defaults to FRAGMENT_CACHE_MAX_BYTES (32 MiB).
+        """
+        super().__init__(max_entries=max_entries, max_size=max_bytes)
+
+    @property
+    def max_bytes(self):
+        """
+        Return the maximum total size of the kept fragments, in characters.
+        """
+        return self.max_size
+
+    def get_or_render(self, key, render):
+        """
+        Return a cached fragment, rendering and caching it on a miss.
+
+        Parameters:
+            key (tuple): The fragment's key, including the version of the data it shows.
+            render (callable): A function without arguments that returns the fragment.
+
+        Returns:
+            str: The fragment.
+        """
+        return self.load(key, render)
+
+    def put(self, key, fragment):
+        """
+        Store a fragment, evicting the least recently used fragments if the cache is full.
+
+        Fragments larger than max_bytes are not stored.
+
+        Parameters:
+            key (tuple): The fragment's key.
+            fragment (str): The fragment.
+        """
+        self.store(key, fragment)
+
+    def invalidate(self, user_id=None):
+        """
+        Remove cached fragments.
+
+        Parameters:
+            user_id (int or None): Only remove the fragments whose key starts with this user ID.
+                                   Removes everything if None.
+        """
+        self.discard(None if user_id is None else lambda key: key[0] == user_id)
+
+    def stats(self):
+        """
+        Return the cache counters.
+
+        Returns:
+            dict: The number of entries, their total size, hits, misses and evictions.
+        """
+        counters = self.counters()
+        return {"entries": counters["entries"], "size": counters["size"], "hits": counters["hits"],
+                "misses": counters["misses"], "evictions": counters["evictions"]}
+
+
+# Fragment cache shared by the application.
+fragment_cache = FragmentCache()
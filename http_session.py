@@ -0,0 +1,30 @@
+# Import modules.
+import threading
+
+
+class ThreadLocalSession:
+    """
+    Gives each thread its own HTTP session, so a client shared by a pool of workers still reuses
+    connections without sharing a requests.Session between threads.
+
+    requests is imported when the first session is created, so processes that never make an HTTP
+    request don't load the HTTP stack.
+    """
+    def __init__(self):
+        """
+        Initialize the helper without creating a session yet.
+        """
+        self._local = threading.local()
+
+    def session(self):
+        """
+        Return the HTTP session of the calling thread, creating it on first use.
+
+        Returns:
+            requests.Session: A session reused for all requests made by this thread.
+        """
+        session = getattr(self._local, "session", None)
+        if session is None:
+            import requests
+            session = self._local.session = requests.Session()
+        return session
@@ -0,0 +1,156 @@
+# Import modules.
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+from data_access import get_accounts_without_icon, update_icons, bump_vault_version
+from icon_store import icon_store
+from settings import EnvSetting
+
+
+def get_domain(url):
+    """
+    Return the domain of a URL.
+
+    Parameters:
+        url (str): The full URL of a website.
+
+    Returns:
+        str or None: The URL's domain, or None if it has none.
+    """
+    try:
+        return urlparse(url).netloc or None
+    except ValueError:
+        return None
+
+
+class IconResolver:
+    """
+    Resolves website logos through the icon store, once per domain.
+
+    Lookups run on a bounded thread pool and found logos are remembered per domain, so importing many
+    logins for the same site costs one download. Missing logos are remembered by the store, and the
+    downloaded logos stay in it, to be served from the app's own /icons route.
+
+    Attributes:
+        store (IconStore): The store downloading and keeping the logos.
+        max_workers (int): Maximum number of concurrent logo lookups.
+    """
+    max_workers = EnvSetting("LOGO_WORKERS", 8, int)
+
+    def __init__(self, store=None, max_workers=None, max_entries=10000):
+        """
+        Initialize the icon resolver.
+
+        Parameters:
+            store (IconStore or None): The icon store. Defaults to the shared icon store.
+            max_workers (int or None): Maximum number of concurrent lookups. Defaults to LOGO_WORKERS.
+            max_entries (int): Maximum number of remembered domains.
+        """
+        self.store = store or icon_store
+        self.max_workers = max_workers
+        self.max_entries = max_entries
+        self._resolved = {}
+        self._lock = threading.Lock()
+
+    def resolve(self, domain):
+        """
+        Return the logo URL of a domain.
+
+        Parameters:
+            domain (str): The website's domain.
+
+        Returns:
+            str or None: The logo URL if the logo service has one, otherwise None.
+        """
+        with self._lock:
+            if domain in self._resolved:
+                return self._resolved[domain]
+
+        # Download the logo into the store, remembering the service URL it came from.
+        icon = f"{self.store.base_url}/{domain}" if self.store.get(domain) is not None else None
+
+        if icon:
+            with self._lock:
+                if len(self._resolved) >= self.max_entries:
+                    self._resolved.clear()
+                self._resolved[domain] = icon
+        return icon
+
+    def resolve_url(self, url):
+        """
+        Return the logo URL for the domain of a website URL.
+
+        Parameters:
+            url (str): The full URL of the website.
+
+        Returns:
+            str or None: The logo URL if found, otherwise None.
+        """
+        domain = get_domain(url)
+        return self.resolve(domain) if domain else None
+
+    def resolve_many(self, domains):
+        """
+        Resolve the logos of many domains concurrently, looking each domain up once.
+
+        Parameters:
+            domains (iterable): The domains to resolve. Duplicates are looked up once.
+
+        Returns:
+            dict: Maps each domain to its logo URL, or None if it has none.
+        """
+        domains = list(set(domains))
+        if not domains:
+            return {}
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(domains))) as pool:
+            return dict(zip(domains, pool.map(self.resolve, domains)))
+
+    def fill_icons(self, user_id):
+        """
+        Resolve and store the icons of a user's accounts that don't have one yet.
+
+        Must run inside an application context.
+
+        Parameters:
+            user_id (int): The ID of the user.
+
+        Returns:
+            int: The number of accounts that received an icon.
+        """
+        accounts = get_accounts_without_icon(user_id)
+        icons = self.resolve_many(domain for domain in (get_domain(url) for _, url in accounts) if domain)
+        updates = {}
+        for account_id, url in accounts:
+            icon = icons.get(get_domain(url))
+            if icon:
+                updates[account_id] = icon
+        if updates:
+            update_icons(updates, commit=False)
+            bump_vault_version(user_id)
+        return len(updates)
+
+    def fill_icons_async(self, app, user_id):
+        """
+        Fill in a user's missing icons in a background thread.
+
+        Parameters:
+            app (Flask): The Flask application, used to push an application context in the thread.
+            user_id (int): The ID of the user.
+
+        Returns:
+            threading.Thread: The started thread.
+        """
+        def run():
+            with app.app_context():
+                try:
+                    self.fill_icons(user_id)
+                except Exception as e:
+                    print(f"Error filling icons for user {user_id}: {e}")
+
+        thread = threading.Thread(target=run, name="icon-resolver", daemon=True)
+        thread.start()
+        return thread
+
+
+# Icon resolver shared by the application.
+icon_resolver = IconResolver()
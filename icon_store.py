@@ -0,0 +1,174 @@
+# Import modules.
+import hashlib
+import os
+import re
+import threading
+import time
+from http_session import ThreadLocalSession
+from metrics import metrics
+from settings import EnvSetting
+
+# Domains that may be stored, optionally with a port.
+DOMAIN_PATTERN = re.compile(r"^[a-z0-9-]+(\.[a-z0-9-]+)*(:\d{1,5})?$")
+
+# Magic bytes of the image types the logo service returns.
+IMAGE_SIGNATURES = [
+    (b"\x89PNG", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"GIF8", "image/gif"),
+    (b"\x00\x00\x01\x00", "image/x-icon"),
+    (b"RIFF", "image/webp"),
+]
+
+
+def guess_mimetype(data):
+    """
+    Guess the image type of a logo from its first bytes.
+
+    Parameters:
+        data (bytes): The image data.
+
+    Returns:
+        str: The image's MIME type.
+    """
+    for signature, mimetype in IMAGE_SIGNATURES:
+        if data.startswith(signature):
+            return mimetype
+    if b"<svg" in data[:512]:
+        return "image/svg+xml"
+    return "application/octet-stream"
+
+
+class IconStore:
+    """
+    A server-side store of website logos, downloaded once per domain and kept on disk.
+
+    Logos are saved as one file per domain. Domains without a logo get a '.miss' marker, so they are
+    not requested again until the marker is older than miss_ttl.
+
+    Attributes:
+        directory (str): The directory holding the logo files.
+        base_url (str): The base URL of the logo service.
+        timeout (float): Number of seconds to wait for the logo service.
+        miss_ttl (float): Number of seconds a domain without a logo is remembered.
+    """
+    directory = EnvSetting("ICON_STORE_PATH",
+                           os.path.join(os.path.dirname(os.path.abspath(__file__)), "instance", "icons"))
+    base_url = EnvSetting("LOGO_API_URL", "https://logo.clearbit.com", lambda url: url.rstrip('/'))
+    timeout = EnvSetting("LOGO_API_TIMEOUT", 5, float)
+    miss_ttl = EnvSetting("ICON_MISS_TTL", 24 * 3600, float)
+
+    def __init__(self, directory=None, base_url=None, timeout=None, miss_ttl=None):
+        """
+        Initialize the icon store. Its directory is created when the first logo or miss marker is stored.
+
+        Parameters:
+            directory (str or None): The directory holding the logo files. Defaults to ICON_STORE_PATH
+                                     (instance/icons).
+            base_url (str or None): The base URL of the logo service. Defaults to LOGO_API_URL.
+            timeout (float or None): Number of seconds to wait for a response. Defaults to LOGO_API_TIMEOUT.
+            miss_ttl (float or None): Seconds to remember missing logos. Defaults to ICON_MISS_TTL.
+        """
+        self.directory = directory
+        self.base_url = base_url
+        self.timeout = timeout
+        self.miss_ttl = miss_ttl
+        self._etags = {}
+        self._http = ThreadLocalSession()
+
+    @staticmethod
+    def normalize_domain(domain):
+        """
+        Validate and normalize a domain before it is used as a file name.
+
+        Parameters:
+            domain (str): The website's domain.
+
+        Returns:
+            str or None: The lowercase domain, or None if it is not a valid domain.
+        """
+        domain = (domain or "").strip().lower()
+        return domain if DOMAIN_PATTERN.match(domain) else None
+
+    def _path(self, domain, suffix=""):
+        """
+        Return the path of a domain's logo file or miss marker.
+
+        Parameters:
+            domain (str): The normalized domain.
+            suffix (str): An optional file suffix, such as '.miss'.
+
+        Returns:
+            str: The file path.
+        """
+        return os.path.join(self.directory, domain.replace(":", "_") + suffix)
+
+    def _download(self, domain):
+        """
+        Download a domain's logo and store it on disk, or store a miss marker.
+
+        Parameters:
+            domain (str): The normalized domain.
+
+        Returns:
+            bytes or None: The logo data, or None if the logo service has no logo for the domain.
+        """
+        try:
+            with metrics.timer("logo_api"):
+                response = self._http.session().get(f"{self.base_url}/{domain}", timeout=self.timeout)
+        except Exception as e:
+            # Don't remember network errors; the next request may succeed.
+            print(f"Error retrieving logo for {domain}: {e}")
+            return None
+
+        os.makedirs(self.directory, exist_ok=True)
+        if response.status_code != 200 or not response.content:
+            with open(self._path(domain, ".miss"), "w"):
+                pass
+            return None
+
+        # Write to a temporary file first, so readers never see a partial logo.
+        tmp_path = self._path(domain, f".{threading.get_ident()}.tmp")
+        with open(tmp_path, "wb") as file:
+            file.write(response.content)
+        os.replace(tmp_path, self._path(domain))
+        return response.content
+
+    def get(self, domain, download=True):
+        """
+        Return a domain's logo, downloading it on the first request.
+
+        Parameters:
+            domain (str): The website's domain.
+            download (bool): Whether to download a logo that isn't stored yet, or only read the store.
+
+        Returns:
+            tuple or None: The logo data, its MIME type and its strong ETag, or None if there is no logo.
+        """
+        domain = self.normalize_domain(domain)
+        if domain is None:
+            return None
+
+        path = self._path(domain)
+        try:
+            with open(path, "rb") as file:
+                data = file.read()
+        except FileNotFoundError:
+            miss_path = self._path(domain, ".miss")
+            if not download or (os.path.exists(miss_path)
+                                and time.time() - os.path.getmtime(miss_path) < self.miss_ttl):
+                return None
+            data = self._download(domain)
+            if data is None:
+                return None
+
+        # Hash each logo once per version of its file.
+        mtime = os.path.getmtime(path)
+        cached = self._etags.get(domain)
+        if cached is None or cached[0] != mtime:
+            cached = self._etags[domain] = (mtime, hashlib.sha256(data).hexdigest()[:32])
+        return data, guess_mimetype(data), cached[1]
+
+
+# Icon store shared by the application.
+icon_store = IconStore()
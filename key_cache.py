@@ -0,0 +1,113 @@
+# Import modules.
+from settings import EnvSetting
+from ttl_cache import TTLCache
+
+
+class KeyCache(TTLCache):
+    """
+    A process-wide cache for decrypted AES keys with TTL expiry and LRU eviction.
+
+    Keys are cached per (user ID, key source) pair, where the key source identifies where the key
+    was unwrapped from (for example the path of the browser's Local State file). This avoids re-reading
+    and re-unwrapping the key on every PasswordManager construction.
+
+    Each key is cached with the version of the user's stored key, which the caller passes on every
+    lookup, read from the database or from the signed-in user's cached profile. When another process
+    replaces the key, the version changes and the cached key is reloaded instead of being used until
+    its TTL elapses.
+
+    Attributes:
+        ttl (float): Number of seconds a cached key stays valid.
+        max_entries (int): Maximum number of keys kept before the least recently used one is evicted.
+    """
+    ttl = EnvSetting("KEY_CACHE_TTL", 300, float)
+    max_entries = EnvSetting("KEY_CACHE_SIZE", 128, int)
+
+    def __init__(self, ttl=None, max_entries=None):
+        """
+        Initialize an empty key cache.
+
+        Parameters:
+            ttl (float or None): Number of seconds a cached key stays valid. Defaults to KEY_CACHE_TTL (300).
+            max_entries (int or None): Maximum number of keys kept in the cache. Defaults to KEY_CACHE_SIZE (128).
+        """
+        super().__init__(ttl=ttl, max_entries=max_entries)
+
+    def get(self, user_id, source, version=None):
+        """
+        Return a cached key for the given user and key source.
+
+        Parameters:
+            user_id (int or None): The ID of the user owning the key.
+            source (str or None): The key source, such as the Local State path.
+            version (int or None): The current version of the user's stored key.
+
+        Returns:
+            bytes or None: The cached key, or None if it is missing, expired or of another version.
+        """
+        entry = self.lookup((user_id, source), lambda entry: entry[1] == version)
+        return entry[0] if entry else None
+
+    def get_or_load(self, user_id, source, loader, version=None):
+        """
+        Return a cached key, loading and caching it on a miss.
+
+        Parameters:
+            user_id (int or None): The ID of the user owning the key.
+            source (str or None): The key source, such as the Local State path.
+            loader (callable): A function without arguments that returns the key or None.
+            version (int or None): The current version of the user's stored key. A key cached under
+                                   another version is reloaded.
+
+        Returns:
+            bytes or None: The key, or None if the loader could not provide one.
+        """
+        def load():
+            key = loader()
+            return (key, version) if key is not None else None
+
+        entry = self.load((user_id, source), load, lambda entry: entry[1] == version)
+        return entry[0] if entry else None
+
+    def put(self, user_id, source, key, version=None):
+        """
+        Store a key in the cache, evicting the least recently used entry if the cache is full.
+
+        Parameters:
+            user_id (int or None): The ID of the user owning the key.
+            source (str or None): The key source, such as the Local State path.
+            key (bytes): The decrypted AES key.
+            version (int or None): The version of the user's stored key.
+        """
+        self.store((user_id, source), (key, version))
+
+    def invalidate(self, user_id=None, source=None):
+        """
+        Remove cached keys matching the given user and/or key source.
+
+        Calling this without arguments clears the whole cache.
+
+        Parameters:
+            user_id (int or None): Only remove keys belonging to this user.
+            source (str or None): Only remove keys loaded from this source.
+
+        Returns:
+            int: The number of removed keys.
+        """
+        return self.discard(lambda cache_key: (user_id is None or cache_key[0] == user_id)
+                            and (source is None or cache_key[1] == source))
+
+    def stats(self):
+        """
+        Return the cache counters.
+
+        Returns:
+            dict: The number of hits, misses, evictions, expirations and currently cached keys.
+        """
+        counters = self.counters()
+        return {"hits": counters["hits"], "misses": counters["misses"], "evictions": counters["evictions"],
+                "expirations": counters["expirations"], "size": counters["entries"]}
+
+
+# Process-wide key cache shared by all PasswordManager instances.
+key_cache = KeyCache()
@@ -0,0 +1,123 @@
+# Import modules.
+import base64
+import json
+import os
+
+
+class DpapiKeyProvider:
+    """
+    Unwraps a browser's AES key from its Local State file with Windows DPAPI.
+
+    win32crypt is only imported when a key is unwrapped, so the application still imports, and serves
+    users whose key is already stored, on systems without it.
+    """
+    name = "dpapi"
+
+    def source(self, browser):
+        """
+        Return the path of the browser's Local State file, which holds the wrapped AES key.
+
+        Parameters:
+            browser (str or None): The browser ('Chrome', 'Microsoft Edge').
+
+        Returns:
+            str or None: The Local State path configured for the browser, or None if it is not set.
+        """
+        if browser in ["Chrome", None]:
+            return os.getenv('CHROME_LOCAL_STATE_PATH')
+        return os.getenv('EDGE_LOCAL_STATE_PATH')
+
+    def load_key(self, browser):
+        """
+        Read and unwrap the browser's AES key.
+
+        Parameters:
+            browser (str or None): The browser ('Chrome', 'Microsoft Edge').
+
+        Returns:
+            bytes or None: The AES key, or None if no Local State file is configured.
+        """
+        local_state_path = self.source(browser)
+        if not local_state_path:
+            return None
+
+        # Open and load the Local State file to retrieve the encrypted key.
+        with open(local_state_path, "r", encoding="utf-8") as file:
+            local_state = json.load(file)
+
+        # Base64 decode the encrypted AES key and remove its 'DPAPI' prefix (first 5 bytes).
+        encrypted_key = base64.b64decode(local_state["os_crypt"]["encrypted_key"])[5:]
+
+        # Use CryptUnprotectData to decrypt the AES key.
+        import win32crypt
+        return win32crypt.CryptUnprotectData(encrypted_key, None, None, None, 0)[1]
+
+
+class FileKeyProvider:
+    """
+    Reads a browser's AES key from a key file holding the base64-encoded key.
+
+    For systems without DPAPI, such as Linux servers, where the key is provisioned as a file with
+    permissions restricted to the application's user.
+    """
+    name = "file"
+
+    def source(self, browser):
+        """
+        Return the path of the browser's key file.
+
+        Parameters:
+            browser (str or None): The browser ('Chrome', 'Microsoft Edge').
+
+        Returns:
+            str or None: The key file path configured for the browser, or None if it is not set.
+        """
+        if browser in ["Chrome", None]:
+            return os.getenv('CHROME_KEY_PATH')
+        return os.getenv('EDGE_KEY_PATH')
+
+    def load_key(self, browser):
+        """
+        Read the browser's AES key.
+
+        Parameters:
+            browser (str or None): The browser ('Chrome', 'Microsoft Edge').
+
+        Returns:
+            bytes or None: The AES key, or None if no key file is configured.
+        """
+        key_path = self.source(browser)
+        if not key_path:
+            return None
+
+        with open(key_path, "r", encoding="utf-8") as file:
+            key = base64.b64decode(file.read().strip())
+        if len(key) not in (16, 24, 32):
+            raise ValueError(f"The key in {key_path} is {len(key)} bytes long, not an AES key")
+        return key
+
+
+# Key providers by the names KEY_PROVIDER accepts.
+KEY_PROVIDERS = {provider.name: provider for provider in (DpapiKeyProvider, FileKeyProvider)}
+
+# Shared key provider, created on first use.
+_key_provider = None
+
+
+def get_key_provider():
+    """
+    Return the provider that loads the browsers' AES keys.
+
+    The provider is chosen by KEY_PROVIDER: 'dpapi' unwraps the key from the browser's Local State file
+    and is the default on Windows, 'file' reads it from a key file and is the default elsewhere.
+
+    Returns:
+        DpapiKeyProvider or FileKeyProvider: The shared key provider.
+    """
+    global _key_provider
+    if _key_provider is None:
+        name = os.getenv("KEY_PROVIDER", "dpapi" if os.name == "nt" else "file")
+        if name not in KEY_PROVIDERS:
+            raise ValueError(f"Unsupported key provider: {name!r}")
+        _key_provider = KEY_PROVIDERS[name]()
+    return _key_provider
@@ -1,94 +1,179 @@
 # Import modules.
+import hashlib
 import os
-import sqlite3
+import re
+import time
 from datetime import datetime
 from urllib.parse import urlparse
-from flask import Flask, render_template, redirect, url_for, flash, request
+from flask import (Flask, Blueprint, render_template, redirect, url_for, flash, request, jsonify, Response,
+                   session, make_response, g, has_request_context, abort, current_app, stream_with_context)
 from flask_bootstrap import Bootstrap5
-from flask_login import UserMixin, login_user, LoginManager, current_user, logout_user
-from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy.orm import relationship, DeclarativeBase, Mapped, mapped_column
-from sqlalchemy import Integer, String, Boolean, UniqueConstraint
+from jinja2 import FileSystemBytecodeCache
+from markupsafe import Markup
+from sqlalchemy import event
+from flask_login import login_user, LoginManager, current_user, logout_user
 from functools import wraps
-from werkzeug.security import generate_password_hash, check_password_hash
-from forms import RegisterForm, LoginForm, EditVaultForm
-from password_input import PasswordInput, get_clearbit_logo
+from forms import RegisterForm, LoginForm, EditVaultForm, ExportForm, AdminRekeyForm
+from models import db, User, Account, BreachJob
+from data_access import (get_user_ids, get_user_profile, list_accounts, search_accounts, get_vault_version,
+                         bump_vault_version, can_write_vault, update_breach_results, has_account_on_domain)
+from password_input import PasswordInput
+from icon_resolver import icon_resolver, get_domain
+from icon_store import icon_store
 from password_manager import PasswordManager
-from password_breached import PasswordBreached
+from breach_scanner import BreachScanner, is_scan_fresh
+from key_cache import key_cache
+from password_hashing import password_policy, calibrate_password_hash
+from user_cache import user_cache, CachedUser
+from fragment_cache import fragment_cache
+from schema import upgrade_schema, migrate_command
+from sqlite_tuning import sqlite_tuning
+from metrics import metrics
+from breach_jobs import job_runner
+from vault_export import export_vault, export_filename
+from vault_rekey import rekey_vaults_command, rekey_users_async, latest_rekey_reports, database_uri
 from dotenv import load_dotenv
 
-# Initialize the Flask application and Bootstrap extension.
-load_dotenv()
-app = Flask(__name__)
-app.config['SECRET_KEY'] = os.getenv("SECRET_KEY")
-Bootstrap5(app)
+# Routes of the application, registered on it by create_app().
+views = Blueprint("views", __name__)
 
 # Set up the login manager.
 login_manager = LoginManager()
-login_manager.init_app(app)
 
+# Shown when a vault can't be changed because its key is being or was just rotated.
+VAULT_LOCKED_MESSAGE = "Your vault is being re-encrypted under a new key. Please try again in a moment."
 
-# Define the base model class for the database.
-class Base(DeclarativeBase):
-    pass
 
+def create_app(config=None):
+    """
+    Create and configure the Flask application.
 
-# Set up the SQLAlchemy database connection.
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///pwmanager.db'
-db = SQLAlchemy(model_class=Base)
-db.init_app(app)
-
-
-# Define the User model.
-class User(UserMixin, db.Model):
-    __tablename__ = "users"
-    id: Mapped[int] = mapped_column(Integer, primary_key=True)
-    email: Mapped[str] = mapped_column(String(100), unique=True)
-    password: Mapped[str] = mapped_column(String(100))
-    name: Mapped[str] = mapped_column(String(100))
-    browser: Mapped[str] = mapped_column(String(100))
-    encrypted_key: Mapped[bytes] = mapped_column(db.LargeBinary, nullable=True)
-    accounts = relationship("Account", back_populates="parent_user")
-
+    Creating the app does no slow work: the database schema is created and upgraded by the explicit
+    `flask --app main migrate` step, and the browser key provider, HTTP clients and breach backend are set
+    up on first use. Server workers therefore boot quickly, and an app created in a preloading master
+    holds no database connections or threads that forked workers would share.
 
-# Define the Account model.
-class Account(db.Model):
-    __tablename__ = "accounts"
-    id: Mapped[int] = mapped_column(Integer, primary_key=True)
-    user_id: Mapped[int] = mapped_column(Integer, db.ForeignKey("users.id"))
-    url: Mapped[str] = mapped_column(String(100))
-    full_url: Mapped[str] = mapped_column(String(100))
-    icon: Mapped[str] = mapped_column(String(100), nullable=True)
-    username: Mapped[str] = mapped_column(String(100))
-    password: Mapped[str] = mapped_column(db.LargeBinary)
-    browser: Mapped[str] = mapped_column(String(100))
-    is_breached: Mapped[bool] = mapped_column(Boolean, nullable=True)
-    date_created: Mapped[int] = mapped_column(Integer, nullable=False)
-    date_last_used: Mapped[int] = mapped_column(Integer, nullable=False)
-    date_password_modified: Mapped[int] = mapped_column(Integer, nullable=False)
+    Parameters:
+        config (dict or None): Settings overriding those read from the environment.
 
-    __table_args__ = (UniqueConstraint('user_id', 'full_url', 'username', name='unique_user_url_username'),)
-    parent_user = relationship("User", back_populates="accounts")
+    Returns:
+        Flask: The application.
+    """
+    load_dotenv()
+    app = Flask(__name__)
+    app.config['SECRET_KEY'] = os.getenv("SECRET_KEY")
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv("DATABASE_URL", 'sqlite:///pwmanager.db')
+    app.config.update(config or {})
+    Bootstrap5(app)
+    login_manager.init_app(app)
+    db.init_app(app)
+
+    # Cache the compiled templates on disk, so new workers load them instead of compiling them again.
+    template_cache_path = os.getenv("TEMPLATE_CACHE_PATH", os.path.join(app.instance_path, "template_cache"))
+    if template_cache_path:
+        os.makedirs(template_cache_path, exist_ok=True)
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(template_cache_path)
+
+    # Apply the SQLite performance pragmas to every database connection.
+    sqlite_tuning.init_app(app, db)
+
+    # Time requests, queries and template renders, and export them with the caches' counters at /metrics.
+    metrics.init_app(app, db, timings_allowed=is_admin)
+    metrics.add_gauge_source("key_cache", key_cache.stats)
+    metrics.add_gauge_source("user_cache", user_cache.stats)
+    metrics.add_gauge_source("fragment_cache", fragment_cache.stats)
+    metrics.add_gauge_source("sqlite", sqlite_tuning.stats)
+
+    # Register the routes, and count the users-table queries of each request.
+    app.register_blueprint(views)
+    app.after_request(add_users_queries_header)
+    with app.app_context():
+        event.listen(db.engine, "before_cursor_execute", count_users_queries)
+
+    # Register the commands migrating the database, calibrating the password hash policy and rotating vault keys.
+    app.cli.add_command(migrate_command)
+    app.cli.add_command(calibrate_password_hash)
+    app.cli.add_command(rekey_vaults_command)
+
+    # Bind the background job runner; each process resumes unfinished breach scans on its first request.
+    job_runner.init_app(app, db, BreachJob, scan_vault)
+
+    # Close the connections opened while creating the app, so forked workers open their own.
+    with app.app_context():
+        db.engine.dispose()
+    return app
 
 
 # Define the user loader callback for Flask-Login.
 @login_manager.user_loader
 def load_user(user_id):
     """
-    Load a user by their user ID.
+    Load a user's profile by their user ID.
+
+    Profiles are served from the user cache, so most requests don't query the users table.
+
+    Parameters:
+        user_id (str): The ID of the user to load.
+
+    Returns:
+        CachedUser or None: The user's profile, or None if the user does not exist.
+    """
+    def load_profile():
+        profile = get_user_profile(int(user_id))
+        return CachedUser(*profile) if profile is not None else None
+
+    return user_cache.get_or_load(int(user_id), load_profile)
+
+
+# Statements that read or write the users table.
+USERS_QUERY_PATTERN = re.compile(r"\b(FROM|UPDATE|INTO|JOIN)\s+\"?users\b", re.IGNORECASE)
+
+
+def count_users_queries(conn, cursor, statement, parameters, context, executemany):
+    """
+    Count the statements on the users table issued while handling the current request.
+
+    Registered as a SQLAlchemy before_cursor_execute listener.
+    """
+    if has_request_context() and USERS_QUERY_PATTERN.search(statement):
+        g.users_queries = g.get("users_queries", 0) + 1
+
+
+# Report the number of users-table queries of each request.
+def add_users_queries_header(response):
+    """
+    Add the number of users-table queries issued by the request as the X-Users-Queries header.
+
+    Registered as an after_request function by create_app().
 
     Parameters:
-        user_id (int): The ID of the user to load.
+        response (Response): The response.
 
     Returns:
-        User: The user instance or a 404 error if not found.
+        Response: The response with the header added.
     """
-    return db.get_or_404(User, user_id)
+    response.headers["X-Users-Queries"] = str(g.get("users_queries", 0))
+    return response
 
 
-# Create the database if it doesn't exist.
-with app.app_context():
-    db.create_all()
+# Template filter pointing account icons at the local icon route.
+@views.app_template_filter('icon_src')
+def icon_src(account):
+    """
+    Return the local URL of an account's icon.
+
+    Icons are served from the app's own /icons route instead of the logo service, so vault pages
+    load entirely from this origin.
+
+    Parameters:
+        account (Account, Row or None): The account to show the icon of, with its icon and full_url.
+
+    Returns:
+        str: The URL of the icon, or an empty string if there is no account or it has no icon.
+    """
+    if account is None or not account.icon or not get_domain(account.full_url):
+        return ""
+    return url_for('views.serve_icon', domain=get_domain(account.full_url))
 
 
 # Decorator to check if a user is signed in.
@@ -106,13 +191,13 @@ def signed_in(f):
     def decorated_function(*args, **kwargs):
         if not current_user.is_authenticated:
             flash("Please log in to access this page.", "warning")
-            return redirect(url_for('login'))
+            return redirect(url_for('views.login'))
         return f(*args, **kwargs)
     return decorated_function
 
 
 # Register a new user account.
-@app.route('/register', methods=["GET", "POST"])
+@views.route('/register', methods=["GET", "POST"])
 def register():
     """
     Register a new user.
@@ -133,13 +218,9 @@ def register():
 
         if user:
             flash("You've already signed up with that email, log in instead!", "failure")
-            return redirect(url_for('login'))
+            return redirect(url_for('views.login'))
 
-        has_and_salted_password = generate_password_hash(
-            password=form.password1.data,
-            method="pbkdf2:sha256",
-            salt_length=8
-        )
+        has_and_salted_password = password_policy.hash(form.password1.data)
 
         new_user = User(
             email=form.email.data,
@@ -151,23 +232,24 @@ def register():
         db.session.commit()
         login_user(new_user)
 
-        if app.config['SQLALCHEMY_DATABASE_URI']:
+        if current_app.config['SQLALCHEMY_DATABASE_URI']:
             password_input.import_browser()
             password_input.insert_data()
 
-        return redirect(url_for("all_vaults"))
+        return redirect(url_for("views.all_vaults"))
 
     return render_template("register.html", current_user=current_user, form=form)
 
 
 # Log in an existing user.
-@app.route('/', methods=["GET", "POST"])
+@views.route('/', methods=["GET", "POST"])
 def login():
     """
     Log in an existing user.
 
-    If login is successful, redirect to the vaults page. If the credentials are incorrect,
-    display an error message and reload the login page.
+    If login is successful, redirect to the vaults page, rehashing the password first if its stored hash
+    is weaker than the current hashing policy. If the credentials are incorrect, display an error message
+    and reload the login page.
 
     Returns:
         render_template (str): Renders the login page with the form if GET request,
@@ -182,19 +264,23 @@ def login():
 
         if not user:
             flash("That email does not exist, please try again.", "failure")
-            return redirect(url_for('login'))
-        elif not check_password_hash(user.password, password):
+            return redirect(url_for('views.login'))
+        elif not password_policy.verify(user.password, password):
             flash("Password incorrect, please try again.", "failure")
-            return redirect(url_for('login'))
+            return redirect(url_for('views.login'))
         else:
+            # Upgrade hashes created under a weaker policy while the plaintext password is at hand.
+            if password_policy.needs_rehash(user.password):
+                user.password = password_policy.hash(password)
+                db.session.commit()
             login_user(user)
-            return redirect(url_for('all_vaults'))
+            return redirect(url_for('views.all_vaults'))
 
     return render_template("login.html", form=form, current_user=current_user)
 
 
 # Log out the user.
-@app.route('/logout')
+@views.route('/logout')
 def logout():
     """
     Log out the current user and redirect to the login page.
@@ -202,70 +288,228 @@ def logout():
     Returns:
         redirect (str): Redirects to the login page after logging out.
     """
+    if current_user.is_authenticated:
+        key_cache.invalidate(user_id=current_user.id)
+        user_cache.invalidate(current_user.id)
     logout_user()
-    return redirect(url_for("login"))
+    return redirect(url_for("views.login"))
+
+
+def render_vault_page(referrer, breached_only=False):
+    """
+    Render one page of the signed-in user's vault list.
+
+    The page is selected with the 'after' query parameter, the last account ID of the previous page, and
+    holds 'size' accounts, VAULT_PAGE_SIZE by default and at most VAULT_MAX_PAGE_SIZE.
+
+    The card grid is cached per user, vault version and page, so it is only queried and rendered again
+    after the vault changed. The page's ETag is derived from the same key, so repeat visits to an
+    unchanged page get a 304 response without touching the accounts.
+
+    Parameters:
+        referrer (str): The endpoint rendering the page, used for the links back to it.
+        breached_only (bool): Whether to only list accounts marked as breached.
+
+    Returns:
+        Response: The all vaults page, or a 304 response if the browser's copy is current.
+    """
+    default_size = int(os.getenv("VAULT_PAGE_SIZE", 50))
+    max_size = int(os.getenv("VAULT_MAX_PAGE_SIZE", 500))
+    size = min(max(request.args.get('size', default_size, type=int), 1), max_size)
+    after = request.args.get('after', type=int)
+    key = (current_user.id, get_vault_version(current_user.id), referrer, after, request.args.get('size'))
+    etag = hashlib.sha256(repr(key).encode()).hexdigest()[:32]
+
+    # Pages showing a flashed message are neither revalidated nor tagged, so the message isn't replayed.
+    has_flashes = bool(session.get('_flashes'))
+    if not has_flashes and request.if_none_match.contains(etag):
+        response = Response(status=304)
+        response.set_etag(etag)
+        return response
+
+    def render_cards():
+        accounts, next_after = list_accounts(current_user.id, after=after, size=size, breached_only=breached_only)
+        next_url = url_for(f"views.{referrer}", after=next_after, size=request.args.get('size')) if next_after else None
+        first_url = url_for(f"views.{referrer}", size=request.args.get('size')) if after is not None else None
+        return render_template("vault_cards.html", accounts=accounts, referrer=referrer,
+                               next_url=next_url, first_url=first_url)
+
+    cards = Markup(fragment_cache.get_or_render(key, render_cards))
+    response = make_response(render_template("all_vaults.html", current_user=current_user, cards=cards))
+    if not has_flashes:
+        response.set_etag(etag)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
 
 
 # Display all vaults for the signed-in user.
+@views.route('/vaults')
 @signed_in
-@app.route('/vaults')
 def all_vaults():
     """
-    Display all vaults (accounts) for the signed-in user.
+    Display one page of the vaults (accounts) of the signed-in user.
 
     Returns:
-        render_template (str): Renders the all vaults page showing the user's accounts.
+        render_template (str): Renders the all vaults page showing a page of the user's accounts.
     """
-    result = db.session.execute(db.select(Account).where(Account.user_id == current_user.id))
-    accounts = result.scalars().all()
-    return render_template("all_vaults.html", current_user=current_user,
-                           accounts=accounts, referrer="all_vaults")
+    return render_vault_page("all_vaults")
+
 
+def scan_vault(user_id, progress=None):
+    """
+    Check a user's accounts for breached passwords and store the results.
 
-# Check for breached vaults and update the status.
+    Accounts whose password fingerprint is unchanged and that were checked within the
+    BREACH_RECHECK_INTERVAL are skipped. All updates are written in a single transaction.
+
+    Parameters:
+        user_id (int): The ID of the user whose vault is scanned.
+        progress (callable or None): Called as progress(done, total) while the scan runs.
+
+    Returns:
+        tuple: The number of checked, skipped and breached accounts.
+    """
+    # Plain rows rather than Account objects, since the results are written with one batched UPDATE.
+    accounts = db.session.execute(
+        db.select(Account.id, Account.browser, Account.is_breached, Account.date_breach_checked,
+                  Account.date_password_modified, Account.breach_fingerprint).where(Account.user_id == user_id)
+    ).all()
+    now = int(time.time())
+    max_age = int(os.getenv("BREACH_RECHECK_INTERVAL", 7 * 24 * 3600))
+
+    # Decrypt the vault in bulk, one batch per browser key, and skip accounts that are still fresh.
+    passwords = {}
+    fingerprints = {}
+    for browser in {account.browser for account in accounts}:
+        manager = PasswordManager(browser, user_id)
+        browser_accounts = {account.id: account for account in accounts if account.browser == browser}
+        for account_id, (password, error) in manager.decrypt_many(user_id, list(browser_accounts)).items():
+            if error:
+                print(error)
+                passwords[account_id] = None
+                continue
+
+            fingerprint = manager.fingerprint_password(password)
+            if not is_scan_fresh(browser_accounts[account_id], fingerprint, now, max_age):
+                passwords[account_id] = password
+                fingerprints[account_id] = fingerprint
+
+    # Check the remaining passwords concurrently and store the results in one transaction.
+    skipped = len(accounts) - len(passwords)
+
+    def report_progress(done, _):
+        if progress:
+            progress(skipped + done, len(accounts))
+
+    report_progress(0, len(passwords))
+    results = BreachScanner().scan(passwords, report_progress)
+    updates = []
+    for account_id, is_breached in results.items():
+        update = {"id": account_id, "is_breached": is_breached}
+        if is_breached is not None:
+            update.update(date_breach_checked=now, breach_fingerprint=fingerprints[account_id])
+        updates.append(update)
+    update_breach_results(updates, commit=False)
+    bump_vault_version(user_id, commit=False)
+    db.session.commit()
+
+    breached = sum(1 for account in accounts if results.get(account.id, account.is_breached))
+    return len(results), skipped, breached
+
+
+# Start a background check for breached vaults.
+@views.route('/check_breaches')
 @signed_in
-@app.route('/check_breaches')
 def check_breaches():
     """
-    Check for any breached passwords for the user's accounts and update the breach status.
+    Start a background scan of the user's accounts for breached passwords.
+
+    If a scan for the user is already queued or running, no new scan is started.
+    The vaults page polls the scan's progress and reloads when it finishes.
 
     Returns:
-        redirect (str): Redirects to the all vaults page after updating breach statuses.
+        redirect (str): Redirects to the all vaults page.
     """
-    result = db.session.execute(db.select(Account).where(Account.user_id == current_user.id))
-    accounts = result.scalars().all()
+    job_runner.submit(current_user.id)
+    bump_vault_version(current_user.id)
+    flash('Checking your vaults for breaches in the background.', 'success')
+    return redirect(url_for('views.all_vaults'))
 
-    for account in accounts:
-        password_breached = PasswordBreached(account.browser, current_user.id, account.id)
-        is_breached = password_breached.check_password_pwned()
-        account.is_breached = is_breached
-        db.session.commit()
 
-    flash('Breached vaults have been checked and updated.', 'success')
-    return redirect(url_for('all_vaults'))
+# Report the progress of the latest breach scan.
+@views.route('/check_breaches/status')
+@signed_in
+def breach_scan_status():
+    """
+    Report the progress of the user's most recent breach scan.
+
+    Returns:
+        Response: JSON with the scan's status, progress, breached count and estimated seconds left.
+    """
+    job = job_runner.latest_job(current_user.id)
+    if job is None:
+        return jsonify(status=None)
+
+    eta = None
+    if job.status == "running" and job.done and job.date_started:
+        elapsed = time.time() - job.date_started
+        eta = round(elapsed / job.done * (job.total - job.done), 1)
+
+    return jsonify(id=job.id, status=job.status, done=job.done, total=job.total,
+                   skipped=job.skipped, breached=job.breached, eta=eta)
 
 
 # Display only breached vaults.
+@views.route('/breached_vaults')
 @signed_in
-@app.route('/breached_vaults')
 def breached_vaults():
     """
-    Display only the vaults (accounts) that have been marked as breached.
+    Display one page of the vaults (accounts) that have been marked as breached.
 
     Returns:
-        render_template (str): Renders the all vaults page showing only breached accounts.
+        render_template (str): Renders the all vaults page showing a page of breached accounts.
+    """
+    return render_vault_page("breached_vaults", breached_only=True)
+
+
+# Search the vaults of the signed-in user.
+@views.route('/vaults/search')
+@signed_in
+def search_vaults():
+    """
+    Display the vaults (accounts) whose URL or username match the search text.
+
+    Returns:
+        render_template (str): Renders the all vaults page showing the matching accounts.
+    """
+    search = request.args.get('q', '')
+    accounts = search_accounts(current_user.id, search, limit=int(os.getenv("VAULT_PAGE_SIZE", 50)))
+    cards = Markup(render_template("vault_cards.html", accounts=accounts, referrer="all_vaults"))
+    return render_template("all_vaults.html", current_user=current_user, cards=cards, search=search)
+
+
+# Search the vaults of the signed-in user as they type.
+@views.route('/vaults/search.json')
+@signed_in
+def search_vaults_json():
     """
-    breached_accounts = db.session.execute(
-        db.select(Account).where(Account.is_breached == 1, Account.user_id == current_user.id)
-    ).scalars().all()
+    Return the vaults (accounts) whose URL or username match the search text, for search-as-you-type.
 
-    return render_template("all_vaults.html", current_user=current_user,
-                           accounts=breached_accounts, referrer="breached_vaults")
+    Returns:
+        Response: JSON with a list of matching accounts and the URLs of their details page and icon.
+    """
+    limit = min(max(request.args.get('limit', 10, type=int), 1), 50)
+    accounts = search_accounts(current_user.id, request.args.get('q', ''), limit=limit)
+    return jsonify(results=[dict(id=account.id, url=account.url, username=account.username,
+                                 is_breached=account.is_breached, icon=icon_src(account),
+                                 show_url=url_for('views.show_vault', account_id=account.id))
+                            for account in accounts])
 
 
 # Display a specific vault's details.
+@views.route('/vaults/<int:account_id>', methods=["GET", "POST"])
 @signed_in
-@app.route('/vaults/<int:account_id>', methods=["GET", "POST"])
 def show_vault(account_id):
     """
     Display the details of a specific vault (account), including its decrypted password.
@@ -277,7 +521,7 @@ def show_vault(account_id):
         render_template (str): Renders the vault details page with the account information.
     """
     account = db.get_or_404(Account, account_id)
-    manager = PasswordManager(account.browser)
+    manager = PasswordManager(account.browser, current_user.id, current_user.key_version)
     decrypted_password = manager.read_and_decrypt_password(current_user.id, account.id)
     referrer = request.args.get('ref', 'all_vaults')
 
@@ -286,8 +530,8 @@ def show_vault(account_id):
 
 
 # Delete a specific vault.
+@views.route('/vaults/<int:account_id>/delete', methods=["POST"])
 @signed_in
-@app.route('/vaults/<int:account_id>/delete', methods=["POST"])
 def delete_vault(account_id):
     """
     Delete a specific vault (account) and redirect to the appropriate page based on referrer.
@@ -300,16 +544,17 @@ def delete_vault(account_id):
     """
     account = db.get_or_404(Account, account_id)
     db.session.delete(account)
+    bump_vault_version(current_user.id, commit=False)
     db.session.commit()
 
     flash('Account deleted successfully!', 'success')
     referrer = request.args.get('ref', 'all_vaults')
-    return redirect(url_for(referrer))
+    return redirect(url_for(f"views.{referrer}"))
 
 
 # Edit the details of a specific vault.
+@views.route('/vaults/<int:account_id>/edit', methods=["GET", "POST"])
 @signed_in
-@app.route('/vaults/<int:account_id>/edit', methods=["GET", "POST"])
 def edit_vault(account_id):
     """
     Edit the details (URL, username, password) of a specific vault (account) and save changes.
@@ -322,25 +567,33 @@ def edit_vault(account_id):
                             or redirects to the vaults page after successful update.
     """
     account = db.get_or_404(Account, account_id)
-    manager = PasswordManager(account.browser)
+    manager = PasswordManager(account.browser, current_user.id, current_user.key_version)
     decrypted_password = manager.read_and_decrypt_password(current_user.id, account.id)
     form = EditVaultForm(obj=account)
 
     if form.validate_on_submit():
         account.url = form.url.data
         account.username = form.username.data
+        if form.password.data != decrypted_password:
+            account.date_password_modified = int(datetime.now().timestamp())
         account.password = manager.encrypt_and_store_password(form.password.data)
+        bump_vault_version(current_user.id, commit=False)
+        if not can_write_vault(current_user.id, manager.key_version):
+            db.session.rollback()
+            flash(VAULT_LOCKED_MESSAGE, 'failure')
+            return redirect(url_for('views.edit_vault', account_id=account_id,
+                                    ref=request.args.get('ref', 'all_vaults')))
         db.session.commit()
 
         flash('Account updated successfully!', 'success')
-        return redirect(url_for('show_vault', account_id=account.id, ref=request.args.get('ref', 'all_vaults')))
+        return redirect(url_for('views.show_vault', account_id=account.id, ref=request.args.get('ref', 'all_vaults')))
 
     return render_template("edit_vault.html", form=form, account=account, decrypted_password=decrypted_password)
 
 
 # Add the information to a new vault.
+@views.route('/vaults/add', methods=["GET", "POST"])
 @signed_in
-@app.route('/vaults/add', methods=["GET", "POST"])
 def add_vault():
     """
     Add a new vault (account) to the user's account.
@@ -353,15 +606,10 @@ def add_vault():
         in case of failure.
     """
     form = EditVaultForm()
-    db_path = os.getenv("DB_PATH")
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    cursor.execute("SELECT browser FROM users WHERE id = ?", (current_user.id,))
-    browser = cursor.fetchone()[0]
+    browser = current_user.browser
 
     if browser is None:
         browser = os.getenv("DEFAULT_BROWSER")
-    conn.close()
 
     if form.validate_on_submit():
         try:
@@ -372,7 +620,7 @@ def add_vault():
                 user_id=current_user.id,
                 url=base_url,
                 full_url=form.url.data,
-                icon=get_clearbit_logo(form.url.data),
+                icon=icon_resolver.resolve_url(form.url.data),
                 username=form.username.data,
                 password=form.password.data,
                 browser=browser,
@@ -381,13 +629,18 @@ def add_vault():
                 date_password_modified=int(datetime.now().timestamp())
             )
 
-            manager = PasswordManager(browser)
+            manager = PasswordManager(browser, current_user.id, current_user.key_version)
             new_account.password = manager.encrypt_and_store_password(form.password.data)
             db.session.add(new_account)
+            bump_vault_version(current_user.id, commit=False)
+            if not can_write_vault(current_user.id, manager.key_version):
+                db.session.rollback()
+                flash(VAULT_LOCKED_MESSAGE, 'failure')
+                return redirect(url_for('views.all_vaults'))
             db.session.commit()
 
             flash('Account added successfully!', 'success')
-            return redirect(url_for('all_vaults'))
+            return redirect(url_for('views.all_vaults'))
         except Exception as e:
             print({e})
             flash('Account already exist!', 'failure')
@@ -396,6 +649,133 @@ def add_vault():
                            decrypted_password=None)
 
 
-# Run Flask application with debug mode turned on.
+# Export the vault.
+@views.route('/vaults/export', methods=["GET", "POST"])
+@signed_in
+def export_vaults():
+    """
+    Download the user's vault as CSV or newline-delimited JSON, optionally compressed and encrypted.
+
+    The export is streamed while the vault is read and decrypted in chunks, so it starts right away and
+    uses the same memory for any vault size.
+
+    Returns:
+        render_template (str): Renders the export page with the form if GET request or invalid input,
+        or streams the export file.
+    """
+    form = ExportForm()
+    if form.validate_on_submit():
+        browser = current_user.browser or os.getenv("DEFAULT_BROWSER")
+        manager = PasswordManager(browser, current_user.id, current_user.key_version)
+        chunks = export_vault(manager, current_user.id, form.export_format.data, compress=form.compress.data,
+                              passphrase=form.passphrase.data or None)
+        filename, mimetype = export_filename(form.export_format.data, form.compress.data, bool(form.passphrase.data))
+
+        response = Response(stream_with_context(chunks), mimetype=mimetype)
+        response.headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+        response.headers["Cache-Control"] = "no-store"
+        return response
+
+    return render_template("export_vault.html", form=form, current_user=current_user)
+
+
+def is_admin():
+    """
+    Check whether the current user is listed in ADMIN_EMAILS.
+
+    Returns:
+        bool: True if the user is signed in and an administrator.
+    """
+    admins = {email.strip().lower() for email in os.getenv("ADMIN_EMAILS", "").split(",") if email.strip()}
+    return current_user.is_authenticated and current_user.email.lower() in admins
+
+
+# Rotate the keys of users' vaults.
+@views.route('/admin/rekey', methods=["GET", "POST"])
+def admin_rekey():
+    """
+    Start the re-encryption of vaults under new keys. Only users listed in ADMIN_EMAILS may use it.
+
+    A valid form submission starts rotating the vaults of the entered user IDs, or of every user if that
+    is explicitly confirmed. Interrupted rotations resume where they stopped.
+
+    Returns:
+        render_template (str): Renders the rotation page with the form and the latest rotation of every user,
+        or redirects back to it after starting a rotation. Other users get a 403 error.
+    """
+    if not is_admin():
+        abort(403)
+
+    form = AdminRekeyForm()
+    if form.validate_on_submit():
+        user_ids = form.selected_user_ids() or get_user_ids()
+        if rekey_users_async(user_ids, database_uri()):
+            flash(f"Started rotating the keys of {len(user_ids)} vaults.", "success")
+        else:
+            flash("Another rotation is still running.", "warning")
+        return redirect(url_for('views.admin_rekey'))
+
+    return render_template("admin_rekey.html", form=form, rotations=latest_rekey_reports())
+
+
+# Report the progress of the key rotations.
+@views.route('/admin/rekey/status')
+def admin_rekey_status():
+    """
+    Report the latest rotation of every user. Only users listed in ADMIN_EMAILS may use it.
+
+    Returns:
+        Response: JSON with the latest rotation of every user, or a 403 error for other users.
+    """
+    if not is_admin():
+        abort(403)
+    return jsonify(rotations=latest_rekey_reports())
+
+
+# Serve a website icon from the local icon store.
+@views.route('/icons/<domain>')
+@signed_in
+def serve_icon(domain):
+    """
+    Serve a website's logo from the local icon store.
+
+    Logos are only downloaded for domains the user has an account on; other domains are only read
+    from the store. Responses carry a strong ETag and a long private Cache-Control lifetime, and
+    conditional requests with a matching ETag get a 304 response. They are never sniffed as another
+    type and run sandboxed if opened directly, since SVG logos can contain scripts.
+
+    Parameters:
+        domain (str): The website's domain.
+
+    Returns:
+        Response: The logo image, a 304 response, or a 404 error if the domain has no logo.
+    """
+    icon = icon_store.get(domain, download=False)
+    if icon is None:
+        normalized = icon_store.normalize_domain(domain)
+        if normalized is None or not has_account_on_domain(current_user.id, normalized):
+            abort(404)
+        icon = icon_store.get(normalized)
+
+    if icon is None:
+        response = Response(status=404)
+        response.cache_control.private = True
+        response.cache_control.max_age = int(icon_store.miss_ttl)
+        return response
+
+    data, mimetype, etag = icon
+    response = Response(data, mimetype=mimetype)
+    response.set_etag(etag)
+    response.cache_control.private = True
+    response.cache_control.max_age = int(os.getenv("ICON_MAX_AGE", 30 * 24 * 3600))
+    response.headers["X-Content-Type-Options"] = "nosniff"
+    response.headers["Content-Security-Policy"] = "sandbox"
+    return response.make_conditional(request)
+
+
+# Run Flask application with debug mode turned on, on an up-to-date database.
 if __name__ == "__main__":
+    app = create_app()
+    with app.app_context():
+        upgrade_schema(db)
     app.run(debug=True, port=5000)
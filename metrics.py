@@ -0,0 +1,310 @@
+# Import modules.
+import hmac
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager, nullcontext
+from functools import wraps
+from flask import (g, request, current_app, has_request_context, before_render_template, template_rendered, Response,
+                   abort)
+from sqlalchemy import event
+from settings import EnvSetting, is_on
+
+# Upper bounds of the latency histogram buckets, in seconds.
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Prefix of every exported metric name.
+PREFIX = "pwmanager"
+
+
+class Metrics:
+    """
+    Process-wide timers and counters for the application's hot paths.
+
+    Timed operations are aggregated into latency histograms, exported in the Prometheus text format at
+    /metrics. Operations timed while handling a request are also summed per request and reported in the
+    response's Server-Timing header, so a browser's developer tools show where the request's time went.
+    Since both reveal how the application spends its time, /metrics is only served with a token, and the
+    header is only sent in debug mode, with the token, or to users the application allows.
+
+    When disabled, timers do nothing and no listeners or hooks are registered, so the instrumentation
+    costs next to nothing. Each server worker process keeps its own metrics.
+
+    Attributes:
+        enabled (bool): Whether metrics are collected.
+        token (str or None): The bearer token required to read /metrics. /metrics is disabled without one.
+    """
+    enabled = EnvSetting("METRICS_ENABLED", "on", is_on)
+    token = EnvSetting("METRICS_TOKEN")
+
+    def __init__(self, enabled=None, token=None):
+        """
+        Initialize empty metrics.
+
+        Parameters:
+            enabled (bool or None): Whether to collect metrics. Defaults to METRICS_ENABLED ('on').
+            token (str or None): The bearer token protecting /metrics. Defaults to METRICS_TOKEN.
+        """
+        self.enabled = enabled
+        self.token = token
+        self._histograms = {}
+        self._counters = {}
+        self._gauge_sources = {}
+        self._lock = threading.Lock()
+        self._timings_allowed = None
+
+    def observe(self, operation, seconds, count=1):
+        """
+        Record the duration of one or more operations.
+
+        Parameters:
+            operation (str): The operation's name, such as 'db_query'.
+            seconds (float): The total duration, in seconds.
+            count (int): The number of operations the duration covers, for batches.
+        """
+        self._record("operation_seconds", (("operation", operation),), seconds / count, count)
+        if has_request_context():
+            timings = g.setdefault("metrics_timings", {})
+            total, calls = timings.get(operation, (0.0, 0))
+            timings[operation] = (total + seconds, calls + count)
+
+    def _record(self, name, labels, seconds, count=1):
+        """
+        Add observations to a latency histogram.
+        """
+        key = (name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [[0] * len(BUCKETS), 0.0, 0]
+            bucket = bisect_left(BUCKETS, seconds)
+            if bucket < len(BUCKETS):
+                histogram[0][bucket] += count
+            histogram[1] += seconds * count
+            histogram[2] += count
+
+    def count(self, name, labels=(), amount=1):
+        """
+        Increase a counter.
+
+        Parameters:
+            name (str): The counter's name, without the metric prefix.
+            labels (tuple): The counter's (label, value) pairs.
+            amount (int): The increase.
+        """
+        with self._lock:
+            self._counters[(name, labels)] = self._counters.get((name, labels), 0) + amount
+
+    def timer(self, operation):
+        """
+        Return a context manager timing the code it wraps.
+
+        Parameters:
+            operation (str): The operation's name.
+
+        Returns:
+            ContextManager: The timer, or a no-op context manager if metrics are disabled.
+        """
+        if not self.enabled:
+            return nullcontext()
+        return self._timer(operation)
+
+    @contextmanager
+    def _timer(self, operation):
+        """
+        Time the wrapped code as one operation.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(operation, time.perf_counter() - start)
+
+    def timed(self, operation):
+        """
+        Return a decorator timing every call of a function.
+
+        Parameters:
+            operation (str): The operation's name.
+
+        Returns:
+            callable: The decorator. While metrics are disabled, calls go straight to the function.
+        """
+        def decorator(func):
+            # Decorators run at import time, before the settings are loaded, so check them on each call.
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                start = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self.observe(operation, time.perf_counter() - start)
+            return wrapper
+        return decorator
+
+    def add_gauge_source(self, name, stats):
+        """
+        Export the counters of a component, such as a cache, as gauges.
+
+        Parameters:
+            name (str): The component's name, used in the metric names.
+            stats (callable): Returns a dict of numeric counters, such as a cache's stats().
+        """
+        self._gauge_sources[name] = stats
+
+    def init_app(self, app, db, timings_allowed=None):
+        """
+        Time the requests, database queries and template renders of an application, and add /metrics.
+
+        Parameters:
+            app (Flask): The Flask application.
+            db (SQLAlchemy): The Flask-SQLAlchemy database object.
+            timings_allowed (callable or None): Called without arguments while handling a request; returns
+                                                whether the response may carry the Server-Timing header.
+                                                The header is always sent in debug mode and with the token.
+        """
+        if not self.enabled:
+            return
+
+        self._timings_allowed = timings_allowed
+
+        with app.app_context():
+            engine = db.engine
+        event.listen(engine, "before_cursor_execute", self._before_query)
+        event.listen(engine, "after_cursor_execute", self._after_query)
+        event.listen(engine, "handle_error", self._on_query_error)
+        before_render_template.connect(self._before_render, app)
+        template_rendered.connect(self._after_render, app)
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.add_url_rule("/metrics", "metrics", self._metrics_view)
+
+    def _before_query(self, conn, cursor, statement, parameters, context, executemany):
+        """
+        Remember when a database query started.
+        """
+        conn.info.setdefault("metrics_query_starts", []).append(time.perf_counter())
+
+    def _after_query(self, conn, cursor, statement, parameters, context, executemany):
+        """
+        Record how long a database query took.
+        """
+        self.observe("db_query", time.perf_counter() - conn.info["metrics_query_starts"].pop())
+
+    def _on_query_error(self, context):
+        """
+        Forget the start of a query that failed.
+        """
+        starts = context.connection.info.get("metrics_query_starts") if context.connection else None
+        if starts:
+            starts.pop()
+
+    def _before_render(self, sender, template, context, **extra):
+        """
+        Remember when a template render started.
+        """
+        g.setdefault("metrics_render_starts", []).append(time.perf_counter())
+
+    def _after_render(self, sender, template, context, **extra):
+        """
+        Record how long a template render took.
+        """
+        self.observe("template", time.perf_counter() - g.metrics_render_starts.pop())
+
+    def _before_request(self):
+        """
+        Remember when the request started.
+        """
+        g.metrics_request_start = time.perf_counter()
+
+    def _after_request(self, response):
+        """
+        Record the request's duration, and add its Server-Timing header if the client may see it.
+        """
+        seconds = time.perf_counter() - g.metrics_request_start
+        endpoint = request.endpoint or "unmatched"
+        self._record("request_seconds", (("endpoint", endpoint),), seconds)
+        self.count("requests_total", (("endpoint", endpoint), ("status", str(response.status_code))))
+
+        if not (current_app.debug or self._has_token()
+                or (self._timings_allowed is not None and self._timings_allowed())):
+            return response
+        timings = [f'{operation};dur={total * 1000:.2f};desc="{calls} calls"'
+                   for operation, (total, calls) in g.get("metrics_timings", {}).items()]
+        timings.append(f"total;dur={seconds * 1000:.2f}")
+        response.headers["Server-Timing"] = ", ".join(timings)
+        return response
+
+    def _has_token(self):
+        """
+        Check whether the request carries the metrics token as its bearer token.
+
+        Returns:
+            bool: True if a token is set and the request's Authorization header matches it.
+        """
+        if not self.token:
+            return False
+        supplied = request.headers.get("Authorization", "").removeprefix("Bearer ")
+        return hmac.compare_digest(supplied.encode(), self.token.encode())
+
+    def _metrics_view(self):
+        """
+        Serve the metrics in the Prometheus text format, to requests carrying the token.
+
+        Without a configured token the route answers 404, as if it didn't exist.
+        """
+        if not self.token:
+            abort(404)
+        if not self._has_token():
+            abort(401)
+        return Response(self.render(), mimetype="text/plain; version=0.0.4")
+
+    def render(self):
+        """
+        Render the metrics in the Prometheus text exposition format.
+
+        Returns:
+            str: The metrics.
+        """
+        def format_labels(labels):
+            return "{" + ",".join(f'{label}="{value}"' for label, value in labels) + "}" if labels else ""
+
+        lines = []
+        with self._lock:
+            histograms = sorted((key, (list(buckets), total, count))
+                                for key, (buckets, total, count) in self._histograms.items())
+            counters = sorted(self._counters.items())
+
+        declared = set()
+        for (name, labels), (buckets, total, count) in histograms:
+            metric = f"{PREFIX}_{name}"
+            if metric not in declared:
+                declared.add(metric)
+                lines.append(f"# TYPE {metric} histogram")
+            cumulative = 0
+            for bound, bucket in zip(BUCKETS, buckets):
+                cumulative += bucket
+                lines.append(f"{metric}_bucket{format_labels(labels + (('le', bound),))} {cumulative}")
+            lines.append(f"{metric}_bucket{format_labels(labels + (('le', '+Inf'),))} {count}")
+            lines.append(f"{metric}_sum{format_labels(labels)} {total}")
+            lines.append(f"{metric}_count{format_labels(labels)} {count}")
+
+        for (name, labels), value in counters:
+            metric = f"{PREFIX}_{name}"
+            if metric not in declared:
+                declared.add(metric)
+                lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric}{format_labels(labels)} {value}")
+
+        for source, stats in self._gauge_sources.items():
+            for key, value in stats().items():
+                metric = f"{PREFIX}_{source}_{key}"
+                lines.append(f"# TYPE {metric} gauge")
+                lines.append(f"{metric} {value}")
+        return "\n".join(lines) + "\n"
+
+
+# Metrics shared by the application.
+metrics = Metrics()
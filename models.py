@@ -0,0 +1,93 @@
+# Import modules.
+from flask_login import UserMixin
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.orm import relationship, DeclarativeBase, Mapped, mapped_column
+from sqlalchemy import Integer, String, Boolean, Float, UniqueConstraint, Index
+
+
+# Define the base model class for the database.
+class Base(DeclarativeBase):
+    pass
+
+
+# Set up the SQLAlchemy database object. It is bound to the app in main.py.
+db = SQLAlchemy(model_class=Base)
+
+
+# Define the User model.
+class User(UserMixin, db.Model):
+    __tablename__ = "users"
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    email: Mapped[str] = mapped_column(String(100), unique=True)
+    password: Mapped[str] = mapped_column(String(255))
+    name: Mapped[str] = mapped_column(String(100))
+    browser: Mapped[str] = mapped_column(String(100))
+    encrypted_key: Mapped[bytes] = mapped_column(db.LargeBinary, nullable=True)
+    key_version: Mapped[int] = mapped_column(Integer, nullable=True, default=0)
+    accounts = relationship("Account", back_populates="parent_user")
+
+
+# Define the Account model.
+class Account(db.Model):
+    __tablename__ = "accounts"
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    user_id: Mapped[int] = mapped_column(Integer, db.ForeignKey("users.id"))
+    url: Mapped[str] = mapped_column(String(100))
+    full_url: Mapped[str] = mapped_column(String(100))
+    icon: Mapped[str] = mapped_column(String(100), nullable=True)
+    username: Mapped[str] = mapped_column(String(100))
+    password: Mapped[str] = mapped_column(db.LargeBinary)
+    browser: Mapped[str] = mapped_column(String(100))
+    is_breached: Mapped[bool] = mapped_column(Boolean, nullable=True)
+    date_created: Mapped[int] = mapped_column(Integer, nullable=False)
+    date_last_used: Mapped[int] = mapped_column(Integer, nullable=False)
+    date_password_modified: Mapped[int] = mapped_column(Integer, nullable=False)
+    date_breach_checked: Mapped[int] = mapped_column(Integer, nullable=True)
+    breach_fingerprint: Mapped[bytes] = mapped_column(db.LargeBinary, nullable=True)
+
+    __table_args__ = (UniqueConstraint('user_id', 'full_url', 'username', name='unique_user_url_username'),
+                      Index('ix_accounts_user_id_id', 'user_id', 'id'),
+                      Index('ix_accounts_user_id_is_breached_id', 'user_id', 'is_breached', 'id'))
+    parent_user = relationship("User", back_populates="accounts")
+
+
+# Define the BreachJob model, tracking background breach scans.
+class BreachJob(db.Model):
+    __tablename__ = "breach_jobs"
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    user_id: Mapped[int] = mapped_column(Integer, db.ForeignKey("users.id"), index=True)
+    status: Mapped[str] = mapped_column(String(20))
+    total: Mapped[int] = mapped_column(Integer, default=0)
+    done: Mapped[int] = mapped_column(Integer, default=0)
+    skipped: Mapped[int] = mapped_column(Integer, default=0)
+    breached: Mapped[int] = mapped_column(Integer, default=0)
+    error: Mapped[str] = mapped_column(String(200), nullable=True)
+    worker_id: Mapped[str] = mapped_column(String(32), nullable=True)
+    heartbeat: Mapped[float] = mapped_column(Float, nullable=True)
+    date_created: Mapped[int] = mapped_column(Integer, nullable=False)
+    date_started: Mapped[int] = mapped_column(Integer, nullable=True)
+    date_finished: Mapped[int] = mapped_column(Integer, nullable=True)
+
+
+# Define the VaultVersion model, counting the changes to each user's vault.
+class VaultVersion(db.Model):
+    __tablename__ = "vault_versions"
+    user_id: Mapped[int] = mapped_column(Integer, db.ForeignKey("users.id"), primary_key=True)
+    version: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+
+# Define the RekeyJob model, the checkpoint of a vault's re-encryption under a new key.
+class RekeyJob(db.Model):
+    __tablename__ = "rekey_jobs"
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    user_id: Mapped[int] = mapped_column(Integer, db.ForeignKey("users.id"), index=True)
+    status: Mapped[str] = mapped_column(String(20))
+    new_key: Mapped[bytes] = mapped_column(db.LargeBinary, nullable=True)
+    last_account_id: Mapped[int] = mapped_column(Integer, default=0)
+    total: Mapped[int] = mapped_column(Integer, default=0)
+    done: Mapped[int] = mapped_column(Integer, default=0)
+    failed: Mapped[int] = mapped_column(Integer, default=0)
+    seconds: Mapped[float] = mapped_column(Float, default=0)
+    error: Mapped[str] = mapped_column(String(200), nullable=True)
+    date_created: Mapped[int] = mapped_column(Integer, nullable=False)
+    date_finished: Mapped[int] = mapped_column(Integer, nullable=True)
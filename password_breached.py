@@ -1,18 +1,170 @@
 # Import modules.
 import os
-import requests
 import hashlib
+from http_session import ThreadLocalSession
 from password_manager import PasswordManager
-from dotenv import load_dotenv
+from range_cache import RangeCache
+from breach_corpus import OfflineCorpus
+from bloom_filter import BloomFilter, PrefilteredBackend
+from metrics import metrics
 
-# Load environment variables.
-load_dotenv()
-db_path = os.getenv("DB_PATH")
+
+def hash_password(password):
+    """
+    Hash a password with SHA-1 and split it the way the Pwned Passwords range API expects.
+
+    Parameters:
+        password (str): The password in plain text.
+
+    Returns:
+        tuple: The 5-character uppercase hash prefix and the remaining 35-character suffix.
+    """
+    sha1_password = hashlib.sha1(password.encode('utf-8')).hexdigest().upper()
+    return sha1_password[:5], sha1_password[5:]
+
+
+class PwnedRangeClient:
+    """
+    A client for the Pwned Passwords range API.
+
+    Each thread gets its own HTTP session, so one client can be shared by a pool of scan workers
+    while still reusing connections. If a range cache is given, fresh ranges are served from it and
+    stale ones are revalidated with conditional requests.
+
+    Attributes:
+        base_url (str): The base URL of the range API.
+        timeout (float): Number of seconds to wait for a range response.
+        cache (RangeCache or None): The persistent cache for range responses.
+    """
+    def __init__(self, base_url=None, timeout=None, cache=None):
+        """
+        Initialize the range client.
+
+        Parameters:
+            base_url (str or None): The base URL of the range API. Defaults to PWNED_API_URL.
+            timeout (float or None): Number of seconds to wait for a response. Defaults to PWNED_API_TIMEOUT.
+            cache (RangeCache or None): The persistent cache for range responses, if any.
+        """
+        self.base_url = (base_url or os.getenv("PWNED_API_URL", "https://api.pwnedpasswords.com")).rstrip('/')
+        self.timeout = timeout or float(os.getenv("PWNED_API_TIMEOUT", 10))
+        self.cache = cache
+        self._http = ThreadLocalSession()
+
+    def fetch_range(self, prefix):
+        """
+        Return the breached hash suffixes that share a 5-character SHA-1 prefix, from the cache or the API.
+
+        Parameters:
+            prefix (str): The 5-character uppercase SHA-1 prefix.
+
+        Returns:
+            dict or None: Maps each breached suffix to its breach count, or None if the request failed.
+        """
+        try:
+            cached = self.cache.get(prefix) if self.cache else None
+            if cached and cached.is_fresh:
+                return self._parse_range(cached.body)
+
+            # Revalidate a stale cached range instead of downloading it again.
+            headers = {}
+            if cached and cached.etag:
+                headers["If-None-Match"] = cached.etag
+            if cached and cached.last_modified:
+                headers["If-Modified-Since"] = cached.last_modified
+
+            with metrics.timer("range_api"):
+                response = self._http.session().get(f"{self.base_url}/range/{prefix}", headers=headers,
+                                                    timeout=self.timeout)
+            if response.status_code == 304 and cached:
+                self.cache.touch(prefix)
+                return self._parse_range(cached.body)
+            if response.status_code != 200:
+                print(f"Error checking password: {response.status_code} - {response.text}")
+                return None
+
+            if self.cache:
+                self.cache.put(prefix, response.text, response.headers.get("ETag"),
+                               response.headers.get("Last-Modified"))
+            return self._parse_range(response.text)
+        except Exception as e:
+            print(f"Error while fetching range {prefix}: {e}")
+            return None
+
+    @staticmethod
+    def _parse_range(body):
+        """
+        Parse a range response body into breach counts.
+
+        Parameters:
+            body (str): The range response body, one 'SUFFIX:COUNT' pair per line.
+
+        Returns:
+            dict: Maps each breached suffix to its breach count.
+        """
+        counts = {}
+        for line in body.splitlines():
+            suffix, _, count = line.partition(':')
+            counts[suffix] = int(count or 0)
+        return counts
+
+    def lookup(self, prefix, suffixes):
+        """
+        Look up the breach counts of several hash suffixes that share one prefix.
+
+        Parameters:
+            prefix (str): The 5-character uppercase SHA-1 prefix.
+            suffixes (iterable): The 35-character uppercase suffixes to look up.
+
+        Returns:
+            dict or None: Maps each breached suffix to its breach count (suffixes that were not found are
+                          left out), or None if the lookup failed.
+        """
+        counts = self.fetch_range(prefix)
+        if counts is None:
+            return None
+        return {suffix: counts[suffix] for suffix in suffixes if suffix in counts}
+
+
+# Shared breach backend, created on first use.
+_breach_backend = None
+
+
+def get_breach_backend():
+    """
+    Return the backend used to look up breached password hashes.
+
+    The backend is chosen by BREACH_BACKEND: 'online' uses the Pwned Passwords range API and 'offline'
+    uses the memory-mapped corpus at BREACH_CORPUS_PATH. If BREACH_BLOOM_PATH is set, the backend is
+    wrapped so that a Bloom filter is consulted before every authoritative lookup.
+
+    Returns:
+        PwnedRangeClient, OfflineCorpus or PrefilteredBackend: The shared breach backend.
+    """
+    global _breach_backend
+    if _breach_backend is not None:
+        return _breach_backend
+
+    if os.getenv("BREACH_BACKEND", "online") == "offline":
+        _breach_backend = OfflineCorpus(os.getenv("BREACH_CORPUS_PATH"))
+    else:
+        cache = None
+        if os.getenv("PWNED_CACHE_PATH"):
+            cache = RangeCache(os.getenv("PWNED_CACHE_PATH"), ttl=float(os.getenv("PWNED_CACHE_TTL", 86400)),
+                               max_entries=int(os.getenv("PWNED_CACHE_MAX_ENTRIES", 10000)))
+        _breach_backend = PwnedRangeClient(cache=cache)
+
+    breach_bloom_path = os.getenv("BREACH_BLOOM_PATH")
+    if breach_bloom_path:
+        bloom_filter = BloomFilter(breach_bloom_path)
+        print(f"Loaded breach Bloom filter: {bloom_filter.memory_footprint() / 2 ** 20:.1f} MiB mapped, "
+              f"measured false-positive rate {bloom_filter.measure_false_positive_rate(10000):.5f}.")
+        _breach_backend = PrefilteredBackend(bloom_filter, _breach_backend)
+    return _breach_backend
 
 
 class PasswordBreached:
     """
-    A class to check if a password has been breached using the Pwned Passwords API.
+    A class to check if a password has been breached using the Pwned Passwords API or an offline corpus.
 
     Attributes:
         browser (str): The browser where the password is stored.
@@ -31,7 +183,7 @@ class PasswordBreached:
         decrypt the password stored in the browser's database.
         """
         self.browser = browser
-        manager = PasswordManager(self.browser)
+        manager = PasswordManager(self.browser, user_id)
         self.password = manager.read_and_decrypt_password(user_id, account_id)
 
     def check_password_pwned(self):
@@ -51,31 +203,21 @@ class PasswordBreached:
         """
         try:
             # Hash the password using SHA-1.
-            sha1_password = hashlib.sha1(self.password.encode('utf-8')).hexdigest().upper()
-            prefix, suffix = sha1_password[:5], sha1_password[5:]
-
-            # Pwned Passwords API URL.
-            url = f"https://api.pwnedpasswords.com/range/{prefix}"
-            response = requests.get(url)
-
-            # If the request was successful, check the response for breaches.
-            if response.status_code == 200:
-                # Parse the API response.
-                hashes = (line.split(':') for line in response.text.splitlines())
-
-                # Check if the password's suffix matches any breached password hash.
-                for h, count in hashes:
-                    if h == suffix:
-                        print(f"The password has been pwned {count} times!")
-                        return True  # Password is breached.
-
-                print("The password has not been pwned.")
-                return False  # Password is safe.
-            else:
-                # Handle error in case of failed API request.
-                print(f"Error checking password: {response.status_code} - {response.text}")
+            prefix, suffix = hash_password(self.password)
+
+            # Look up the suffix in the range sharing its prefix.
+            counts = get_breach_backend().lookup(prefix, [suffix])
+            if counts is None:
                 return None
 
+            # Check if the password's suffix matches any breached password hash.
+            if suffix in counts:
+                print(f"The password has been pwned {counts[suffix]} times!")
+                return True  # Password is breached.
+
+            print("The password has not been pwned.")
+            return False  # Password is safe.
+
         except Exception as e:
             # Catch and print any errors that occur during the process.
             print(f"Error while checking password breach: {e}")
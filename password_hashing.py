@@ -0,0 +1,206 @@
+# Import modules.
+import os
+import time
+import click
+from werkzeug.security import generate_password_hash, check_password_hash
+from settings import EnvSetting
+
+# Default work factors: PBKDF2 iterations, or the scrypt CPU/memory cost N.
+DEFAULT_COSTS = {"pbkdf2:sha256": 600000, "scrypt": 2 ** 15}
+
+# Block size and parallelization of scrypt hashes.
+SCRYPT_R, SCRYPT_P = 8, 1
+
+
+def checked_method(method):
+    """
+    Validate a password hash algorithm.
+
+    Parameters:
+        method (str): The algorithm, 'pbkdf2:sha256' or 'scrypt'.
+
+    Returns:
+        str: The algorithm.
+
+    Raises:
+        ValueError: If the algorithm is not supported.
+    """
+    if method not in DEFAULT_COSTS:
+        raise ValueError(f"Unsupported password hash method: {method!r}")
+    return method
+
+
+class PasswordHashPolicy:
+    """
+    The algorithm and work factor used to hash login passwords.
+
+    The cost of verifying a hash decides how many logins per second a worker can handle, and how
+    expensive each guess is for an attacker holding the database. calibrate() picks the cost for a
+    target verify latency on the current host.
+
+    Attributes:
+        method (str): The algorithm, 'pbkdf2:sha256' or 'scrypt'.
+        cost (int): The number of PBKDF2 iterations, or the scrypt CPU/memory cost N.
+        salt_length (int): The number of salt characters.
+    """
+    method = EnvSetting("PASSWORD_HASH_METHOD", "pbkdf2:sha256", checked_method)
+    salt_length = EnvSetting("PASSWORD_SALT_LENGTH", 16, int)
+
+    def __init__(self, method=None, cost=None, salt_length=None):
+        """
+        Initialize the policy.
+
+        Parameters:
+            method (str or None): The algorithm. Defaults to PASSWORD_HASH_METHOD.
+            cost (int or None): The work factor. Defaults to PASSWORD_HASH_COST, or the algorithm's default.
+            salt_length (int or None): The number of salt characters. Defaults to PASSWORD_SALT_LENGTH.
+        """
+        self.method = checked_method(method) if method else None
+        self.salt_length = salt_length
+        self._cost = cost
+
+    @property
+    def cost(self):
+        """
+        Return the work factor, read from PASSWORD_HASH_COST on first use unless it was given.
+
+        Returns:
+            int: The number of PBKDF2 iterations, or the scrypt CPU/memory cost N.
+        """
+        if self._cost is None:
+            self._cost = int(os.getenv("PASSWORD_HASH_COST", DEFAULT_COSTS[self.method]))
+        return self._cost
+
+    @property
+    def method_string(self):
+        """
+        Return the method string understood by werkzeug's generate_password_hash().
+
+        Returns:
+            str: The method with its parameters, such as 'pbkdf2:sha256:600000'.
+        """
+        if self.method == "scrypt":
+            return f"scrypt:{self.cost}:{SCRYPT_R}:{SCRYPT_P}"
+        return f"{self.method}:{self.cost}"
+
+    def hash(self, password):
+        """
+        Hash a password with this policy.
+
+        Parameters:
+            password (str): The plaintext password.
+
+        Returns:
+            str: The salted hash, in werkzeug's 'method$salt$hash' format.
+        """
+        return generate_password_hash(password, method=self.method_string, salt_length=self.salt_length)
+
+    @staticmethod
+    def verify(stored_hash, password):
+        """
+        Check a password against a stored hash, whatever policy it was created with.
+
+        Parameters:
+            stored_hash (str): The stored hash.
+            password (str): The plaintext password.
+
+        Returns:
+            bool: True if the password matches.
+        """
+        return check_password_hash(stored_hash, password)
+
+    def needs_rehash(self, stored_hash):
+        """
+        Check whether a stored hash is weaker than this policy.
+
+        Parameters:
+            stored_hash (str): The stored hash.
+
+        Returns:
+            bool: True if the hash uses another algorithm, a lower cost or a shorter salt.
+        """
+        try:
+            method, salt, _ = stored_hash.split("$", 2)
+            parts = method.split(":")
+            if self.method == "scrypt":
+                algorithm, cost = parts[0], int(parts[1]) if len(parts) > 1 else DEFAULT_COSTS["scrypt"]
+            else:
+                algorithm = ":".join(parts[:2])
+                cost = int(parts[2]) if len(parts) > 2 else 0
+        except (ValueError, IndexError):
+            return True
+        return algorithm != self.method or cost < self.cost or len(salt) < self.salt_length
+
+    def verify_time(self, samples=3):
+        """
+        Measure how long verifying a hash of this policy takes on this host.
+
+        Parameters:
+            samples (int): The number of timed verifications.
+
+        Returns:
+            float: The fastest verification time, in seconds.
+        """
+        stored_hash = self.hash("calibration password")
+        timings = []
+        for _ in range(samples):
+            start = time.perf_counter()
+            self.verify(stored_hash, "calibration password")
+            timings.append(time.perf_counter() - start)
+        return min(timings)
+
+
+def calibrate(method, target, samples=3):
+    """
+    Find the highest cost whose verify time stays within a target latency on this host.
+
+    PBKDF2's cost scales linearly, so it is extrapolated from one measurement and then checked. scrypt's
+    cost must be a power of two, so it is doubled until the next step would exceed the target.
+
+    Parameters:
+        method (str): The algorithm, 'pbkdf2:sha256' or 'scrypt'.
+        target (float): The target verify time, in seconds.
+        samples (int): The number of timed verifications per measurement.
+
+    Returns:
+        PasswordHashPolicy: The calibrated policy.
+    """
+    if method == "scrypt":
+        policy = PasswordHashPolicy(method, cost=2 ** 12)
+        while True:
+            candidate = PasswordHashPolicy(method, cost=policy.cost * 2, salt_length=policy.salt_length)
+            if candidate.verify_time(samples) > target:
+                return policy
+            policy = candidate
+
+    probe = PasswordHashPolicy(method, cost=100000)
+    cost = int(probe.cost * target / probe.verify_time(samples))
+    return PasswordHashPolicy(method, cost=max(round(cost, -3), 1000), salt_length=probe.salt_length)
+
+
+@click.command("calibrate-password-hash")
+@click.option("--method", type=click.Choice(list(DEFAULT_COSTS)), default=None,
+              help="The algorithm to calibrate. Defaults to PASSWORD_HASH_METHOD.")
+@click.option("--target-ms", type=float, default=250, show_default=True,
+              help="The target time to verify one login password, in milliseconds.")
+def calibrate_password_hash(method, target_ms):
+    """
+    Benchmark this host and print the password hash policy for a target login latency.
+    """
+    method = method or PasswordHashPolicy().method
+    current = PasswordHashPolicy(method)
+    current_time = current.verify_time()
+    click.echo(f"Current policy {current.method_string}: {current_time * 1000:.0f} ms per login, "
+               f"{1 / current_time:.1f} logins/s per core")
+
+    policy = calibrate(method, target_ms / 1000)
+    policy_time = policy.verify_time()
+    click.echo(f"Calibrated policy {policy.method_string}: {policy_time * 1000:.0f} ms per login, "
+               f"{1 / policy_time:.1f} logins/s per core")
+    click.echo("Add to .env to apply it, existing users are rehashed when they next log in:")
+    click.echo(f'PASSWORD_HASH_METHOD="{policy.method}"')
+    click.echo(f'PASSWORD_HASH_COST="{policy.cost}"')
+
+
+# Password hash policy used by the application.
+password_policy = PasswordHashPolicy()
@@ -2,223 +2,263 @@
 import sqlite3
 import shutil
 import os
+import pathlib
 import tempfile
-import requests
-import base64
-import json
-import win32crypt
+import time
+from contextlib import contextmanager
+from flask import current_app
 from flask_login import current_user
-from dotenv import load_dotenv
+from key_cache import key_cache
+from user_cache import user_cache
+from data_access import store_user_key, upsert_accounts, bump_vault_version
+from icon_resolver import icon_resolver
+from key_providers import get_key_provider
+from metrics import metrics
 
-# Load environment variables.
-load_dotenv()
-
-
-def get_clearbit_logo(url):
-    """
-    Retrieve the logo URL for the specified domain using Clearbit's Logo API.
-
-    Parameters:
-        url (str): The full URL of the website for which to retrieve the logo.
-
-    Returns:
-        str or None: Returns the logo URL if found; otherwise, returns None.
-    """
-    try:
-        # Extract the base domain from the URL.
-        base_url = url.split('/')[2]
-        logo_url = f"https://logo.clearbit.com/{base_url}"
-
-        # Check if the logo URL is accessible.
-        response = requests.get(logo_url)
-        if response.status_code == 200:
-            return logo_url
-        else:
-            return None
-    except Exception as e:
-        print(f"Error retrieving logo for {url}: {e}")
-        return None
+# SQLite result codes (SQLITE_BUSY, SQLITE_LOCKED) of a backup step blocked by another connection's lock.
+SQLITE_LOCKED_CODES = (5, 6)
 
 
 class PasswordInput:
     """
     A class to manage the import and decryption of browser-stored passwords.
 
+    The browser's logins are streamed from its database in batches and inserted into the vault as they
+    are read, so an import holds at most one batch of rows in memory, regardless of the table size.
+
     Attributes:
         browser (str): The browser to import passwords from ('Chrome', 'Microsoft Edge').
-        origin_urls (list): List of origin URLs where passwords were used.
-        urls (list): List of signon realms (base URLs).
-        icons (list): List of website logos retrieved via Clearbit API.
-        usernames (list): List of usernames associated with each account.
-        passwords (list): List of encrypted passwords from the browser.
-        creation_dates (list): List of dates when passwords were created.
-        last_used_dates (list): List of dates when passwords were last used.
-        password_modified_dates (list): List of dates when passwords were last modified.
-        data (list): Raw data imported from the browser database.
+        batch_size (int): Number of logins read from the browser database at a time.
+        snapshot_strategy (str): How the browser database is opened: 'backup', 'immutable' or 'copy'.
+        snapshot_pages (int): Number of pages copied per step of a 'backup' snapshot.
     """
-    def __init__(self, browser):
+    # Query for the password-related data of the browser's logins.
+    LOGINS_QUERY = ("SELECT origin_url, signon_realm, username_value, password_value, "
+                    "date_created, date_last_used, date_password_modified "
+                    "FROM logins")
+
+    # Number of seconds to wait for a browser holding a lock on its database.
+    LOCK_TIMEOUT = 1.0
+
+    def __init__(self, browser, batch_size=None, snapshot_strategy=None):
         """
         Initialize the PasswordInput class for the specified browser.
 
         Parameters:
             browser (str): The browser to import passwords from ('Chrome', 'Microsoft Edge').
+            batch_size (int or None): Number of logins read at a time. Defaults to IMPORT_CHUNK_SIZE.
+            snapshot_strategy (str or None): How the browser database is opened, see open_database().
+                                             Defaults to BROWSER_SNAPSHOT_STRATEGY.
         """
         self.browser = browser
-        self.origin_urls = []
-        self.urls = []
-        self.icons = []
-        self.usernames = []
-        self.passwords = []
-        self.creation_dates = []
-        self.last_used_dates = []
-        self.password_modified_dates = []
-        self.data = []
+        self.batch_size = batch_size or int(os.getenv("IMPORT_CHUNK_SIZE", 1000))
+        self.snapshot_strategy = snapshot_strategy or os.getenv("BROWSER_SNAPSHOT_STRATEGY", "backup")
+        self.snapshot_pages = int(os.getenv("BROWSER_SNAPSHOT_PAGES", 256))
+
+    def get_key_source(self):
+        """
+        Return where the browser's AES key is loaded from, such as the path of its Local State file.
 
+        Returns:
+            str or None: The key source configured for the browser, or None if it is not set.
+        """
+        return get_key_provider().source(self.browser)
+
+    @metrics.timed("key_retrieval")
     def get_decrypted_aes_key(self):
         """
-        Extract and decrypt the AES key from the browser's Local State file.
+        Load the browser's AES key with the configured key provider.
 
         Returns:
-            bytes or None: The decrypted AES key if successfully extracted, otherwise None.
+            bytes or None: The decrypted AES key if successfully loaded, otherwise None.
         """
         try:
-            # Set the local state path based on the browser.
-            if self.browser in ["Chrome", None]:
-                local_state_path = os.getenv('CHROME_LOCAL_STATE_PATH')
-            else:
-                local_state_path = os.getenv('EDGE_LOCAL_STATE_PATH')
+            return get_key_provider().load_key(self.browser)
+        except Exception as e:
+            print(f"Error decrypting AES key: {e}")
+            return None
 
-            if local_state_path:
-                # Open and load the Local State file to retrieve the encrypted key.
-                with open(local_state_path, "r", encoding="utf-8") as file:
-                    local_state = json.load(file)
+    def get_db_path(self):
+        """
+        Return the path of the browser's Login Data database.
 
-                # Base64 decode the encrypted AES key.
-                encrypted_key = base64.b64decode(local_state["os_crypt"]["encrypted_key"])
+        Returns:
+            str or None: The database path configured for the browser, or None if it is not set.
+        """
+        if self.browser == "Chrome":
+            return os.getenv('CHROME_DB_PATH')
+        if self.browser == "Microsoft Edge":
+            return os.getenv('EDGE_DB_PATH')
+        return None
 
-                # Remove 'DPAPI' prefix from the encrypted key (first 5 bytes).
-                encrypted_key = encrypted_key[5:]
+    @contextmanager
+    def open_database(self, db_path):
+        """
+        Open a consistent, read-only view of the browser's database.
 
-                # Use CryptUnprotectData to decrypt the AES key.
-                decrypted_key = win32crypt.CryptUnprotectData(encrypted_key, None, None, None, 0)[1]
-                return decrypted_key
-            else:
-                return None
+        The snapshot strategy decides how:
+        - 'backup' copies the database page by page with SQLite's backup API into a temporary file.
+          Unlike a file copy, this includes changes still in the browser's write-ahead log.
+        - 'immutable' reads the database in place without taking any locks and without copying it. It
+          ignores the write-ahead log, so it suits databases the browser is not writing to.
+        - 'copy' copies the database file into a temporary directory.
 
-        except Exception as e:
-            print(f"Error decrypting AES key: {e}")
-            return None
+        When the database can't be opened with the 'backup' or 'immutable' strategy, for example because
+        the browser has it locked, it falls back to copying the file. Any temporary copy is removed when
+        the context exits.
 
-    def import_browser(self):
+        Parameters:
+            db_path (str): The path of the browser's Login Data database.
+
+        Yields:
+            sqlite3.Connection: A connection to the snapshot.
+        """
+        with tempfile.TemporaryDirectory() as tmpdirname:
+            snapshot_path = os.path.join(tmpdirname, "Login Data")
+            conn = None
+            try:
+                if self.snapshot_strategy == "backup":
+                    conn = self._backup_snapshot(db_path, snapshot_path)
+                elif self.snapshot_strategy == "immutable":
+                    conn = self._immutable_snapshot(db_path)
+            except sqlite3.OperationalError as e:
+                print(f"Could not snapshot {db_path} with the {self.snapshot_strategy} strategy ({e}), "
+                      f"copying it instead.")
+
+            if conn is None:
+                shutil.copyfile(db_path, snapshot_path)
+                conn = sqlite3.connect(snapshot_path)
+
+            try:
+                yield conn
+            finally:
+                conn.close()
+
+    def _backup_snapshot(self, db_path, snapshot_path):
+        """
+        Copy the browser's database with SQLite's online backup API, snapshot_pages pages per step.
+
+        Parameters:
+            db_path (str): The path of the browser's Login Data database.
+            snapshot_path (str): The path of the snapshot to create.
+
+        Returns:
+            sqlite3.Connection: A connection to the snapshot.
         """
-        Import password data from the browser's database, and store the encrypted AES key in the database.
+        source = sqlite3.connect(f"{pathlib.Path(db_path).resolve().as_uri()}?mode=ro", uri=True,
+                                 timeout=self.LOCK_TIMEOUT)
+        target = sqlite3.connect(snapshot_path)
+        deadline = time.monotonic() + self.LOCK_TIMEOUT
+
+        def progress(status, remaining, total):
+            # The backup API retries locked steps forever, so give up once the browser held its lock
+            # for longer than LOCK_TIMEOUT.
+            nonlocal deadline
+            if status not in SQLITE_LOCKED_CODES:
+                deadline = time.monotonic() + self.LOCK_TIMEOUT
+            elif time.monotonic() > deadline:
+                raise sqlite3.OperationalError("database is locked")
 
-        This method copies the browser's database to avoid locking issues, then queries it to retrieve
-        password-related information. It also decrypts the AES key and stores it in the user's table.
+        try:
+            source.backup(target, pages=self.snapshot_pages, progress=progress, sleep=0.05)
+        except sqlite3.Error:
+            target.close()
+            raise
+        finally:
+            source.close()
+        return target
+
+    def _immutable_snapshot(self, db_path):
         """
+        Open the browser's database in place as a read-only, immutable database.
+
+        Parameters:
+            db_path (str): The path of the browser's Login Data database.
+
+        Returns:
+            sqlite3.Connection: A connection to the database.
+        """
+        conn = sqlite3.connect(f"{pathlib.Path(db_path).resolve().as_uri()}?mode=ro&immutable=1", uri=True)
         try:
-            db_path = None
-
-            # Set the database path based on the browser.
-            if self.browser == "None":
-                pass
-            elif self.browser == "Chrome":
-                db_path = os.getenv('CHROME_DB_PATH')
-            elif self.browser == "Microsoft Edge":
-                db_path = os.getenv('EDGE_DB_PATH')
-
-            # Only proceed if a valid path was set.
-            if db_path:
-                # Use a temporary directory to copy the database and avoid file lock issues.
-                with tempfile.TemporaryDirectory() as tmpdirname:
-                    db_copy_path = os.path.join(tmpdirname, "Login Data")
-
-                    # Copy the database file.
-                    shutil.copyfile(db_path, db_copy_path)
-
-                    # Connect to the copied database.
-                    conn = sqlite3.connect(db_copy_path)
-                    cursor = conn.cursor()
-
-                    # Query the database for password-related data.
-                    query = ("SELECT origin_url, signon_realm, username_value, password_value, "
-                             "date_created, date_last_used, date_password_modified "
-                             "FROM logins")
-                    cursor.execute(query)
-                    rows = cursor.fetchall()
-
-                    # Store the retrieved data in class attributes.
-                    self.origin_urls = [row[0] for row in rows]
-                    self.urls = [row[1] for row in rows]
-                    self.usernames = [row[2] for row in rows]
-                    self.passwords = [row[3] for row in rows]
-                    self.creation_dates = [row[4] for row in rows]
-                    self.last_used_dates = [row[5] for row in rows]
-                    self.password_modified_dates = [row[6] for row in rows]
-                    self.data = rows
-
-                    conn.close()
+            # SQLite opens the file lazily, so read the schema to surface errors here.
+            conn.execute("SELECT count(*) FROM sqlite_master").fetchone()
+        except sqlite3.Error:
+            conn.close()
+            raise
+        return conn
+
+    def iter_logins(self):
+        """
+        Stream the logins stored in the browser's database.
+
+        The rows are fetched batch_size at a time, and the snapshot stays open until the generator is
+        exhausted or closed.
+
+        Yields:
+            tuple: (origin_url, signon_realm, username, password, date_created, date_last_used,
+                   date_password_modified) rows.
+        """
+        db_path = self.get_db_path()
+        if not db_path:
+            return
+
+        with self.open_database(db_path) as conn:
+            cursor = conn.execute(self.LOGINS_QUERY)
+            while True:
+                rows = cursor.fetchmany(self.batch_size)
+                if not rows:
+                    break
+                yield from rows
+
+    def import_browser(self):
+        """
+        Decrypt the browser's AES key and store it in the user's table.
 
+        The logins themselves are streamed into the vault by insert_data().
+        """
+        try:
             # Retrieve and store the decrypted AES key in the user's table.
             decrypted_key = self.get_decrypted_aes_key()
             if decrypted_key:
-                db_path = os.getenv("DB_PATH")
-                conn = sqlite3.connect(db_path)
-                cursor = conn.cursor()
-
                 # Update the user's record with the decrypted AES key.
-                cursor.execute("UPDATE users SET encrypted_key = ? WHERE id = ?", (decrypted_key, current_user.id))
-                conn.commit()
-                conn.close()
+                store_user_key(current_user.id, decrypted_key)
+
+                # The user's key changed, so drop any cached copy of the key and the profile.
+                key_cache.invalidate(user_id=current_user.id)
+                user_cache.invalidate(current_user.id)
 
-        except PermissionError as e:
-            print(f"Permission denied: {e.filename} - {e.strerror}")
         except Exception as e:
             print({e})
 
-    def insert_data(self):
+    def insert_data(self, user_id=None):
         """
-        Insert the retrieved browser password data into the user's accounts table in the database.
+        Stream the browser's password data into the user's accounts table in the database.
 
-        This method checks for duplicates before inserting new records and retrieves the website icons using Clearbit's
-        Logo API.
+        The logins are read from the browser in batches and bulk inserted in chunks as they are read, and
+        rows that already exist in the vault are skipped or updated according to IMPORT_ON_CONFLICT. The
+        rows are inserted without icons, which are then resolved per unique domain in the background.
+
+        Parameters:
+            user_id (int or None): The ID of the user to import for. Defaults to the logged-in user.
+
+        Returns:
+            dict or None: The number of inserted, updated and skipped rows, or None if the import failed.
         """
+        user_id = user_id or current_user.id
         try:
-            db_path = os.getenv("DB_PATH")
-            conn = sqlite3.connect(db_path)
-            cursor = conn.cursor()
-
-            # Ensure that user_id is set correctly.
-            user_id = current_user.id
-
-            # Insert each row of browser data into the accounts table, avoiding duplicates.
-            for row in self.data:
-                (origin_url, signon_realm, username_value, password_value,
-                 date_created, date_last_used, date_modified_password) = row
-
-                # Fetch the icon for the URL and retrieve browser.
-                icon_url = get_clearbit_logo(origin_url)
-                browser = self.browser
-
-                # Check if the combination of user_id, url, and username already exists.
-                cursor.execute(
-                    "SELECT 1 FROM accounts WHERE user_id = ? AND full_url = ? AND username = ?",
-                    (user_id, origin_url, username_value)
-                )
-
-                result = cursor.fetchone()
-                if result is None:
-                    # Only insert the new record if it doesn't exist.
-                    cursor.execute(
-                        ("INSERT INTO accounts (user_id, full_url, url, icon, username, password, "
-                         "browser, date_created, date_last_used, date_password_modified) "
-                         "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"),
-                        (user_id, origin_url, signon_realm, icon_url, username_value, password_value,
-                         browser, date_created, date_last_used, date_modified_password)
-                    )
-
-            # Save the changes and close connection.
-            conn.commit()
-            conn.close()
+            # Insert the rows in chunks as they are read, leaving the icons for later.
+            rows = (row + (None,) for row in self.iter_logins())
+            counts = upsert_accounts(user_id, self.browser, rows, chunk_size=self.batch_size)
+            print(f"Imported {self.browser} logins: {counts['inserted']} inserted, "
+                  f"{counts['updated']} updated, {counts['skipped']} skipped.")
+            if counts['inserted'] or counts['updated']:
+                bump_vault_version(user_id)
+
+            # Resolve the icons concurrently once the rows are in place.
+            icon_resolver.fill_icons_async(current_app._get_current_object(), user_id)
+            return counts
+        except PermissionError as e:
+            print(f"Permission denied: {e.filename} - {e.strerror}")
         except Exception as e:
             print({e})
+        return None
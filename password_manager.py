@@ -1,14 +1,15 @@
 # Import modules.
 import os
+import hmac
+import hashlib
+import time
 from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 from cryptography.hazmat.backends import default_backend
 from password_input import PasswordInput
-from dotenv import load_dotenv
-import sqlite3
-
-# Load environment variables.
-load_dotenv()
-db_path = os.getenv("DB_PATH")
+from key_cache import key_cache
+from metrics import metrics
+from data_access import get_password_blob, get_password_blobs, get_user_key, get_key_version
 
 
 class PasswordManager:
@@ -17,19 +18,40 @@ class PasswordManager:
 
     Attributes:
         browser (str): The browser for which passwords are managed ('Chrome', 'Microsoft Edge').
+        user_id (int or None): The ID of the user whose key is used, if known.
         decrypted_key (bytes): The decrypted AES key used for encrypting and decrypting passwords.
+        key_version (int or None): The version of the user's stored key the decrypted key belongs to.
     """
 
-    def __init__(self, browser):
+    def __init__(self, browser, user_id=None, key_version=None):
         """
         Initialize the PasswordManager with a specific browser and retrieve the decrypted AES key.
 
+        The key is served from the process-wide key cache, so only the first manager for a given
+        user, browser and key version loads it. The key stored for the user is preferred, since it is
+        the one the vault was last encrypted with; the key is only loaded from the browser with the
+        configured key provider if none is stored.
+
         Parameters:
             browser (str): The browser name ('Chrome', 'Microsoft Edge') from which passwords are managed.
+            user_id (int or None): The ID of the user whose key is used. Keys are cached per user.
+            key_version (int or None): The version of the user's stored key, for example from the signed-in
+                                       user's cached profile. Read from the database if None.
         """
         self.browser = browser
+        self.user_id = user_id
         password_input = PasswordInput(self.browser)
-        self.decrypted_key = password_input.get_decrypted_aes_key()
+        def load_key():
+            stored_key = get_user_key(user_id) if user_id is not None else None
+            return stored_key or password_input.get_decrypted_aes_key()
+
+        # Read the version before the key, so a key replaced in between is reloaded on the next lookup.
+        if key_version is None and user_id is not None:
+            key_version = get_key_version(user_id)
+        self.key_version = key_version
+        self.decrypted_key = key_cache.get_or_load(user_id, password_input.get_key_source(), load_key,
+                                                   version=self.key_version)
+        self._aead = None
 
     # def return_aes_key(self):
     #     """
@@ -42,6 +64,7 @@ class PasswordManager:
     #     decrypted_key = password_input.get_decrypted_aes_key()
     #     return decrypted_key
 
+    @metrics.timed("encrypt")
     def encrypt_password(self, plain_password):
         """
         Encrypt a plain password using AES-GCM encryption.
@@ -66,6 +89,7 @@ class PasswordManager:
         encrypted_password = b'v10' + nonce + ciphertext + encryptor.tag
         return encrypted_password
 
+    @metrics.timed("decrypt")
     def decrypt_password(self, encrypted_password):
         """
         Decrypt an encrypted password using AES-GCM.
@@ -95,9 +119,86 @@ class PasswordManager:
             print(f"Failed to decrypt password: {e}")
             return None
 
+    def fingerprint_password(self, plain_password):
+        """
+        Compute a keyed fingerprint of a password, used to detect changed passwords between breach scans.
+
+        The fingerprint is an HMAC-SHA256 under a sub-key derived from the AES key, so it cannot be
+        used to guess passwords without that key.
+
+        Parameters:
+            plain_password (str): The password in plain text.
+
+        Returns:
+            bytes: The 32-byte fingerprint.
+        """
+        fingerprint_key = hmac.new(self.decrypted_key, b"breach-fingerprint", hashlib.sha256).digest()
+        return hmac.new(fingerprint_key, plain_password.encode('utf-8'), hashlib.sha256).digest()
+
+    def decrypt_blobs(self, encrypted_passwords):
+        """
+        Decrypt many encrypted password blobs with a single reusable AES-GCM object.
+
+        Parameters:
+            encrypted_passwords (iterable): The encrypted password blobs, in the browser's 'v10' format.
+
+        Yields:
+            tuple: A (password, error) pair per blob. The password is None and the error holds a
+                   description if that blob could not be decrypted.
+        """
+        try:
+            if self._aead is None:
+                self._aead = AESGCM(self.decrypted_key)
+        except Exception as e:
+            # Without a usable key every blob fails the same way.
+            for _ in encrypted_passwords:
+                yield None, f"Invalid AES key: {e}"
+            return
+
+        for encrypted_password in encrypted_passwords:
+            try:
+                # AESGCM expects the ciphertext followed by the authentication tag.
+                nonce = encrypted_password[3:15]
+                decrypted_password = self._aead.decrypt(nonce, encrypted_password[15:], None)
+                yield decrypted_password.decode('utf-8'), None
+            except Exception as e:
+                yield None, f"Failed to decrypt password: {e!r}"
+
+    def decrypt_many(self, user_id, account_ids=None):
+        """
+        Read and decrypt the passwords of many accounts at once.
+
+        All blobs are fetched with as few queries as possible, and decrypted with a single AES-GCM object.
+
+        Parameters:
+            user_id (int): The ID of the user who owns the accounts.
+            account_ids (list or None): The IDs of the accounts to decrypt. Decrypts the whole vault if None.
+
+        Returns:
+            dict: Maps each account ID to a (password, error) pair. Accounts that do not exist or do not
+                  belong to the user are reported with an error.
+        """
+        if account_ids is not None:
+            account_ids = list(account_ids)
+
+        try:
+            rows = get_password_blobs(user_id, account_ids)
+        except Exception as e:
+            print(f"Error reading passwords: {e}")
+            return {account_id: (None, f"Error reading password: {e}") for account_id in account_ids or []}
+
+        results = {account_id: (None, "Account not found") for account_id in account_ids or []}
+        start = time.perf_counter()
+        decrypted = self.decrypt_blobs(blob for _, blob in rows)
+        for (account_id, _), result in zip(rows, decrypted):
+            results[account_id] = result
+        if rows and metrics.enabled:
+            metrics.observe("decrypt", time.perf_counter() - start, count=len(rows))
+        return results
+
     def read_and_decrypt_password(self, user_id, account_id):
         """
-        Read an encrypted password from the SQLite database and decrypt it.
+        Read an encrypted password from the database and decrypt it.
 
         Args:
             user_id (int): The ID of the user who owns the account.
@@ -107,14 +208,8 @@ class PasswordManager:
             str: The decrypted password in plain text, or None if decryption fails.
         """
         try:
-            # Connect to the SQLite database.
-            conn = sqlite3.connect(db_path)
-            cursor = conn.cursor()
-
             # Query the database for the encrypted password.
-            cursor.execute("SELECT password FROM accounts WHERE user_id = ? and id = ?", (user_id, account_id))
-            encrypted_password_blob = cursor.fetchone()[0]
-            conn.close()
+            encrypted_password_blob = get_password_blob(user_id, account_id)
 
             # Decrypt the password.
             decrypted_password = self.decrypt_password(encrypted_password_blob)
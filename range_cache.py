@@ -0,0 +1,130 @@
+# Import modules.
+import sqlite3
+import threading
+import time
+import zlib
+from collections import namedtuple
+
+# A cached range response.
+CachedRange = namedtuple("CachedRange", ["body", "etag", "last_modified", "is_fresh"])
+
+
+class RangeCache:
+    """
+    A persistent SQLite cache for Pwned Passwords range responses.
+
+    Each 5-character prefix maps to the compressed response body together with its ETag and
+    Last-Modified validators. Entries younger than the TTL are served directly; older entries are
+    revalidated with a conditional request. When the cache grows past max_entries, the least recently
+    used prefixes are evicted. A hit only records its access time if the recorded one is older than
+    touch_interval, so repeated lookups of a prefix are reads and don't each commit a write.
+
+    Attributes:
+        path (str): The path of the SQLite cache file.
+        ttl (float): Number of seconds a range is served without revalidation.
+        max_entries (int): Maximum number of prefixes kept in the cache.
+        touch_interval (float): Number of seconds within which hits don't update a prefix's access time.
+    """
+    def __init__(self, path, ttl=86400, max_entries=10000, touch_interval=60):
+        """
+        Initialize the range cache and create its table if needed.
+
+        Parameters:
+            path (str): The path of the SQLite cache file.
+            ttl (float): Number of seconds a range is served without revalidation.
+            max_entries (int): Maximum number of prefixes kept in the cache.
+            touch_interval (float): Number of seconds within which hits don't update a prefix's access time.
+        """
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.touch_interval = touch_interval
+        self._local = threading.local()
+
+        conn = self._connection()
+        conn.execute("CREATE TABLE IF NOT EXISTS ranges ("
+                     "prefix TEXT PRIMARY KEY, body BLOB NOT NULL, etag TEXT, last_modified TEXT, "
+                     "fetched_at REAL NOT NULL, accessed_at REAL NOT NULL)")
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_ranges_accessed_at ON ranges (accessed_at)")
+        conn.commit()
+
+    def _connection(self):
+        """
+        Return the SQLite connection of the calling thread.
+
+        Returns:
+            sqlite3.Connection: A connection reused for all cache operations made by this thread.
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(self.path, timeout=30)
+        return conn
+
+    def get(self, prefix):
+        """
+        Return the cached range for a prefix.
+
+        Parameters:
+            prefix (str): The 5-character uppercase SHA-1 prefix.
+
+        Returns:
+            CachedRange or None: The cached body and validators, or None if the prefix is not cached.
+        """
+        conn = self._connection()
+        row = conn.execute("SELECT body, etag, last_modified, fetched_at, accessed_at FROM ranges WHERE prefix = ?",
+                           (prefix,)).fetchone()
+        if row is None:
+            return None
+
+        body, etag, last_modified, fetched_at, accessed_at = row
+        now = time.time()
+        if now - accessed_at >= self.touch_interval:
+            conn.execute("UPDATE ranges SET accessed_at = ? WHERE prefix = ?", (now, prefix))
+            conn.commit()
+
+        return CachedRange(zlib.decompress(body).decode('utf-8'), etag, last_modified,
+                           now - fetched_at < self.ttl)
+
+    def put(self, prefix, body, etag=None, last_modified=None):
+        """
+        Store a freshly downloaded range and evict old prefixes if the cache is full.
+
+        Parameters:
+            prefix (str): The 5-character uppercase SHA-1 prefix.
+            body (str): The range response body.
+            etag (str or None): The ETag header of the response.
+            last_modified (str or None): The Last-Modified header of the response.
+        """
+        conn = self._connection()
+        now = time.time()
+        conn.execute("INSERT OR REPLACE INTO ranges (prefix, body, etag, last_modified, fetched_at, accessed_at) "
+                     "VALUES (?, ?, ?, ?, ?, ?)",
+                     (prefix, zlib.compress(body.encode('utf-8')), etag, last_modified, now, now))
+
+        # Evict the least recently used prefixes beyond the size cap.
+        count = conn.execute("SELECT COUNT(*) FROM ranges").fetchone()[0]
+        if count > self.max_entries:
+            conn.execute("DELETE FROM ranges WHERE prefix IN "
+                         "(SELECT prefix FROM ranges ORDER BY accessed_at LIMIT ?)",
+                         (count - self.max_entries,))
+        conn.commit()
+
+    def touch(self, prefix):
+        """
+        Mark a cached range as fresh again after a successful revalidation.
+
+        Parameters:
+            prefix (str): The 5-character uppercase SHA-1 prefix.
+        """
+        conn = self._connection()
+        now = time.time()
+        conn.execute("UPDATE ranges SET fetched_at = ?, accessed_at = ? WHERE prefix = ?", (now, now, prefix))
+        conn.commit()
+
+    def clear(self):
+        """
+        Remove all cached ranges.
+        """
+        conn = self._connection()
+        conn.execute("DELETE FROM ranges")
+        conn.commit()
@@ -0,0 +1,103 @@
+# Import modules.
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import inspect, text
+from models import db
+
+# Full-text index over the searchable account columns. It is an external-content table, so it stores
+# only the index and reads the column values from the accounts table itself.
+ACCOUNTS_FTS_TABLE = """
+CREATE VIRTUAL TABLE accounts_fts USING fts5(
+    url, full_url, username,
+    content='accounts', content_rowid='id',
+    tokenize="unicode61 remove_diacritics 2", prefix='2 3 4'
+)
+"""
+
+# Triggers keeping the full-text index in sync with every insert, update and delete of an account.
+ACCOUNTS_FTS_TRIGGERS = [
+    """
+    CREATE TRIGGER accounts_fts_insert AFTER INSERT ON accounts BEGIN
+        INSERT INTO accounts_fts(rowid, url, full_url, username)
+        VALUES (new.id, new.url, new.full_url, new.username);
+    END
+    """,
+    """
+    CREATE TRIGGER accounts_fts_delete AFTER DELETE ON accounts BEGIN
+        INSERT INTO accounts_fts(accounts_fts, rowid, url, full_url, username)
+        VALUES ('delete', old.id, old.url, old.full_url, old.username);
+    END
+    """,
+    """
+    CREATE TRIGGER accounts_fts_update AFTER UPDATE OF url, full_url, username ON accounts BEGIN
+        INSERT INTO accounts_fts(accounts_fts, rowid, url, full_url, username)
+        VALUES ('delete', old.id, old.url, old.full_url, old.username);
+        INSERT INTO accounts_fts(rowid, url, full_url, username)
+        VALUES (new.id, new.url, new.full_url, new.username);
+    END
+    """,
+]
+
+
+def upgrade_schema(db):
+    """
+    Bring an existing database up to date with the models.
+
+    db.create_all() only creates missing tables, so columns added to existing models are added here
+    with ALTER TABLE, and indexes added to existing models are created here. Every step is idempotent,
+    so it is safe to run on every deployment.
+
+    Parameters:
+        db (SQLAlchemy): The Flask-SQLAlchemy database object, used inside an application context.
+    """
+    db.create_all()
+
+    inspector = inspect(db.engine)
+    with db.engine.begin() as conn:
+        for table in db.metadata.sorted_tables:
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    column_type = column.type.compile(dialect=db.engine.dialect)
+                    conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+
+            existing_indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in existing_indexes:
+                    index.create(conn)
+
+        if db.engine.dialect.name == "sqlite":
+            create_search_index(conn)
+
+
+def create_search_index(conn):
+    """
+    Create the full-text search index over the accounts and its sync triggers, if they are missing.
+
+    A newly created index is filled from the existing accounts.
+
+    Parameters:
+        conn (Connection): A SQLite connection inside a transaction.
+    """
+    existing = set(conn.execute(text(
+        "SELECT name FROM sqlite_master WHERE name = 'accounts_fts' OR name LIKE 'accounts_fts_%'"
+    )).scalars())
+
+    if "accounts_fts" not in existing:
+        conn.execute(text(ACCOUNTS_FTS_TABLE))
+        conn.execute(text("INSERT INTO accounts_fts(accounts_fts) VALUES ('rebuild')"))
+
+    for trigger in ACCOUNTS_FTS_TRIGGERS:
+        name = trigger.split()[2]
+        if name not in existing:
+            conn.execute(text(trigger))
+
+
+@click.command("migrate")
+@with_appcontext
+def migrate_command():
+    """
+    Create the database, or bring an existing one up to date with the models.
+    """
+    upgrade_schema(db)
+    click.echo("Database schema is up to date.")
@@ -0,0 +1,61 @@
+# Import modules.
+import os
+
+
+class EnvSetting:
+    """
+    An attribute read from an environment variable on first use, unless it was given a value.
+
+    The application's shared instances are created when their modules are imported, before create_app()
+    loads the .env file. Reading their settings on first use instead of in __init__ lets them pick up the
+    values from the .env file.
+
+    Attributes:
+        name (str): The environment variable.
+        default (object): The value used if the variable is not set.
+        cast (callable): Converts the variable's text, or the default, to the setting's value.
+    """
+    def __init__(self, name, default=None, cast=None):
+        """
+        Initialize the setting.
+
+        Parameters:
+            name (str): The environment variable.
+            default (object): The value used if the variable is not set.
+            cast (callable or None): Converts the variable's text, or the default, to the setting's value.
+        """
+        self.name = name
+        self.default = default
+        self.cast = cast
+        self.attribute = None
+
+    def __set_name__(self, owner, name):
+        self.attribute = f"_{name}"
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        value = instance.__dict__.get(self.attribute)
+        if value is None:
+            value = os.getenv(self.name, self.default)
+            if value is not None and self.cast is not None:
+                value = self.cast(value)
+            instance.__dict__[self.attribute] = value
+        return value
+
+    def __set__(self, instance, value):
+        # None leaves the setting to the environment variable.
+        instance.__dict__[self.attribute] = value
+
+
+def is_on(value):
+    """
+    Interpret an on/off setting.
+
+    Parameters:
+        value (str or bool): The setting, such as 'on' or 'off'.
+
+    Returns:
+        bool: False if the setting is 'off', True otherwise.
+    """
+    return value if isinstance(value, bool) else str(value).lower() != "off"
@@ -0,0 +1,224 @@
+# Import modules.
+import os
+import re
+import threading
+import time
+from sqlalchemy import event
+from settings import EnvSetting, is_on
+
+# Statements that take SQLite's write lock.
+WRITE_STATEMENT = re.compile(r"^\s*(INSERT|UPDATE|DELETE|REPLACE)\b", re.IGNORECASE)
+
+# Values a pragma may be set to, so settings from the environment can't inject SQL.
+PRAGMA_VALUE = re.compile(r"^-?\w+$")
+
+
+class SqliteTuning:
+    """
+    Applies performance pragmas to every SQLite connection of an engine, checkpoints the write-ahead
+    log in the background and records how long writes wait for the database lock.
+
+    With the default rollback journal a writer blocks every reader, so workers serialize on the database
+    lock. In WAL mode readers keep reading the last committed state while one writer appends to the log.
+
+    Attributes:
+        enabled (bool): Whether the pragmas are applied.
+        pragmas (dict): The pragmas set on each new connection, in order.
+        checkpoint_interval (float): Seconds between WAL checkpoints, or 0 to leave them to SQLite.
+        checkpoint_mode (str): The wal_checkpoint mode, such as 'PASSIVE' or 'TRUNCATE'.
+    """
+    enabled = EnvSetting("SQLITE_TUNING", "on", is_on)
+    journal_mode = EnvSetting("SQLITE_JOURNAL_MODE", "WAL")
+    synchronous = EnvSetting("SQLITE_SYNCHRONOUS", "NORMAL")
+    busy_timeout = EnvSetting("SQLITE_BUSY_TIMEOUT", 5000, int)
+    cache_size = EnvSetting("SQLITE_CACHE_SIZE", -20000, int)
+    mmap_size = EnvSetting("SQLITE_MMAP_SIZE", 268435456, int)
+    temp_store = EnvSetting("SQLITE_TEMP_STORE", "MEMORY")
+    checkpoint_interval = EnvSetting("SQLITE_CHECKPOINT_INTERVAL", 60, float)
+    checkpoint_mode = EnvSetting("SQLITE_CHECKPOINT_MODE", "PASSIVE", str.upper)
+
+    def __init__(self, enabled=None, journal_mode=None, synchronous=None, busy_timeout=None, cache_size=None,
+                 mmap_size=None, temp_store=None, checkpoint_interval=None, checkpoint_mode=None):
+        """
+        Initialize the tuning settings. Unset settings are read from the environment.
+
+        Parameters:
+            enabled (bool or None): Whether to apply the pragmas. Defaults to SQLITE_TUNING ('on').
+            journal_mode (str or None): The journal mode. Defaults to SQLITE_JOURNAL_MODE ('WAL').
+            synchronous (str or None): The fsync level. Defaults to SQLITE_SYNCHRONOUS ('NORMAL').
+            busy_timeout (int or None): Milliseconds to wait for a lock. Defaults to SQLITE_BUSY_TIMEOUT (5000).
+            cache_size (int or None): Page cache size, in pages or negative KiB. Defaults to SQLITE_CACHE_SIZE
+                                      (-20000, about 20 MB).
+            mmap_size (int or None): Bytes of the database file to memory-map. Defaults to SQLITE_MMAP_SIZE
+                                     (268435456).
+            temp_store (str or None): Where temporary tables live. Defaults to SQLITE_TEMP_STORE ('MEMORY').
+            checkpoint_interval (float or None): Seconds between checkpoints. Defaults to
+                                                 SQLITE_CHECKPOINT_INTERVAL (60).
+            checkpoint_mode (str or None): The checkpoint mode. Defaults to SQLITE_CHECKPOINT_MODE ('PASSIVE').
+        """
+        self.enabled = enabled
+        self.journal_mode = journal_mode
+        self.synchronous = synchronous
+        self.busy_timeout = busy_timeout
+        self.cache_size = cache_size
+        self.mmap_size = mmap_size
+        self.temp_store = temp_store
+        self.checkpoint_interval = checkpoint_interval
+        self.checkpoint_mode = checkpoint_mode.upper() if checkpoint_mode else None
+        self._pragmas = None
+        self._stats = {"writes": 0, "write_seconds": 0.0, "max_write_seconds": 0.0, "lock_errors": 0,
+                       "checkpoints": 0, "checkpointed_frames": 0}
+        self._lock = threading.Lock()
+        self._checkpoint_pid = None
+
+    @property
+    def pragmas(self):
+        """
+        Return the pragmas set on each new connection, validated on first use.
+
+        Returns:
+            dict: The pragma values by name, in order.
+
+        Raises:
+            ValueError: If a value is not a plain word or number.
+        """
+        if self._pragmas is None:
+            pragmas = {"journal_mode": self.journal_mode, "synchronous": self.synchronous,
+                       "busy_timeout": self.busy_timeout, "cache_size": self.cache_size,
+                       "mmap_size": self.mmap_size, "temp_store": self.temp_store}
+            for name, value in pragmas.items():
+                if not PRAGMA_VALUE.match(str(value)):
+                    raise ValueError(f"Invalid value for PRAGMA {name}: {value!r}")
+            self._pragmas = pragmas
+        return self._pragmas
+
+    def init_app(self, app, db):
+        """
+        Tune the SQLite engine of a Flask-SQLAlchemy application, and checkpoint it in the background.
+
+        Must be called before the engine opens its first connection. The checkpoint thread is started by the
+        first request of each process, since threads started in a preloading server's master process don't
+        survive the fork into its workers.
+
+        Parameters:
+            app (Flask): The Flask application.
+            db (SQLAlchemy): The Flask-SQLAlchemy database object.
+        """
+        with app.app_context():
+            engine = db.engine
+        if engine.dialect.name != "sqlite" or not self.enabled:
+            return
+        self.install(engine)
+        if self.checkpoint_interval and self.pragmas["journal_mode"].upper() == "WAL":
+            app.before_request(lambda: self._start_checkpoints(engine))
+
+    def _start_checkpoints(self, engine):
+        """
+        Start the checkpoint thread of this process, if it isn't running yet.
+        """
+        if self._checkpoint_pid == os.getpid():
+            return
+        with self._lock:
+            if self._checkpoint_pid != os.getpid():
+                self._checkpoint_pid = os.getpid()
+                threading.Thread(target=self._checkpoint_loop, args=(engine,), name="sqlite-checkpoint",
+                                 daemon=True).start()
+
+    def install(self, engine):
+        """
+        Register the listeners applying the pragmas and recording write times on an engine.
+
+        Parameters:
+            engine (Engine): A SQLite engine.
+        """
+        event.listen(engine, "connect", self._apply_pragmas)
+        event.listen(engine, "before_cursor_execute", self._before_execute)
+        event.listen(engine, "after_cursor_execute", self._after_execute)
+        event.listen(engine, "handle_error", self._on_error)
+
+    def _apply_pragmas(self, dbapi_connection, connection_record):
+        """
+        Set the pragmas on a new DBAPI connection.
+        """
+        cursor = dbapi_connection.cursor()
+        for name, value in self.pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+    def _before_execute(self, conn, cursor, statement, parameters, context, executemany):
+        """
+        Remember when a write statement started.
+        """
+        if WRITE_STATEMENT.match(statement):
+            conn.info["write_started"] = time.perf_counter()
+
+    def _after_execute(self, conn, cursor, statement, parameters, context, executemany):
+        """
+        Record how long a write statement took, including the wait for the write lock.
+        """
+        started = conn.info.pop("write_started", None)
+        if started is not None:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self._stats["writes"] += 1
+                self._stats["write_seconds"] += elapsed
+                self._stats["max_write_seconds"] = max(self._stats["max_write_seconds"], elapsed)
+
+    def _on_error(self, context):
+        """
+        Count statements that failed because the database stayed locked for longer than busy_timeout.
+        """
+        if "database is locked" in str(context.original_exception):
+            with self._lock:
+                self._stats["lock_errors"] += 1
+
+    def checkpoint(self, engine):
+        """
+        Copy the pages of the write-ahead log back into the database file.
+
+        Parameters:
+            engine (Engine): The SQLite engine.
+
+        Returns:
+            tuple: SQLite's (busy, log frames, checkpointed frames) result.
+        """
+        with engine.connect() as conn:
+            result = tuple(conn.exec_driver_sql(f"PRAGMA wal_checkpoint({self.checkpoint_mode})").one())
+        with self._lock:
+            self._stats["checkpoints"] += 1
+            self._stats["checkpointed_frames"] += max(result[2], 0)
+        return result
+
+    def _checkpoint_loop(self, engine):
+        """
+        Checkpoint the write-ahead log every checkpoint_interval seconds, reporting the write lock waits.
+        """
+        writes = 0
+        while True:
+            time.sleep(self.checkpoint_interval)
+            try:
+                self.checkpoint(engine)
+            except Exception as e:
+                print(f"Error checkpointing the SQLite write-ahead log: {e}")
+
+            stats = self.stats()
+            if stats["writes"] != writes:
+                writes = stats["writes"]
+                print(f"SQLite writes: {stats['writes']}, {stats['write_seconds']:.3f}s total including lock waits, "
+                      f"slowest {stats['max_write_seconds'] * 1000:.1f} ms, {stats['lock_errors']} lock errors")
+
+    def stats(self):
+        """
+        Return the write and checkpoint counters of this process.
+
+        Returns:
+            dict: The number of writes, their total and maximum duration in seconds (including the wait for
+                  the write lock), the number of writes that timed out on the lock, and the number of
+                  checkpoints and checkpointed WAL frames.
+        """
+        with self._lock:
+            return dict(self._stats)
+
+
+# SQLite tuning shared by the application.
+sqlite_tuning = SqliteTuning()
@@ -0,0 +1,35 @@
+// Element showing the progress of the background breach scan
+var scanStatus = document.getElementById("breachScanStatus");
+var statusUrl = scanStatus.getAttribute("data-status-url");
+
+// Flag to track whether a scan was seen running, so the page reloads once it finishes
+var wasRunning = false;
+
+// Poll the scan status and update the progress text
+function pollBreachScan() {
+    fetch(statusUrl).then(function (response) {
+        return response.json();
+    }).then(function (job) {
+        if (job.status === "queued" || job.status === "running") {
+            wasRunning = true;
+            var text = "Checking for breaches: " + job.done + " of " + job.total + " accounts done";
+            if (job.eta !== null) {
+                text += ", about " + Math.ceil(job.eta) + "s left";
+            }
+            scanStatus.textContent = text + ".";
+            setTimeout(pollBreachScan, 1000);
+        } else if (job.status === "done" && wasRunning) {
+            // Reload to show the updated breach statuses
+            window.location.reload();
+        } else if (job.status === "done") {
+            scanStatus.textContent = "Last breach check: " + (job.total - job.skipped) + " checked, "
+                + job.skipped + " unchanged skipped, " + job.breached + " breached.";
+        } else if (job.status === "failed") {
+            scanStatus.textContent = "The last breach check failed, please try again.";
+        }
+    }).catch(function (error) {
+        console.error("Failed to poll breach scan: ", error);  // Handle any errors
+    });
+}
+
+pollBreachScan();
@@ -0,0 +1,46 @@
+// Search box and the list showing its suggestions
+var searchInput = document.getElementById("vaultSearch");
+var searchResults = document.getElementById("vaultSearchResults");
+var searchUrl = searchInput.getAttribute("data-search-url");
+
+// Timer delaying the search until the user pauses typing, and the number of the latest request
+var searchTimer = null;
+var searchRequest = 0;
+
+// Show the matching accounts as links below the search box
+function showSuggestions(results) {
+    searchResults.innerHTML = "";
+    results.forEach(function (account) {
+        var link = document.createElement("a");
+        link.href = account.show_url;
+        link.className = "list-group-item list-group-item-action" + (account.is_breached ? " text-danger" : "");
+        link.textContent = account.url + " (" + account.username + ")";
+        searchResults.appendChild(link);
+    });
+}
+
+// Fetch the suggestions for the current search text
+function searchVaults() {
+    var query = searchInput.value.trim();
+    var request = ++searchRequest;
+    if (!query) {
+        showSuggestions([]);
+        return;
+    }
+
+    fetch(searchUrl + "?q=" + encodeURIComponent(query)).then(function (response) {
+        return response.json();
+    }).then(function (data) {
+        // Ignore responses to searches the user has already typed past
+        if (request === searchRequest) {
+            showSuggestions(data.results);
+        }
+    }).catch(function (error) {
+        console.error("Failed to search vaults: ", error);  // Handle any errors
+    });
+}
+
+searchInput.addEventListener("input", function () {
+    clearTimeout(searchTimer);
+    searchTimer = setTimeout(searchVaults, 150);
+});
@@ -0,0 +1,204 @@
+# Import modules.
+import base64
+import hashlib
+import os
+import sqlite3
+import sys
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import pytest
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+# Make the application modules importable when running pytest from any directory.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """
+    A settable monotonic clock for the in-process caches, starting at 100 seconds.
+    """
+    now = [100.0]
+    monkeypatch.setattr("ttl_cache.time.monotonic", lambda: now[0])
+    return now
+
+
+# The browser key of the tests, also stored as the test user's vault key.
+KEY = bytes(range(32))
+
+
+def encrypt_password(password, key=KEY):
+    """
+    Encrypt a password the way Chromium browsers do: 'v10', a 12-byte nonce, then the AES-GCM ciphertext.
+    """
+    nonce = os.urandom(12)
+    return b"v10" + nonce + AESGCM(key).encrypt(nonce, password.encode("utf-8"), None)
+
+
+@pytest.fixture
+def login_rows():
+    """
+    Build browser login rows for upsert_accounts(), one per password, on distinct sites.
+    """
+    def build(passwords, start=0, modified=0, key=KEY):
+        return [(f"https://site{i}.example.com/login", f"https://site{i}.example.com/", f"user{i}@example.com",
+                 encrypt_password(password, key), 0, 0, modified, None)
+                for i, password in enumerate(passwords, start)]
+    return build
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    """
+    An application with an empty SQLite database and a browser key file, inside an application context.
+    """
+    key_path = tmp_path / "chrome.key"
+    key_path.write_text(base64.b64encode(KEY).decode())
+    monkeypatch.setenv("KEY_PROVIDER", "file")
+    monkeypatch.setenv("CHROME_KEY_PATH", str(key_path))
+    monkeypatch.setenv("TEMPLATE_CACHE_PATH", "")
+
+    from main import create_app, db
+    from schema import upgrade_schema
+    from key_cache import key_cache
+    from user_cache import user_cache
+
+    app = create_app({"SECRET_KEY": "test", "TESTING": True,
+                      "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'test.db'}"})
+    key_cache.invalidate()
+    user_cache.invalidate()
+    with app.app_context():
+        upgrade_schema(db)
+        yield app
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def user_id(app):
+    """
+    The ID of a Chrome user whose stored vault key is KEY.
+    """
+    from models import db, User
+    from data_access import store_user_key
+
+    user = User(email="user@example.com", password="unused", name="User", browser="Chrome")
+    db.session.add(user)
+    db.session.commit()
+    store_user_key(user.id, KEY)
+    return user.id
+
+
+@pytest.fixture
+def range_server():
+    """
+    A stand-in for the Pwned Passwords range API that sends ETags and answers 304 to matching If-None-Match
+    headers. Every range holds 50 random suffixes, plus that of 'password' in its range.
+
+    Yields:
+        tuple: The base URL, the response bodies by prefix (editable while the server runs) and the
+               (prefix, If-None-Match header) of every request received.
+    """
+    filler = [f"{i:035X}:{i + 1}" for i in range(50)]
+    sha1 = hashlib.sha1(b"password").hexdigest().upper()
+    bodies = {sha1[:5]: "\r\n".join(filler + [f"{sha1[5:]}:1000"])}
+    log = []
+
+    class RangeHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            prefix = self.path.rsplit('/', 1)[-1].upper()
+            body = bodies.get(prefix, "\r\n".join(filler)).encode()
+            etag = f'"{hashlib.sha1(body).hexdigest()}"'
+            log.append((prefix, self.headers.get("If-None-Match")))
+            if self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                body = b""
+            else:
+                self.send_response(200)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), RangeHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}", bodies, log
+    server.shutdown()
+    server.server_close()
+
+
+# Passwords in the corpus of the corpus fixture, with their breach counts.
+CORPUS_PASSWORDS = {"password": 1000, "123456": 2000, "qwerty": 30}
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    """
+    An offline breach corpus holding CORPUS_PASSWORDS and 2000 other hashes.
+    """
+    from breach_corpus import ingest_corpus, OfflineCorpus
+
+    lines = {hashlib.sha1(password.encode()).hexdigest().upper(): count
+             for password, count in CORPUS_PASSWORDS.items()}
+    lines.update((hashlib.sha1(f"filler-{i}".encode()).hexdigest().upper(), i + 1) for i in range(2000))
+    source = tmp_path / "pwned.txt"
+    source.write_text("".join(f"{sha1}:{count}\n" for sha1, count in sorted(lines.items())))
+    ingest_corpus(str(source), str(tmp_path / "pwned.corpus"))
+    corpus = OfflineCorpus(str(tmp_path / "pwned.corpus"))
+    yield corpus
+    corpus.close()
+
+
+# The columns of the logins table of Chrome's and Edge's Login Data database that imports read.
+LOGINS_SCHEMA = ("CREATE TABLE logins (origin_url VARCHAR NOT NULL, username_value VARCHAR, password_value BLOB, "
+                 "signon_realm VARCHAR NOT NULL, date_created INTEGER NOT NULL, "
+                 "date_last_used INTEGER NOT NULL DEFAULT 0, date_password_modified INTEGER NOT NULL DEFAULT 0)")
+
+
+@pytest.fixture
+def login_data(tmp_path, monkeypatch, login_rows):
+    """
+    Write a browser Login Data database with one login per password, configured as Chrome's database.
+
+    Returns:
+        callable: Called as write(passwords) to write the database; returns its path.
+    """
+    path = tmp_path / "Login Data"
+    monkeypatch.setenv("CHROME_DB_PATH", str(path))
+
+    def write(passwords):
+        conn = sqlite3.connect(path)
+        conn.execute(LOGINS_SCHEMA)
+        conn.executemany("INSERT INTO logins VALUES (?, ?, ?, ?, ?, ?, ?)",
+                         [(origin_url, username, password, signon_realm, created, last_used, modified)
+                          for origin_url, signon_realm, username, password, created, last_used, modified, _
+                          in login_rows(passwords)])
+        conn.commit()
+        conn.close()
+        return str(path)
+    return write
+
+
+@pytest.fixture
+def client(app, user_id):
+    """
+    A test client signed in as the test user.
+    """
+    from flask import g
+
+    # Requests reuse the fixture's application context, so drop what the previous request left in g.
+    @app.before_request
+    def forget_previous_request():
+        g.pop("_login_user", None)
+        g.pop("users_queries", None)
+
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session["_user_id"] = str(user_id)
+        session["_fresh"] = True
+    return client
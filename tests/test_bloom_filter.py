@@ -0,0 +1,44 @@
+# Import modules.
+import pytest
+from bloom_filter import BloomFilter, PrefilteredBackend, build_filter
+from password_breached import hash_password
+
+
+class RecordingBackend:
+    """
+    Wraps a backend and records the suffixes passed on to it.
+    """
+    def __init__(self, backend):
+        self.backend = backend
+        self.suffixes = []
+
+    def lookup(self, prefix, suffixes):
+        self.suffixes.extend(suffixes)
+        return self.backend.lookup(prefix, suffixes)
+
+
+@pytest.fixture
+def bloom_filter(corpus, tmp_path):
+    build_filter(corpus.path, str(tmp_path / "pwned.bloom"), false_positive_rate=0.001)
+    bloom_filter = BloomFilter(str(tmp_path / "pwned.bloom"))
+    yield bloom_filter
+    bloom_filter.close()
+
+
+def test_filter_contains_every_corpus_hash(corpus, bloom_filter):
+    assert all(bloom_filter.might_contain(digest) for digest in corpus.iter_digests())
+
+
+def test_false_positive_rate_stays_near_the_target(bloom_filter):
+    assert bloom_filter.measure_false_positive_rate(20000) < 0.005
+
+
+def test_safe_passwords_skip_the_backend(corpus, bloom_filter):
+    backend = RecordingBackend(corpus)
+    prefiltered = PrefilteredBackend(bloom_filter, backend)
+
+    prefix, suffix = hash_password("correct horse battery staple")
+    assert prefiltered.lookup(prefix, [suffix]) == {}
+    prefix, suffix = hash_password("password")
+    assert prefiltered.lookup(prefix, [suffix]) == {suffix: 1000}
+    assert backend.suffixes == [suffix]
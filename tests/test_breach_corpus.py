@@ -0,0 +1,49 @@
+# Import modules.
+import hashlib
+import pytest
+from breach_corpus import ingest_corpus, OfflineCorpus
+from password_breached import hash_password
+
+
+def test_breached_passwords_are_found_with_their_counts(corpus):
+    assert corpus.size == 2003
+    for password, count in {"password": 1000, "123456": 2000, "qwerty": 30}.items():
+        prefix, suffix = hash_password(password)
+        assert corpus.lookup(prefix, [suffix]) == {suffix: count}
+
+
+def test_unknown_passwords_are_left_out(corpus):
+    prefix, suffix = hash_password("correct horse battery staple")
+    assert corpus.lookup(prefix, [suffix]) == {}
+    assert corpus.count(hashlib.sha1(b"not breached").digest()) == 0
+
+
+def test_range_counts_match_the_range_api(corpus):
+    prefix, suffix = hash_password("password")
+    counts = corpus.range_counts(prefix)
+    assert counts[suffix] == 1000
+    assert all(len(other) == 35 for other in counts)
+
+
+def test_digests_are_iterated_in_order(corpus):
+    digests = list(corpus.iter_digests())
+    assert len(digests) == corpus.size
+    assert digests == sorted(digests)
+
+
+@pytest.mark.parametrize("lines", [
+    ["B" * 40 + ":1", "A" * 40 + ":1"],
+    ["XYZ:1"],
+])
+def test_unsorted_or_malformed_sources_are_rejected(tmp_path, lines):
+    source = tmp_path / "pwned.txt"
+    source.write_text("\n".join(lines) + "\n")
+    with pytest.raises(ValueError):
+        ingest_corpus(str(source), str(tmp_path / "pwned.corpus"))
+
+
+def test_other_files_are_not_opened_as_corpus(tmp_path):
+    path = tmp_path / "not.corpus"
+    path.write_bytes(b"\0" * 64)
+    with pytest.raises(ValueError):
+        OfflineCorpus(str(path))
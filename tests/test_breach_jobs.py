@@ -0,0 +1,111 @@
+# Import modules.
+import time
+import pytest
+from breach_jobs import BreachJobRunner
+from models import db, BreachJob
+
+
+class RecordingPool:
+    """
+    Stands in for the runner's thread pool, recording the submitted calls instead of running them.
+    """
+    def __init__(self):
+        self.submitted = []
+
+    def submit(self, *args):
+        self.submitted.append(args)
+
+
+@pytest.fixture
+def runner(app):
+    """
+    A job runner with a fake scan, which records its calls and reports progress halfway.
+    """
+    runner = BreachJobRunner(max_workers=1, stale_after=60)
+    runner.scans = []
+
+    def scan(user_id, progress):
+        runner.scans.append(user_id)
+        progress(2, 4)
+        return 3, 1, 2
+
+    runner.init_app(app, db, BreachJob, scan)
+    return runner
+
+
+def add_job(user_id, status="queued", heartbeat=None):
+    job = BreachJob(user_id=user_id, status=status, heartbeat=heartbeat, date_created=int(time.time()))
+    db.session.add(job)
+    db.session.commit()
+    return job.id
+
+
+def test_job_is_claimed_only_once(runner, user_id):
+    job_id = add_job(user_id)
+
+    assert runner._claim(job_id)
+    assert not runner._claim(job_id)
+    job = db.session.get(BreachJob, job_id)
+    assert (job.status, job.worker_id) == ("running", runner.worker_id)
+
+
+def test_job_with_a_stale_heartbeat_is_claimed_again(runner, user_id):
+    fresh = add_job(user_id, "running", heartbeat=time.time() - 30)
+    stale = add_job(user_id, "running", heartbeat=time.time() - 90)
+    done = add_job(user_id, "done", heartbeat=time.time() - 90)
+
+    assert not runner._claim(fresh)
+    assert runner._claim(stale)
+    assert not runner._claim(done)
+
+
+def test_run_records_progress_and_results(runner, user_id):
+    job_id = add_job(user_id)
+
+    runner._run(job_id)
+
+    db.session.expire_all()
+    job = db.session.get(BreachJob, job_id)
+    assert runner.scans == [user_id]
+    assert (job.status, job.done, job.total, job.skipped, job.breached) == ("done", 4, 4, 1, 2)
+    assert job.heartbeat is not None and job.date_finished is not None
+
+
+def test_failed_scan_marks_the_job_failed(runner, user_id):
+    def scan(user_id, progress):
+        raise RuntimeError("range API unavailable")
+
+    runner.scan = scan
+    job_id = add_job(user_id)
+
+    runner._run(job_id)
+
+    db.session.expire_all()
+    job = db.session.get(BreachJob, job_id)
+    assert (job.status, job.error) == ("failed", "range API unavailable")
+
+
+def test_submit_returns_the_active_job(runner, user_id, monkeypatch):
+    pool = RecordingPool()
+    monkeypatch.setattr(runner, "_get_executor", lambda: pool)
+
+    job = runner.submit(user_id)
+    assert runner.submit(user_id).id == job.id
+    assert pool.submitted == [(runner._run, job.id)]
+
+
+def test_job_cut_off_by_a_restart_is_resumed_once_stale(runner, user_id):
+    # The job was running in a process that died a moment ago, so its heartbeat is still fresh.
+    runner.stale_after = 0.2
+    job_id = add_job(user_id, "running", heartbeat=time.time())
+
+    runner.resume()
+
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        db.session.expire_all()
+        if db.session.get(BreachJob, job_id).status == "done":
+            break
+        time.sleep(0.1)
+    assert db.session.get(BreachJob, job_id).status == "done"
+    assert runner.scans == [user_id]
@@ -0,0 +1,119 @@
+# Import modules.
+import threading
+from types import SimpleNamespace
+import pytest
+from sqlalchemy import event
+from breach_scanner import BreachScanner, is_scan_fresh, to_unix_timestamp, WEBKIT_EPOCH_OFFSET
+from password_breached import hash_password
+from models import db, Account
+import main
+
+BREACHED = {"123456", "password"}
+
+
+class FakeBackend:
+    """
+    A breach backend answering from a fixed set of passwords and recording its lookups.
+    """
+    def __init__(self, breached=BREACHED, failing=()):
+        self.counts = {}
+        for password in breached:
+            prefix, suffix = hash_password(password)
+            self.counts.setdefault(prefix, {})[suffix] = 10
+        self.failing = set(failing)
+        self.lookups = []
+        self._lock = threading.Lock()
+
+    def lookup(self, prefix, suffixes):
+        with self._lock:
+            self.lookups.append((prefix, sorted(suffixes)))
+        if prefix in self.failing:
+            raise ConnectionError("range API unavailable")
+        counts = self.counts.get(prefix, {})
+        return {suffix: counts[suffix] for suffix in suffixes if suffix in counts}
+
+
+def test_accounts_sharing_a_prefix_cost_one_lookup():
+    backend = FakeBackend()
+    passwords = {1: "password", 2: "password", 3: "123456", 4: "not breached", 5: None}
+    progress = []
+
+    results = BreachScanner(backend, max_workers=4).scan(passwords, lambda done, total: progress.append((done, total)))
+
+    assert results == {1: True, 2: True, 3: True, 4: False, 5: None}
+    assert len(backend.lookups) == 3
+    assert sorted(prefix for prefix, _ in backend.lookups) == sorted(
+        hash_password(password)[0] for password in ("password", "123456", "not breached"))
+    assert progress[-1] == (5, 5)
+
+
+def test_failed_lookup_leaves_its_accounts_unchecked():
+    backend = FakeBackend(failing={hash_password("password")[0]})
+
+    results = BreachScanner(backend).scan({1: "password", 2: "123456"})
+
+    assert results == {1: None, 2: True}
+
+
+def test_scan_stores_all_results_with_one_update(user_id, login_rows, monkeypatch):
+    from data_access import upsert_accounts
+
+    upsert_accounts(user_id, "Chrome", login_rows(["password", "123456", "unique-1", "unique-2"]))
+    monkeypatch.setattr("breach_scanner.get_breach_backend", FakeBackend)
+    updates = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("UPDATE ACCOUNTS"):
+            updates.append(statement)
+
+    event.listen(db.engine, "before_cursor_execute", record)
+    try:
+        checked, skipped, breached = main.scan_vault(user_id)
+    finally:
+        event.remove(db.engine, "before_cursor_execute", record)
+
+    assert (checked, skipped, breached) == (4, 0, 2)
+    assert len(updates) == 1
+    stored = dict(db.session.execute(db.select(Account.username, Account.is_breached)).all())
+    assert stored == {"user0@example.com": True, "user1@example.com": True, "user2@example.com": False,
+                      "user3@example.com": False}
+
+
+@pytest.mark.parametrize("changes, fresh", [
+    ({}, True),
+    ({"date_breach_checked": 1000 - 7 * 24 * 3600}, False),
+    ({"date_password_modified": 950}, False),
+    ({"breach_fingerprint": b"other"}, False),
+    ({"is_breached": None}, False),
+])
+def test_scan_is_fresh_only_for_recent_checks_of_the_same_password(changes, fresh):
+    account = dict(date_breach_checked=900, is_breached=False, date_password_modified=800,
+                   breach_fingerprint=b"fingerprint")
+    account.update(changes)
+    assert is_scan_fresh(SimpleNamespace(**account), b"fingerprint", 1000, 7 * 24 * 3600) is fresh
+
+
+def test_browser_timestamps_are_converted_to_unix_seconds():
+    assert to_unix_timestamp((1700000000 + WEBKIT_EPOCH_OFFSET) * 10 ** 6) == 1700000000
+    assert to_unix_timestamp(1700000000) == 1700000000
+    assert to_unix_timestamp(None) == 0
+
+
+def test_rescan_skips_unchanged_passwords(user_id, login_rows, monkeypatch):
+    from data_access import upsert_accounts
+    from password_manager import PasswordManager
+
+    upsert_accounts(user_id, "Chrome", login_rows(["password", "unique-1", "unique-2"]))
+    backends = []
+    monkeypatch.setattr("breach_scanner.get_breach_backend", lambda: backends.append(FakeBackend()) or backends[-1])
+    main.scan_vault(user_id)
+
+    assert main.scan_vault(user_id) == (0, 3, 1)
+    assert backends[-1].lookups == []
+
+    # A changed password is checked again, even though its last check is recent.
+    account = db.session.execute(db.select(Account).where(Account.username == "user1@example.com")).scalar_one()
+    account.password = PasswordManager("Chrome", user_id).encrypt_password("123456")
+    db.session.commit()
+    assert main.scan_vault(user_id) == (1, 2, 2)
+    assert len(backends[-1].lookups) == 1
@@ -0,0 +1,35 @@
+# Import modules.
+from data_access import upsert_accounts
+
+PASSWORDS = [f"password-{i}" for i in range(30)]
+
+
+def test_first_import_inserts_every_row(user_id, login_rows):
+    assert upsert_accounts(user_id, "Chrome", login_rows(PASSWORDS), chunk_size=7) == {
+        "inserted": 30, "updated": 0, "skipped": 0}
+
+
+def test_reimport_skips_existing_rows(user_id, login_rows):
+    upsert_accounts(user_id, "Chrome", login_rows(PASSWORDS))
+
+    assert upsert_accounts(user_id, "Chrome", login_rows(PASSWORDS), chunk_size=7, on_conflict="ignore") == {
+        "inserted": 0, "updated": 0, "skipped": 30}
+
+
+def test_reimport_updates_only_rows_modified_since(user_id, login_rows):
+    upsert_accounts(user_id, "Chrome", login_rows(PASSWORDS))
+
+    assert upsert_accounts(user_id, "Chrome", login_rows(PASSWORDS, modified=1), chunk_size=7,
+                           on_conflict="update") == {"inserted": 0, "updated": 30, "skipped": 0}
+    assert upsert_accounts(user_id, "Chrome", login_rows(PASSWORDS, modified=1), chunk_size=7,
+                           on_conflict="update") == {"inserted": 0, "updated": 0, "skipped": 30}
+
+
+def test_mixed_import_counts_new_and_existing_rows(user_id, login_rows):
+    upsert_accounts(user_id, "Chrome", login_rows(PASSWORDS[:20]))
+
+    assert upsert_accounts(user_id, "Chrome", login_rows(PASSWORDS), chunk_size=8, on_conflict="ignore") == {
+        "inserted": 10, "updated": 0, "skipped": 20}
+    assert upsert_accounts(user_id, "Chrome", login_rows(PASSWORDS[10:], start=10, modified=1)
+                           + login_rows(["new"] * 5, start=30), chunk_size=8, on_conflict="update") == {
+        "inserted": 5, "updated": 20, "skipped": 0}
@@ -0,0 +1,58 @@
+# Import modules.
+from conftest import KEY
+from data_access import store_user_key
+from key_cache import KeyCache
+from password_manager import PasswordManager
+
+
+def test_key_is_loaded_once_and_then_served_from_the_cache(clock):
+    cache = KeyCache(ttl=300, max_entries=8)
+    loads = []
+
+    assert cache.get_or_load(1, "Local State", lambda: loads.append(1) or b"key") == b"key"
+    assert cache.get_or_load(1, "Local State", lambda: loads.append(1) or b"other") == b"key"
+    assert len(loads) == 1
+    assert cache.stats()["hits"] == 1
+
+
+def test_key_expires_after_its_ttl(clock):
+    cache = KeyCache(ttl=300, max_entries=8)
+    cache.put(1, "Local State", b"key")
+
+    clock[0] += 299
+    assert cache.get(1, "Local State") == b"key"
+    clock[0] += 1
+    assert cache.get(1, "Local State") is None
+    assert cache.stats()["expirations"] == 1
+
+
+def test_least_recently_used_key_is_evicted(clock):
+    cache = KeyCache(ttl=300, max_entries=2)
+    cache.put(1, "Local State", b"one")
+    cache.put(2, "Local State", b"two")
+    cache.get(1, "Local State")
+    cache.put(3, "Local State", b"three")
+
+    assert cache.get(2, "Local State") is None
+    assert cache.get(1, "Local State") == b"one"
+    assert cache.stats()["evictions"] == 1
+
+
+def test_invalidate_removes_only_the_matching_keys(clock):
+    cache = KeyCache(ttl=300, max_entries=8)
+    cache.put(1, "Chrome", b"a")
+    cache.put(1, "Edge", b"b")
+    cache.put(2, "Chrome", b"c")
+
+    assert cache.invalidate(user_id=1, source="Edge") == 1
+    assert cache.invalidate(user_id=1) == 1
+    assert cache.get(2, "Chrome") == b"c"
+    assert cache.invalidate() == 1
+    assert cache.stats()["size"] == 0
+
+
+def test_replaced_key_is_reloaded(user_id):
+    assert PasswordManager("Chrome", user_id).decrypted_key == KEY
+    store_user_key(user_id, b"k" * 32)
+
+    assert PasswordManager("Chrome", user_id).decrypted_key == b"k" * 32
@@ -0,0 +1,50 @@
+# Import modules.
+import pytest
+from metrics import metrics
+
+
+@pytest.fixture
+def token(monkeypatch):
+    """
+    The metrics token the application is configured with.
+    """
+    monkeypatch.setattr(metrics, "token", "secret-token")
+    return "secret-token"
+
+
+def test_metrics_are_hidden_without_a_configured_token(app, monkeypatch):
+    monkeypatch.setattr(metrics, "token", None)
+
+    assert app.test_client().get("/metrics").status_code == 404
+
+
+@pytest.mark.parametrize("authorization, status", [(None, 401), ("Bearer wrong", 401), ("Bearer secret-token", 200)])
+def test_metrics_require_the_token(app, token, authorization, status):
+    headers = {"Authorization": authorization} if authorization else {}
+
+    response = app.test_client().get("/metrics", headers=headers)
+
+    assert response.status_code == status
+    if status == 200:
+        assert response.mimetype == "text/plain"
+
+
+def test_server_timing_is_only_sent_with_the_token(app, token):
+    client = app.test_client()
+
+    assert "Server-Timing" not in client.get("/").headers
+    assert "total;dur=" in client.get("/", headers={"Authorization": f"Bearer {token}"}).headers["Server-Timing"]
+
+
+def test_server_timing_is_sent_to_admins(client, monkeypatch):
+    monkeypatch.setenv("ADMIN_EMAILS", "someone@example.com")
+    assert "Server-Timing" not in client.get("/vaults/search.json").headers
+
+    monkeypatch.setenv("ADMIN_EMAILS", "someone@example.com, User@example.com")
+    assert "Server-Timing" in client.get("/vaults/search.json").headers
+
+
+def test_server_timing_is_sent_in_debug_mode(app):
+    app.debug = True
+
+    assert "Server-Timing" in app.test_client().get("/").headers
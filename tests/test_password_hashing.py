@@ -0,0 +1,57 @@
+# Import modules.
+import pytest
+from models import db, User
+from password_hashing import PasswordHashPolicy, password_policy
+
+
+@pytest.mark.parametrize("stored, current, rehash", [
+    (("pbkdf2:sha256", 1000, 16), ("pbkdf2:sha256", 1000, 16), False),
+    (("pbkdf2:sha256", 2000, 16), ("pbkdf2:sha256", 1000, 16), False),
+    (("pbkdf2:sha256", 1000, 16), ("pbkdf2:sha256", 2000, 16), True),
+    (("pbkdf2:sha256", 1000, 8), ("pbkdf2:sha256", 1000, 16), True),
+    (("pbkdf2:sha256", 1000, 16), ("scrypt", 2 ** 10, 16), True),
+    (("scrypt", 2 ** 10, 16), ("scrypt", 2 ** 10, 16), False),
+    (("scrypt", 2 ** 10, 16), ("scrypt", 2 ** 11, 16), True),
+])
+def test_needs_rehash_compares_algorithm_cost_and_salt(stored, current, rehash):
+    stored_hash = PasswordHashPolicy(*stored).hash("secret")
+
+    assert PasswordHashPolicy(*current).verify(stored_hash, "secret")
+    assert PasswordHashPolicy(*current).needs_rehash(stored_hash) is rehash
+
+
+def test_malformed_hashes_need_rehash():
+    assert PasswordHashPolicy("pbkdf2:sha256", cost=1000).needs_rehash("plaintext")
+
+
+@pytest.fixture
+def weak_user(app, monkeypatch):
+    """
+    A user whose password 'secret' is hashed with fewer iterations than the current policy.
+    """
+    app.config["WTF_CSRF_ENABLED"] = False
+    monkeypatch.setattr(password_policy, "method", "pbkdf2:sha256")
+    monkeypatch.setattr(password_policy, "_cost", 2000)
+    user = User(email="weak@example.com", name="Weak", browser="Chrome",
+                password=PasswordHashPolicy("pbkdf2:sha256", cost=1000).hash("secret"))
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+def test_login_upgrades_a_weak_hash(app, weak_user):
+    response = app.test_client().post("/", data={"email": "weak@example.com", "password": "secret"})
+
+    assert response.status_code == 302
+    db.session.refresh(weak_user)
+    assert weak_user.password.startswith("pbkdf2:sha256:2000$")
+    assert password_policy.verify(weak_user.password, "secret")
+
+
+def test_failed_login_keeps_the_old_hash(app, weak_user):
+    old_hash = weak_user.password
+
+    app.test_client().post("/", data={"email": "weak@example.com", "password": "wrong"})
+
+    db.session.refresh(weak_user)
+    assert weak_user.password == old_hash
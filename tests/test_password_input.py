@@ -0,0 +1,128 @@
+# Import modules.
+import sqlite3
+from contextlib import contextmanager
+import pytest
+import password_input
+from password_input import PasswordInput
+from password_manager import PasswordManager
+
+PASSWORDS = [f"password-{i}" for i in range(25)]
+
+
+class RecordingConnection:
+    """
+    Wraps a connection, recording the size of every batch fetched from the cursors it returns.
+    """
+    def __init__(self, conn, batches):
+        self.conn = conn
+        self.batches = batches
+
+    def execute(self, query):
+        self.cursor = self.conn.execute(query)
+        return self
+
+    def fetchmany(self, size):
+        rows = self.cursor.fetchmany(size)
+        self.batches.append((size, len(rows)))
+        return rows
+
+
+@pytest.fixture
+def batches(monkeypatch):
+    """
+    The (requested, returned) sizes of the batches imports fetch from the browser database.
+    """
+    batches = []
+    open_database = PasswordInput.open_database
+
+    @contextmanager
+    def recording(self, db_path):
+        with open_database(self, db_path) as conn:
+            yield RecordingConnection(conn, batches)
+
+    monkeypatch.setattr(PasswordInput, "open_database", recording)
+    return batches
+
+
+@pytest.fixture(autouse=True)
+def no_icons(monkeypatch):
+    # Imports resolve icons over the network in the background; the tests don't need them.
+    monkeypatch.setattr(password_input.icon_resolver, "fill_icons_async", lambda app, user_id: None)
+
+
+def test_logins_are_read_in_batches(login_data, batches):
+    login_data(PASSWORDS)
+
+    rows = list(PasswordInput("Chrome", batch_size=10).iter_logins())
+
+    assert len(rows) == 25
+    assert batches == [(10, 10), (10, 10), (10, 5), (10, 0)]
+
+
+def test_import_streams_the_logins_into_the_vault(user_id, login_data, batches, monkeypatch):
+    login_data(PASSWORDS)
+    chunks = []
+    upsert_accounts = password_input.upsert_accounts
+
+    def recording_upsert(user_id, browser, rows, chunk_size=None, on_conflict=None):
+        # The rows must arrive as a stream, not a list holding the whole table.
+        assert not isinstance(rows, (list, tuple))
+        chunks.append(chunk_size)
+        return upsert_accounts(user_id, browser, rows, chunk_size, on_conflict)
+
+    monkeypatch.setattr(password_input, "upsert_accounts", recording_upsert)
+
+    assert PasswordInput("Chrome", batch_size=10).insert_data(user_id) == {"inserted": 25, "updated": 0,
+                                                                          "skipped": 0}
+    assert PasswordInput("Chrome", batch_size=10).insert_data(user_id) == {"inserted": 0, "updated": 0,
+                                                                          "skipped": 25}
+    assert chunks == [10, 10]
+    manager = PasswordManager("Chrome", user_id)
+    assert sorted(password for password, _ in manager.decrypt_many(user_id).values()) == sorted(PASSWORDS)
+
+
+def count_logins(strategy):
+    return sum(1 for _ in PasswordInput("Chrome", snapshot_strategy=strategy).iter_logins())
+
+
+@pytest.mark.parametrize("strategy", ["backup", "immutable", "copy"])
+def test_every_snapshot_strategy_reads_the_logins(login_data, strategy):
+    login_data(PASSWORDS)
+    assert count_logins(strategy) == 25
+
+
+def test_backup_snapshot_includes_changes_in_the_write_ahead_log(login_data):
+    path = login_data(PASSWORDS)
+    browser = sqlite3.connect(path)
+    browser.execute("PRAGMA journal_mode=WAL")
+    browser.execute("PRAGMA wal_autocheckpoint=0")
+    browser.execute("INSERT INTO logins VALUES ('https://new.example.com/', 'new', x'00', "
+                    "'https://new.example.com/', 0, 0, 0)")
+    browser.commit()
+    try:
+        # The new login is only in the log, which a copy of the database file leaves behind.
+        assert count_logins("backup") == 26
+        assert count_logins("copy") == 25
+    finally:
+        browser.close()
+
+
+@pytest.mark.parametrize("strategy, copied", [("backup", True), ("immutable", False)])
+def test_locked_database_is_still_read(login_data, strategy, copied, monkeypatch):
+    # A backup gives up on a database the browser keeps locked and copies it instead, while an immutable
+    # snapshot takes no locks at all.
+    path = login_data(PASSWORDS)
+    monkeypatch.setattr(PasswordInput, "LOCK_TIMEOUT", 0.2)
+    copies = []
+    copyfile = password_input.shutil.copyfile
+    monkeypatch.setattr(password_input.shutil, "copyfile", lambda *args: copies.append(args) or copyfile(*args))
+    browser = sqlite3.connect(path)
+    browser.execute("BEGIN EXCLUSIVE")
+    try:
+        count = count_logins(strategy)
+    finally:
+        browser.rollback()
+        browser.close()
+
+    assert count == 25
+    assert bool(copies) is copied
@@ -0,0 +1,82 @@
+# Import modules.
+from password_breached import PwnedRangeClient, hash_password
+from range_cache import RangeCache
+
+PREFIX, SUFFIX = hash_password("password")
+
+
+def test_fresh_range_is_served_from_the_cache(tmp_path, range_server):
+    url, _, log = range_server
+    client = PwnedRangeClient(base_url=url, cache=RangeCache(str(tmp_path / "ranges.db")))
+
+    assert client.lookup(PREFIX, [SUFFIX]) == {SUFFIX: 1000}
+    assert client.lookup(PREFIX, [SUFFIX]) == {SUFFIX: 1000}
+    assert log == [(PREFIX, None)]
+
+
+def test_stale_range_is_revalidated_with_its_etag(tmp_path, range_server):
+    url, _, log = range_server
+    cache = RangeCache(str(tmp_path / "ranges.db"), ttl=0)
+    client = PwnedRangeClient(base_url=url, cache=cache)
+
+    counts = client.fetch_range(PREFIX)
+    etag = cache.get(PREFIX).etag
+    assert etag
+
+    # The server answers 304 Not Modified: the cached range is used and marked fresh again.
+    assert client.fetch_range(PREFIX) == counts
+    assert log == [(PREFIX, None), (PREFIX, etag)]
+    cache.ttl = 60
+    assert cache.get(PREFIX).is_fresh
+
+
+def test_changed_range_replaces_the_cached_one(tmp_path, range_server):
+    url, bodies, log = range_server
+    cache = RangeCache(str(tmp_path / "ranges.db"), ttl=0)
+    client = PwnedRangeClient(base_url=url, cache=cache)
+    client.fetch_range(PREFIX)
+    etag = cache.get(PREFIX).etag
+
+    bodies[PREFIX] = f"{SUFFIX}:2000"
+    assert client.fetch_range(PREFIX) == {SUFFIX: 2000}
+    assert log[-1] == (PREFIX, etag)
+    assert cache.get(PREFIX).etag != etag
+
+
+def test_least_recently_used_prefixes_are_evicted(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("range_cache.time.time", lambda: now[0])
+    cache = RangeCache(str(tmp_path / "ranges.db"), ttl=60, max_entries=2, touch_interval=1)
+
+    cache.put("AAAAA", "A:1")
+    now[0] += 1
+    cache.put("BBBBB", "B:1")
+    now[0] += 1
+    cache.get("AAAAA")
+    now[0] += 1
+    cache.put("CCCCC", "C:1")
+
+    assert cache.get("BBBBB") is None
+    assert cache.get("AAAAA").body == "A:1"
+    assert cache.get("CCCCC").is_fresh
+    now[0] += 60
+    assert not cache.get("CCCCC").is_fresh
+
+
+def test_repeated_hits_only_record_their_access_once_per_interval(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("range_cache.time.time", lambda: now[0])
+    cache = RangeCache(str(tmp_path / "ranges.db"), touch_interval=60)
+    cache.put("AAAAA", "A:1")
+    statements = []
+    cache._connection().set_trace_callback(statements.append)
+
+    for _ in range(10):
+        now[0] += 1
+        cache.get("AAAAA")
+    assert not [statement for statement in statements if statement.startswith("UPDATE")]
+
+    now[0] += 60
+    cache.get("AAAAA")
+    assert [statement for statement in statements if statement.startswith("UPDATE")] == [
+        "UPDATE ranges SET accessed_at = 1070.0 WHERE prefix = 'AAAAA'"]
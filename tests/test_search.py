@@ -0,0 +1,57 @@
+# Import modules.
+from sqlalchemy import text
+from data_access import search_accounts, upsert_accounts
+from models import db, Account, User
+from schema import upgrade_schema
+
+PASSWORDS = [f"password-{i}" for i in range(12)]
+
+
+def usernames(user_id, search):
+    return [row.username for row in search_accounts(user_id, search)]
+
+
+def test_every_word_matches_a_word_prefix(user_id, login_rows):
+    upsert_accounts(user_id, "Chrome", login_rows(PASSWORDS))
+
+    assert usernames(user_id, "site3") == ["user3@example.com"]
+    assert usernames(user_id, "user1") == ["user1@example.com", "user10@example.com", "user11@example.com"]
+    assert usernames(user_id, "site1.exam user11") == ["user11@example.com"]
+    assert usernames(user_id, "xample") == []
+    assert usernames(user_id, " .. ") == []
+
+
+def test_index_follows_updates_and_deletes(user_id, login_rows):
+    upsert_accounts(user_id, "Chrome", login_rows(PASSWORDS))
+    account = db.session.execute(db.select(Account).where(Account.username == "user3@example.com")).scalar_one()
+
+    account.username = "renamed@example.com"
+    db.session.commit()
+    assert usernames(user_id, "renamed") == ["renamed@example.com"]
+    assert usernames(user_id, "user3") == []
+
+    db.session.delete(account)
+    db.session.commit()
+    assert usernames(user_id, "renamed") == []
+
+
+def test_other_users_accounts_are_not_returned(user_id, login_rows):
+    other = User(email="other@example.com", password="unused", name="Other", browser="Chrome")
+    db.session.add(other)
+    db.session.commit()
+    upsert_accounts(other.id, "Chrome", login_rows(PASSWORDS))
+
+    assert usernames(user_id, "site3") == []
+    assert usernames(other.id, "site3") == ["user3@example.com"]
+
+
+def test_new_index_is_filled_from_existing_accounts(user_id, login_rows):
+    upsert_accounts(user_id, "Chrome", login_rows(PASSWORDS))
+    with db.engine.begin() as conn:
+        for name in ("accounts_fts_insert", "accounts_fts_delete", "accounts_fts_update"):
+            conn.execute(text(f"DROP TRIGGER {name}"))
+        conn.execute(text("DROP TABLE accounts_fts"))
+
+    upgrade_schema(db)
+
+    assert usernames(user_id, "site3") == ["user3@example.com"]
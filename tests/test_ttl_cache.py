@@ -0,0 +1,74 @@
+# Import modules.
+from ttl_cache import TTLCache
+from user_cache import user_cache
+
+
+def test_entries_expire_after_their_ttl(clock):
+    cache = TTLCache(ttl=10)
+    cache.store("a", 1)
+
+    clock[0] += 9
+    assert cache.lookup("a") == 1
+    clock[0] += 1
+    assert cache.lookup("a") is None
+    assert cache.counters() == {"hits": 1, "misses": 1, "evictions": 0, "expirations": 1, "entries": 0,
+                                "size": 0}
+
+
+def test_least_recently_used_entry_is_evicted(clock):
+    cache = TTLCache(max_entries=2)
+    cache.store("a", 1)
+    cache.store("b", 2)
+    cache.lookup("a")
+    cache.store("c", 3)
+
+    assert cache.lookup("b") is None
+    assert cache.lookup("a") == 1
+    assert cache.lookup("c") == 3
+    assert cache.evictions == 1
+
+
+def test_size_bound_evicts_entries_and_skips_oversized_values(clock):
+    cache = TTLCache(max_size=10)
+    cache.store("a", "xxxx")
+    cache.store("b", "xxxx")
+    cache.store("c", "xxxx")
+    cache.store("d", "x" * 11)
+
+    assert cache.lookup("a") is None
+    assert cache.lookup("d") is None
+    assert cache.counters()["size"] == 8
+
+
+def test_invalid_entries_are_reloaded(clock):
+    cache = TTLCache()
+    cache.store("a", 1)
+
+    assert cache.load("a", lambda: 2, valid=lambda value: value == 2) == 2
+    assert cache.expirations == 1
+
+
+def test_missing_values_are_not_cached(clock):
+    cache = TTLCache(ttl=10)
+    loads = []
+
+    assert cache.load("a", lambda: loads.append(1)) is None
+    assert cache.load("a", lambda: loads.append(1) or "value") == "value"
+    assert cache.load("a", lambda: loads.append(1) or "other") == "value"
+    assert len(loads) == 2
+
+
+def test_signed_in_user_is_loaded_once(client, user_id):
+    user_cache.invalidate()
+    before = user_cache.stats()
+
+    first = client.get("/vaults/search.json?q=site")
+    second = client.get("/vaults/search.json?q=site")
+    assert first.headers["X-Users-Queries"] == "1"
+    assert second.headers["X-Users-Queries"] == "0"
+    assert user_cache.stats()["misses"] - before["misses"] == 1
+    assert user_cache.stats()["hits"] - before["hits"] == 1
+
+    user_cache.invalidate(user_id)
+    client.get("/vaults/search.json?q=site")
+    assert user_cache.stats()["misses"] - before["misses"] == 2
@@ -0,0 +1,70 @@
+# Import modules.
+import csv
+import gzip
+import io
+import pytest
+import vault_export
+from data_access import upsert_accounts
+from password_manager import PasswordManager
+from vault_export import encrypt_chunks, decrypt_chunks, export_vault
+
+# Chunks of a small export, split like the pages of a vault.
+CHUNKS = [b"name,url,username,password\r\n", b"site,https://site.example.com,user,first\r\n", b"", b"last\r\n"]
+
+
+@pytest.fixture(autouse=True)
+def cheap_scrypt(monkeypatch):
+    """
+    Derive the passphrase keys with a low scrypt cost, so the tests don't spend their time in the KDF.
+    """
+    monkeypatch.setattr(vault_export, "SCRYPT_LOG_N", 10)
+
+
+def encrypted(chunks, passphrase="correct horse"):
+    """
+    Encrypt chunks into the bytes of an encrypted export.
+    """
+    return b"".join(encrypt_chunks(iter(chunks), passphrase))
+
+
+def test_encrypted_export_round_trips():
+    data = encrypted(CHUNKS)
+
+    assert b"first" not in data
+    assert b"".join(decrypt_chunks(io.BytesIO(data), "correct horse")) == b"".join(CHUNKS)
+
+
+def test_empty_export_round_trips():
+    assert b"".join(decrypt_chunks(io.BytesIO(encrypted([])), "correct horse")) == b""
+
+
+def test_wrong_passphrase_is_refused():
+    with pytest.raises(ValueError, match="Wrong passphrase"):
+        list(decrypt_chunks(io.BytesIO(encrypted(CHUNKS)), "wrong"))
+
+
+def test_modified_export_is_refused():
+    data = bytearray(encrypted(CHUNKS))
+    data[-1] ^= 1
+
+    with pytest.raises(ValueError, match="modified"):
+        list(decrypt_chunks(io.BytesIO(bytes(data)), "correct horse"))
+
+
+def test_export_without_its_last_frame_is_refused():
+    frames = list(encrypt_chunks(iter(CHUNKS), "correct horse"))
+
+    with pytest.raises(ValueError, match="truncated"):
+        list(decrypt_chunks(io.BytesIO(b"".join(frames[:-1])), "correct horse"))
+
+
+def test_compressed_encrypted_vault_export(user_id, login_rows):
+    upsert_accounts(user_id, "Chrome", login_rows(["first", "second", "third"]))
+    manager = PasswordManager("Chrome", user_id)
+
+    data = b"".join(export_vault(manager, user_id, "csv", compress=True, passphrase="correct horse", chunk_size=2))
+    plain = gzip.decompress(b"".join(decrypt_chunks(io.BytesIO(data), "correct horse")))
+
+    rows = list(csv.DictReader(io.StringIO(plain.decode("utf-8"))))
+    assert [row["password"] for row in rows] == ["first", "second", "third"]
+    assert rows[0]["username"] == "user0@example.com"
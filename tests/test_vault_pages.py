@@ -0,0 +1,45 @@
+# Import modules.
+from data_access import upsert_accounts, bump_vault_version
+from fragment_cache import fragment_cache
+
+
+def test_unchanged_page_is_revalidated_with_a_304(client, user_id, login_rows):
+    upsert_accounts(user_id, "Chrome", login_rows(["first", "second"]))
+    fragment_cache.invalidate(user_id)
+
+    response = client.get("/vaults")
+    etag = response.headers["ETag"]
+    assert response.status_code == 200
+    assert b"https://site1.example.com/" in response.data
+
+    response = client.get("/vaults", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.data == b""
+
+
+def test_changed_vault_gets_a_new_page(client, user_id, login_rows):
+    upsert_accounts(user_id, "Chrome", login_rows(["first"]))
+    fragment_cache.invalidate(user_id)
+    etag = client.get("/vaults").headers["ETag"]
+
+    upsert_accounts(user_id, "Chrome", login_rows(["second"], start=1))
+    bump_vault_version(user_id)
+    response = client.get("/vaults", headers={"If-None-Match": etag})
+
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert b"https://site1.example.com/" in response.data
+
+
+def test_rendered_cards_are_reused_until_the_vault_changes(client, user_id, login_rows):
+    upsert_accounts(user_id, "Chrome", login_rows(["first"]))
+    fragment_cache.invalidate(user_id)
+    hits = fragment_cache.stats()["hits"]
+
+    client.get("/vaults")
+    client.get("/vaults")
+    assert fragment_cache.stats()["hits"] == hits + 1
+
+    bump_vault_version(user_id)
+    client.get("/vaults")
+    assert fragment_cache.stats()["hits"] == hits + 1
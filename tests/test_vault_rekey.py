@@ -0,0 +1,66 @@
+# Import modules.
+import pytest
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+import vault_rekey
+from conftest import KEY
+from data_access import upsert_accounts, get_password_blob_page, get_user_key, get_key_version, can_write_vault
+from models import db, RekeyJob
+from vault_rekey import VaultRekeyer
+
+
+class Interrupted(BaseException):
+    """
+    Stands in for the process being killed in the middle of a rotation.
+    """
+
+
+def open_all(user_id, key):
+    """
+    Decrypt every password of a user's vault.
+    """
+    aead = AESGCM(key)
+    return [aead.decrypt(blob[3:15], blob[15:], None) for _, blob in get_password_blob_page(user_id, size=100)]
+
+
+def test_interrupted_rotation_resumes_from_its_checkpoint(user_id, login_rows, monkeypatch):
+    upsert_accounts(user_id, "Chrome", login_rows([f"password{i}" for i in range(5)]))
+    update_passwords = vault_rekey.update_passwords
+    calls = []
+
+    def interrupt_second_chunk(passwords, commit=True):
+        calls.append(len(passwords))
+        if len(calls) == 2:
+            raise Interrupted()
+        update_passwords(passwords, commit=commit)
+
+    monkeypatch.setattr(vault_rekey, "update_passwords", interrupt_second_chunk)
+    with pytest.raises(Interrupted):
+        VaultRekeyer(chunk_size=2).run(user_id)
+    db.session.rollback()
+
+    job = db.session.execute(db.select(RekeyJob)).scalar()
+    assert (job.status, job.done) == ("running", 2)
+    assert get_user_key(user_id) == KEY
+
+    monkeypatch.setattr(vault_rekey, "update_passwords", update_passwords)
+    report = VaultRekeyer(chunk_size=2).run(user_id)
+
+    assert (report["status"], report["done"], report["total"], report["failed"]) == ("done", 5, 5, 0)
+    assert get_user_key(user_id) == job.new_key
+    assert open_all(user_id, job.new_key) == [f"password{i}".encode() for i in range(5)]
+
+
+def test_rotation_with_an_undecryptable_password_changes_nothing(user_id, login_rows):
+    rows = login_rows(["first", "second", "third"])
+    rows[1] = rows[1][:3] + (rows[1][3][:-1] + bytes([rows[1][3][-1] ^ 1]),) + rows[1][4:]
+    upsert_accounts(user_id, "Chrome", rows)
+    blobs = get_password_blob_page(user_id)
+    version = get_key_version(user_id)
+
+    report = VaultRekeyer(chunk_size=2).run(user_id)
+
+    assert (report["status"], report["done"], report["failed"]) == ("failed", 0, 1)
+    assert get_user_key(user_id) == KEY
+    assert get_key_version(user_id) == version
+    assert get_password_blob_page(user_id) == blobs
+    assert can_write_vault(user_id, version)
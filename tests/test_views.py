@@ -0,0 +1,28 @@
+# Import modules.
+import pytest
+from flask import url_for
+
+
+@pytest.mark.parametrize("path", ["/vaults", "/breached_vaults", "/vaults/1", "/vaults/1/edit", "/vaults/add"])
+def test_anonymous_visitors_are_sent_to_the_login_page(app, path):
+    with app.test_request_context():
+        login_url = url_for("views.login")
+    response = app.test_client().get(path)
+    assert response.status_code == 302
+    assert response.headers["Location"] == login_url
+
+
+@pytest.mark.parametrize("page", ["/vaults/{}", "/vaults/{}/edit"])
+def test_vault_pages_read_the_key_version_from_the_cached_profile(client, user_id, login_rows, page):
+    from data_access import upsert_accounts, get_password_blob_page
+
+    upsert_accounts(user_id, "Chrome", login_rows(["first"]))
+    path = page.format(get_password_blob_page(user_id)[0][0])
+
+    cold = client.get(path)
+    warm = client.get(path)
+
+    assert cold.status_code == warm.status_code == 200
+    # The first request loads the profile and the stored key, later ones only use the caches.
+    assert cold.headers["X-Users-Queries"] == "2"
+    assert warm.headers["X-Users-Queries"] == "0"
@@ -0,0 +1,152 @@
+# Import modules.
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """
+    A thread-safe, in-process cache with LRU eviction, and optional TTL expiry and size bound.
+
+    This is the storage shared by the key, user and fragment caches, which add their own keys and
+    methods on top of it. Entries are evicted least recently used first once the cache holds more than
+    max_entries of them, or more than max_size in total as measured by sizeof.
+
+    Attributes:
+        ttl (float or None): Number of seconds an entry stays valid, or None to keep entries until evicted.
+        max_entries (int): Maximum number of entries kept.
+        max_size (int or None): Maximum total size of the entries, or None for no size bound.
+        hits (int): Number of lookups answered from the cache.
+        misses (int): Number of lookups that found no valid entry.
+        evictions (int): Number of entries removed because the cache was full.
+        expirations (int): Number of entries removed because their TTL elapsed or they were no longer valid.
+    """
+    def __init__(self, ttl=None, max_entries=1024, max_size=None, sizeof=len):
+        """
+        Initialize an empty cache.
+
+        Parameters:
+            ttl (float or None): Number of seconds an entry stays valid. Entries don't expire if None.
+            max_entries (int): Maximum number of entries kept.
+            max_size (int or None): Maximum total size of the entries. Unbounded if None.
+            sizeof (callable): Returns the size of a value, used with max_size.
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_size = max_size
+        self.sizeof = sizeof
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def lookup(self, key, valid=None):
+        """
+        Return a cached value, updating the counters and LRU order.
+
+        Parameters:
+            key (hashable): The entry's key.
+            valid (callable or None): Called with the cached value; a false result discards the entry.
+
+        Returns:
+            object or None: The cached value, or None if it is missing, expired or no longer valid.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            value, expires_at = entry
+            if (expires_at is not None and expires_at <= time.monotonic()) or (valid and not valid(value)):
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def store(self, key, value):
+        """
+        Store a value, evicting the least recently used entries if the cache is full.
+
+        Values larger than max_size are not stored.
+
+        Parameters:
+            key (hashable): The entry's key.
+            value (object): The value.
+        """
+        size = self.sizeof(value) if self.max_size is not None else 0
+        if self.max_size is not None and size > self.max_size:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, time.monotonic() + self.ttl if self.ttl is not None else None)
+            self._size += size
+            while len(self._entries) > self.max_entries or (self.max_size is not None and self._size > self.max_size):
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def load(self, key, loader, valid=None):
+        """
+        Return a cached value, loading and caching it on a miss.
+
+        The loader runs outside the lock, so a slow load doesn't block lookups of other entries.
+
+        Parameters:
+            key (hashable): The entry's key.
+            loader (callable): A function without arguments that returns the value, or None if there is none.
+            valid (callable or None): Called with a cached value; a false result reloads it.
+
+        Returns:
+            object or None: The value, or None if the loader could not provide one. None is not cached.
+        """
+        value = self.lookup(key, valid)
+        if value is not None:
+            return value
+        value = loader()
+        if value is not None:
+            self.store(key, value)
+        return value
+
+    def discard(self, match=None):
+        """
+        Remove the entries whose key matches a predicate.
+
+        Parameters:
+            match (callable or None): Called with each key. Removes every entry if None.
+
+        Returns:
+            int: The number of removed entries.
+        """
+        with self._lock:
+            keys = [key for key in self._entries if match is None or match(key)]
+            for key in keys:
+                self._remove(key)
+            return len(keys)
+
+    def counters(self):
+        """
+        Return the cache counters.
+
+        Returns:
+            dict: The number of hits, misses, evictions and expirations, the number of entries and their
+                  total size.
+        """
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                    "expirations": self.expirations, "entries": len(self._entries), "size": self._size}
+
+    def _remove(self, key):
+        """
+        Remove an entry while holding the lock.
+        """
+        value, _ = self._entries.pop(key)
+        if self.max_size is not None:
+            self._size -= self.sizeof(value)
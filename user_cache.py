@@ -0,0 +1,100 @@
+# Import modules.
+from flask_login import UserMixin
+from settings import EnvSetting
+from ttl_cache import TTLCache
+
+
+class CachedUser(UserMixin):
+    """
+    A lightweight, read-only copy of a user's profile, used as Flask-Login's current_user.
+
+    It holds only the columns requests need, not the user's password hash or key. The version of the
+    user's stored key is included, so building a PasswordManager doesn't query it on every request.
+
+    Attributes:
+        id (int): The ID of the user.
+        name (str): The user's name.
+        email (str): The user's email address.
+        browser (str): The browser the user imports passwords from.
+        key_version (int): The version of the user's stored key.
+    """
+    def __init__(self, id, name, email, browser, key_version=0):
+        """
+        Initialize the cached profile.
+
+        Parameters:
+            id (int): The ID of the user.
+            name (str): The user's name.
+            email (str): The user's email address.
+            browser (str): The browser the user imports passwords from.
+            key_version (int): The version of the user's stored key.
+        """
+        self.id = id
+        self.name = name
+        self.email = email
+        self.browser = browser
+        self.key_version = key_version
+
+
+class UserCache(TTLCache):
+    """
+    A process-wide cache for user profiles with TTL expiry and LRU eviction.
+
+    Flask-Login loads the user on every authenticated request. With this cache the profile is read from
+    the users table once per TTL instead. Changes made by another process become visible when the TTL
+    elapses; changes made in this process should call invalidate().
+
+    Attributes:
+        ttl (float): Number of seconds a cached profile stays valid.
+        max_entries (int): Maximum number of profiles kept before the least recently used one is evicted.
+    """
+    ttl = EnvSetting("USER_CACHE_TTL", 60, float)
+    max_entries = EnvSetting("USER_CACHE_SIZE", 1024, int)
+
+    def __init__(self, ttl=None, max_entries=None):
+        """
+        Initialize an empty user cache.
+
+        Parameters:
+            ttl (float or None): Number of seconds a cached profile stays valid. Defaults to USER_CACHE_TTL (60).
+            max_entries (int or None): Maximum number of profiles kept in the cache. Defaults to USER_CACHE_SIZE
+                                       (1024).
+        """
+        super().__init__(ttl=ttl, max_entries=max_entries)
+
+    def get_or_load(self, user_id, loader):
+        """
+        Return a user's cached profile, loading and caching it on a miss.
+
+        Parameters:
+            user_id (int): The ID of the user.
+            loader (callable): A function without arguments that returns the CachedUser, or None if the
+                               user does not exist.
+
+        Returns:
+            CachedUser or None: The profile, or None if the user does not exist.
+        """
+        return self.load(user_id, loader)
+
+    def invalidate(self, user_id=None):
+        """
+        Remove a user's cached profile.
+
+        Parameters:
+            user_id (int or None): The ID of the user. Clears the whole cache if None.
+        """
+        self.discard(None if user_id is None else lambda key: key == user_id)
+
+    def stats(self):
+        """
+        Return the cache counters.
+
+        Returns:
+            dict: The number of hits, misses and currently cached profiles.
+        """
+        counters = self.counters()
+        return {"hits": counters["hits"], "misses": counters["misses"], "size": counters["entries"]}
+
+
+# User cache shared by the application.
+user_cache = UserCache()
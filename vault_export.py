@@ -0,0 +1,273 @@
+# Import modules.
+import argparse
+import csv
+import getpass
+import io
+import json
+import os
+import struct
+import time
+import zlib
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.scrypt import Scrypt
+from data_access import get_export_page
+from metrics import metrics
+
+# Columns of an export, in the order of the browsers' password CSV files, so Chrome and Edge can import them.
+EXPORT_FIELDS = ("name", "url", "username", "password")
+
+# Export formats: their file extension and MIME type.
+EXPORT_FORMATS = {"csv": ("csv", "text/csv"), "ndjson": ("ndjson", "application/x-ndjson")}
+
+# First bytes of a passphrase-encrypted export, including the version of the format.
+ENCRYPTED_MAGIC = b"PWMX\x01"
+
+# scrypt cost of the passphrase key: N as a power of two, r and p. About 32 MiB and 0.1 s per export.
+SCRYPT_LOG_N, SCRYPT_R, SCRYPT_P = 15, 8, 1
+
+# Layout of the encrypted export header: magic, scrypt log2(N), r and p, salt, and nonce prefix.
+HEADER = struct.Struct(f">{len(ENCRYPTED_MAGIC)}sBBB16s7s")
+
+# Length prefix of each encrypted frame.
+FRAME_LENGTH = struct.Struct(">I")
+
+
+def export_pages(manager, user_id, chunk_size=None):
+    """
+    Read and decrypt a user's vault one chunk at a time.
+
+    Chunks are read by account ID (keyset pagination), so each one is an index range scan however far
+    into the vault it is, and only one chunk is held in memory at a time.
+
+    Parameters:
+        manager (PasswordManager): The password manager holding the user's key.
+        user_id (int): The ID of the user.
+        chunk_size (int or None): The number of accounts per chunk. Defaults to EXPORT_CHUNK_SIZE (1000).
+
+    Yields:
+        list: The chunk's (name, url, username, password) rows. Passwords that can't be decrypted are empty.
+    """
+    chunk_size = chunk_size or int(os.getenv("EXPORT_CHUNK_SIZE", 1000))
+    after, failed = 0, 0
+    while True:
+        page = get_export_page(user_id, after, chunk_size)
+        if not page:
+            break
+
+        start = time.perf_counter()
+        rows = []
+        for account, (password, error) in zip(page, manager.decrypt_blobs(account.password for account in page)):
+            if error is not None:
+                failed += 1
+            rows.append((account.url, account.full_url, account.username, password or ""))
+        if metrics.enabled:
+            metrics.observe("decrypt", time.perf_counter() - start, count=len(page))
+
+        yield rows
+        after = page[-1].id
+
+    if failed:
+        print(f"Error exporting the vault of user {user_id}: {failed} passwords could not be decrypted")
+
+
+def csv_chunks(pages):
+    """
+    Format chunks of rows as CSV, with a header line.
+
+    Parameters:
+        pages (iterable): Lists of rows.
+
+    Yields:
+        bytes: The CSV text of the header, then of each chunk, UTF-8 encoded.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_FIELDS)
+    for rows in pages:
+        writer.writerows(rows)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+def ndjson_chunks(pages):
+    """
+    Format chunks of rows as newline-delimited JSON, one object per account.
+
+    Parameters:
+        pages (iterable): Lists of rows.
+
+    Yields:
+        bytes: The JSON lines of each chunk, UTF-8 encoded.
+    """
+    for rows in pages:
+        yield "".join(json.dumps(dict(zip(EXPORT_FIELDS, row))) + "\n" for row in rows).encode("utf-8")
+
+
+def gzip_chunks(chunks, level=6):
+    """
+    Compress a stream of bytes into a gzip file, chunk by chunk.
+
+    Parameters:
+        chunks (iterable): The bytes to compress.
+        level (int): The zlib compression level.
+
+    Yields:
+        bytes: The compressed stream. Chunks that compress to nothing yet are skipped.
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def _derive_key(passphrase, salt, log_n, r, p):
+    """
+    Derive an AES-256 key from a passphrase with scrypt.
+    """
+    return Scrypt(salt=salt, length=32, n=2 ** log_n, r=r, p=p).derive(passphrase.encode("utf-8"))
+
+
+def _frame_nonce(prefix, counter, final):
+    """
+    Return the nonce of a frame: the export's random prefix, the frame counter and a last-frame flag.
+    """
+    return prefix + struct.pack(">IB", counter, 1 if final else 0)
+
+
+def encrypt_chunks(chunks, passphrase):
+    """
+    Encrypt a stream of bytes with a passphrase, chunk by chunk.
+
+    The output is a header with the scrypt parameters, salt and nonce prefix, followed by one AES-GCM frame
+    per chunk, each prefixed with its length. Every frame's nonce holds its position and whether it is the
+    last one, and the header is authenticated with each frame, so reordered, dropped or truncated frames
+    fail to decrypt.
+
+    Parameters:
+        chunks (iterable): The bytes to encrypt.
+        passphrase (str): The passphrase.
+
+    Yields:
+        bytes: The header, then the encrypted frames.
+    """
+    header = HEADER.pack(ENCRYPTED_MAGIC, SCRYPT_LOG_N, SCRYPT_R, SCRYPT_P, os.urandom(16), os.urandom(7))
+    _, log_n, r, p, salt, prefix = HEADER.unpack(header)
+    yield header
+
+    aead = AESGCM(_derive_key(passphrase, salt, log_n, r, p))
+    counter, pending = 0, None
+    for chunk in chunks:
+        # Hold each chunk back until the next one arrives, so the last frame can be marked as such.
+        if pending is not None:
+            frame = aead.encrypt(_frame_nonce(prefix, counter, False), pending, header)
+            yield FRAME_LENGTH.pack(len(frame)) + frame
+            counter += 1
+        pending = chunk
+    frame = aead.encrypt(_frame_nonce(prefix, counter, True), pending or b"", header)
+    yield FRAME_LENGTH.pack(len(frame)) + frame
+
+
+def decrypt_chunks(file, passphrase):
+    """
+    Decrypt an export encrypted with encrypt_chunks(), frame by frame.
+
+    Parameters:
+        file (BinaryIO): The encrypted export.
+        passphrase (str): The passphrase.
+
+    Yields:
+        bytes: The decrypted chunks.
+
+    Raises:
+        ValueError: If the file is not an encrypted export, the passphrase is wrong, or the file was
+                    modified or truncated.
+    """
+    header = file.read(HEADER.size)
+    if len(header) < HEADER.size or not header.startswith(ENCRYPTED_MAGIC):
+        raise ValueError("Not an encrypted vault export")
+    _, log_n, r, p, salt, prefix = HEADER.unpack(header)
+    aead = AESGCM(_derive_key(passphrase, salt, log_n, r, p))
+
+    counter = 0
+    while True:
+        length = file.read(FRAME_LENGTH.size)
+        if len(length) < FRAME_LENGTH.size:
+            raise ValueError("The export is truncated")
+        frame = file.read(FRAME_LENGTH.unpack(length)[0])
+        try:
+            yield aead.decrypt(_frame_nonce(prefix, counter, False), frame, header)
+        except InvalidTag:
+            try:
+                yield aead.decrypt(_frame_nonce(prefix, counter, True), frame, header)
+            except InvalidTag:
+                raise ValueError("Wrong passphrase, or the export was modified or truncated") from None
+            if file.read(1):
+                raise ValueError("The export has data after its last frame")
+            return
+        counter += 1
+
+
+def export_vault(manager, user_id, export_format="csv", compress=False, passphrase=None, chunk_size=None):
+    """
+    Stream a user's vault as CSV or newline-delimited JSON, optionally compressed and encrypted.
+
+    Nothing is read until the stream is consumed, and only one chunk of accounts is held at a time, so
+    memory use doesn't grow with the vault and the first bytes are sent right away.
+
+    Parameters:
+        manager (PasswordManager): The password manager holding the user's key.
+        user_id (int): The ID of the user.
+        export_format (str): 'csv' or 'ndjson'.
+        compress (bool): Whether to gzip the export.
+        passphrase (str or None): Encrypt the export with this passphrase, if given.
+        chunk_size (int or None): The number of accounts per chunk. Defaults to EXPORT_CHUNK_SIZE.
+
+    Returns:
+        generator: The bytes of the export.
+    """
+    formatter = csv_chunks if export_format == "csv" else ndjson_chunks
+    chunks = formatter(export_pages(manager, user_id, chunk_size))
+    if compress:
+        chunks = gzip_chunks(chunks)
+    if passphrase:
+        chunks = encrypt_chunks(chunks, passphrase)
+    return chunks
+
+
+def export_filename(export_format="csv", compress=False, encrypted=False):
+    """
+    Return the file name and MIME type of an export.
+
+    Parameters:
+        export_format (str): 'csv' or 'ndjson'.
+        compress (bool): Whether the export is gzipped.
+        encrypted (bool): Whether the export is encrypted with a passphrase.
+
+    Returns:
+        tuple: The file name, such as 'vault.csv.gz', and the MIME type.
+    """
+    extension, mimetype = EXPORT_FORMATS[export_format]
+    filename = f"vault.{extension}"
+    if compress:
+        filename, mimetype = f"{filename}.gz", "application/gzip"
+    if encrypted:
+        filename, mimetype = f"{filename}.enc", "application/octet-stream"
+    return filename, mimetype
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Decrypt a vault export encrypted with a passphrase.")
+    parser.add_argument("source", help="The encrypted export, such as vault.csv.enc.")
+    parser.add_argument("target", help="The path of the decrypted file to write.")
+    args = parser.parse_args()
+
+    with open(args.source, "rb") as source, open(args.target, "wb") as target:
+        for chunk in decrypt_chunks(source, getpass.getpass("Passphrase: ")):
+            target.write(chunk)
+    print(f"Decrypted {args.source} into {args.target}.")
@@ -0,0 +1,317 @@
+# Import modules.
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import click
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from flask import Flask
+from flask.cli import with_appcontext
+from models import db, User, Account, RekeyJob
+from data_access import get_password_blob_page, update_passwords, store_user_key, get_user_ids
+from key_cache import key_cache
+from user_cache import user_cache
+from sqlite_tuning import sqlite_tuning
+
+
+class VaultRekeyer:
+    """
+    Re-encrypts users' vaults under new AES keys, in chunks and resumably.
+
+    A rotation is checkpointed in a RekeyJob row holding the new key and the last re-encrypted account
+    ID. Each chunk of accounts is decrypted with the old key, encrypted with the new one and committed
+    together with the checkpoint, so an interrupted rotation continues where it stopped when it is run
+    again. The new key replaces the user's stored key in the same transaction as the last chunk.
+
+    Before any account is moved, every remaining password is checked to open with the old key. If some
+    don't, the rotation fails without changing anything, since replacing the key would leave those
+    passwords unreadable with either key.
+
+    While a rotation runs, accounts already moved to the new key can't be read with the old one, so
+    vaults should be rotated while their users are not using them. Changes to a vault are refused
+    while its rotation runs (see data_access.can_write_vault()), and storing the new key increments
+    the user's key version, so every process reloads the key instead of using its cached copy.
+
+    Attributes:
+        chunk_size (int): Number of accounts re-encrypted and committed at a time.
+    """
+    def __init__(self, chunk_size=None):
+        """
+        Initialize the re-keyer.
+
+        Parameters:
+            chunk_size (int or None): Number of accounts per chunk. Defaults to REKEY_CHUNK_SIZE.
+        """
+        self.chunk_size = chunk_size or int(os.getenv("REKEY_CHUNK_SIZE", 500))
+
+    def start(self, user_id):
+        """
+        Return the user's unfinished rotation, or start a new one with a fresh random key.
+
+        Parameters:
+            user_id (int): The ID of the user.
+
+        Returns:
+            RekeyJob: The rotation's checkpoint.
+        """
+        job = db.session.execute(
+            db.select(RekeyJob).where(RekeyJob.user_id == user_id, RekeyJob.status == "running")
+        ).scalar()
+        if job is None:
+            total = db.session.execute(
+                db.select(db.func.count()).select_from(Account).where(Account.user_id == user_id)
+            ).scalar()
+            job = RekeyJob(user_id=user_id, status="running", new_key=AESGCM.generate_key(bit_length=256),
+                           total=total, date_created=int(time.time()))
+            db.session.add(job)
+            db.session.commit()
+        return job
+
+    def count_undecryptable(self, user_id, after, aead):
+        """
+        Count the passwords of a user's vault that a key can't decrypt.
+
+        Parameters:
+            user_id (int): The ID of the user.
+            after (int): Only check accounts with a higher ID than this one.
+            aead (AESGCM): The key to check the passwords with.
+
+        Returns:
+            int: The number of passwords the key can't decrypt.
+        """
+        failed = 0
+        while True:
+            rows = get_password_blob_page(user_id, after=after, size=self.chunk_size)
+            if not rows:
+                return failed
+            for _, blob in rows:
+                try:
+                    aead.decrypt(blob[3:15], blob[15:], None)
+                except Exception:
+                    failed += 1
+            after = rows[-1][0]
+
+    def run(self, user_id):
+        """
+        Re-encrypt a user's vault under a new key, resuming an interrupted rotation if there is one.
+
+        Parameters:
+            user_id (int): The ID of the user.
+
+        Returns:
+            dict: The user ID, status, number of re-encrypted and failed accounts, seconds and accounts/s.
+        """
+        # Imported here so worker processes don't import the browser import chain until they need it.
+        from password_manager import PasswordManager
+
+        job = self.start(user_id)
+        user = db.session.get(User, user_id)
+        old_key = PasswordManager(user.browser, user_id).decrypted_key
+        start = time.perf_counter()
+        failed = 0
+        try:
+            if old_key is None:
+                raise ValueError("No key to decrypt the vault with")
+            old_aead, new_aead = AESGCM(old_key), AESGCM(job.new_key)
+
+            failed = self.count_undecryptable(user_id, job.last_account_id, old_aead)
+            if failed:
+                raise ValueError(f"{failed} passwords can't be decrypted with the current key")
+
+            while True:
+                rows = get_password_blob_page(user_id, after=job.last_account_id, size=self.chunk_size)
+                if not rows:
+                    break
+
+                passwords = {}
+                for account_id, blob in rows:
+                    plain = old_aead.decrypt(blob[3:15], blob[15:], None)
+                    nonce = os.urandom(12)
+                    passwords[account_id] = b'v10' + nonce + new_aead.encrypt(nonce, plain, None)
+
+                update_passwords(passwords, commit=False)
+                job.last_account_id = rows[-1][0]
+                job.done += len(passwords)
+                job.seconds += time.perf_counter() - start
+                start = time.perf_counter()
+                db.session.commit()
+
+            store_user_key(user_id, job.new_key, commit=False)
+            job.status = "done"
+        except Exception as e:
+            db.session.rollback()
+            job = db.session.get(RekeyJob, job.id)
+            job.status = "failed"
+            job.failed = failed
+            job.error = str(e)[:200] or type(e).__name__
+
+        job.seconds += time.perf_counter() - start
+        job.date_finished = int(time.time())
+        db.session.commit()
+        key_cache.invalidate(user_id=user_id)
+        return self.report(job)
+
+    @staticmethod
+    def report(job):
+        """
+        Summarize a rotation's progress.
+
+        Parameters:
+            job (RekeyJob): The rotation's checkpoint.
+
+        Returns:
+            dict: The user ID, status, number of re-encrypted and failed accounts, seconds and accounts/s.
+        """
+        return {"user_id": job.user_id, "status": job.status, "total": job.total, "done": job.done,
+                "failed": job.failed, "seconds": round(job.seconds or 0, 3),
+                "accounts_per_second": round(job.done / job.seconds, 1) if job.seconds else None,
+                "error": job.error}
+
+
+# Flask application of a worker process, created by _init_worker().
+_worker_app = None
+
+
+def _init_worker(database_uri, chunk_size):
+    """
+    Set up a worker process with its own application and database connection.
+
+    Parameters:
+        database_uri (str): The database URI of the application.
+        chunk_size (int): Number of accounts per chunk.
+    """
+    global _worker_app
+    _worker_app = Flask(__name__)
+    _worker_app.config['SQLALCHEMY_DATABASE_URI'] = database_uri
+    _worker_app.config['REKEY_CHUNK_SIZE'] = chunk_size
+    db.init_app(_worker_app)
+    sqlite_tuning.init_app(_worker_app, db)
+
+
+def _rekey_user(user_id):
+    """
+    Rotate one user's vault key in a worker process.
+
+    Parameters:
+        user_id (int): The ID of the user.
+
+    Returns:
+        dict: The rotation's report.
+    """
+    with _worker_app.app_context():
+        return VaultRekeyer(_worker_app.config['REKEY_CHUNK_SIZE']).run(user_id)
+
+
+def rekey_users(user_ids, database_uri, max_workers=None, chunk_size=None, progress=None):
+    """
+    Rotate the vault keys of many users in parallel worker processes.
+
+    Parameters:
+        user_ids (list): The IDs of the users.
+        database_uri (str): The absolute database URI, so workers open the same database.
+        max_workers (int or None): Number of worker processes. Defaults to REKEY_WORKERS.
+        chunk_size (int or None): Number of accounts per chunk. Defaults to REKEY_CHUNK_SIZE.
+        progress (callable or None): Called with each user's report as it finishes.
+
+    Returns:
+        dict: The per-user reports, the number of re-encrypted accounts, seconds and overall accounts/s.
+    """
+    max_workers = max_workers or int(os.getenv("REKEY_WORKERS", os.cpu_count() or 1))
+    chunk_size = chunk_size or int(os.getenv("REKEY_CHUNK_SIZE", 500))
+    start = time.perf_counter()
+    reports = []
+    with ProcessPoolExecutor(max_workers=max(1, min(max_workers, len(user_ids))), initializer=_init_worker,
+                             initargs=(database_uri, chunk_size)) as pool:
+        for future in as_completed([pool.submit(_rekey_user, user_id) for user_id in user_ids]):
+            reports.append(future.result())
+            if progress:
+                progress(reports[-1])
+
+    # The workers changed the users' keys, so drop this process's cached copies and key versions.
+    for user_id in user_ids:
+        key_cache.invalidate(user_id=user_id)
+        user_cache.invalidate(user_id)
+
+    seconds = time.perf_counter() - start
+    done = sum(report["done"] for report in reports)
+    return {"users": sorted(reports, key=lambda report: report["user_id"]), "done": done,
+            "seconds": round(seconds, 3), "accounts_per_second": round(done / seconds, 1) if seconds else None}
+
+
+# Background thread of a rotation started with rekey_users_async().
+_rekey_thread = None
+_rekey_lock = threading.Lock()
+
+
+def rekey_users_async(user_ids, database_uri, max_workers=None):
+    """
+    Rotate the vault keys of many users in a background thread, unless a rotation is already running.
+
+    Parameters:
+        user_ids (list): The IDs of the users.
+        database_uri (str): The absolute database URI, so workers open the same database.
+        max_workers (int or None): Number of worker processes. Defaults to REKEY_WORKERS.
+
+    Returns:
+        bool: True if the rotation started, False if another one is still running.
+    """
+    global _rekey_thread
+    with _rekey_lock:
+        if _rekey_thread is not None and _rekey_thread.is_alive():
+            return False
+
+        def run():
+            try:
+                result = rekey_users(user_ids, database_uri, max_workers=max_workers)
+                print(f"Re-encrypted {result['done']} accounts in {result['seconds']}s, "
+                      f"{result['accounts_per_second']} accounts/s.")
+            except Exception as e:
+                print(f"Error rotating vault keys: {e}")
+
+        _rekey_thread = threading.Thread(target=run, name="vault-rekey", daemon=True)
+        _rekey_thread.start()
+        return True
+
+
+def latest_rekey_reports():
+    """
+    Summarize the latest rotation of every user that has one.
+
+    Returns:
+        list: The rotation reports, by user ID.
+    """
+    latest = db.select(db.func.max(RekeyJob.id)).group_by(RekeyJob.user_id)
+    jobs = db.session.execute(
+        db.select(RekeyJob).where(RekeyJob.id.in_(latest)).order_by(RekeyJob.user_id)
+    ).scalars()
+    return [VaultRekeyer.report(job) for job in jobs]
+
+
+def database_uri():
+    """
+    Return the current application's database URI with an absolute path, for worker processes.
+
+    Returns:
+        str: The database URI.
+    """
+    return db.engine.url.render_as_string(hide_password=False)
+
+
+@click.command("rekey-vaults")
+@click.option("--user-id", "user_ids", type=int, multiple=True, help="A user whose vault to rotate. Defaults to all.")
+@click.option("--workers", type=int, default=None, help="Number of worker processes. Defaults to REKEY_WORKERS.")
+@click.option("--chunk-size", type=int, default=None, help="Accounts per chunk. Defaults to REKEY_CHUNK_SIZE.")
+@with_appcontext
+def rekey_vaults_command(user_ids, workers, chunk_size):
+    """
+    Re-encrypt vaults under new keys. Interrupted rotations resume when the command runs again.
+    """
+    user_ids = list(user_ids) or get_user_ids()
+    result = rekey_users(user_ids, database_uri(), max_workers=workers, chunk_size=chunk_size,
+                         progress=lambda report: click.echo(
+                             f"User {report['user_id']}: {report['status']}, {report['done']} of {report['total']} "
+                             f"accounts re-encrypted, {report['failed']} failed, "
+                             f"{report['accounts_per_second']} accounts/s"
+                             + (f" ({report['error']})" if report['error'] else "")))
+    click.echo(f"Re-encrypted {result['done']} accounts of {len(user_ids)} users in {result['seconds']}s, "
+               f"{result['accounts_per_second']} accounts/s.")